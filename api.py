@@ -0,0 +1,350 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional
+import uvicorn
+from fastapi import FastAPI, File, Form, HTTPException, Request, UploadFile
+from fastapi.responses import FileResponse
+from catalog import PRESET_DIR, preset_catalog
+from designer import DESIGNER_EFFECTS, default_settings, param_key
+from encode import output_format as lookup_output_format
+from input_store import decode, input_store
+from jobs import plan_designer, plan_effect
+from loudness import DEFAULT_LOUDNESS_TARGET
+from metrics import registry, start_metrics_server
+from output_store import output_store
+from scheduler import SchedulerBusy, estimate_cost, scheduler
+
+# Set PEDALBOARD_API=0 to run the Gradio UI without the job API.
+API_ENABLED = os.environ.get("PEDALBOARD_API", "1") != "0"
+API_HOST = os.environ.get("PEDALBOARD_API_HOST", "127.0.0.1")
+API_PORT = int(os.environ.get("PEDALBOARD_API_PORT", "7861"))
+# Server-side input paths must lie under one of these directories (separated by
+# os.pathsep). Defaults to the working directory; set it to an empty value to refuse
+# server-side paths, or list wider roots explicitly to allow them.
+API_INPUT_ROOTS = [os.path.realpath(p) for p in os.environ.get("PEDALBOARD_API_INPUT_ROOTS", os.getcwd()).split(os.pathsep)
+                   if p]
+# Finished jobs are forgotten this many seconds after they end.
+API_JOB_TTL = float(os.environ.get("PEDALBOARD_API_JOB_TTL", "3600"))
+# Bytes read per step when spooling an upload to disk.
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class ApiJob:
+    """A job submitted over HTTP: the scheduler Job, or the cached output it resolved to."""
+
+    def __init__(self, client, input_name, target, job=None, cached_path=None):
+        self.id = uuid.uuid4().hex
+        self.client = client
+        self.input_name = input_name
+        self.target = target
+        self.job = job
+        self.cached_path = cached_path
+        self.created_at = time.time()
+        self._created = time.monotonic()
+
+    @property
+    def status(self):
+        if self.job is None:
+            return "finished"
+        return self.job.state
+
+    def seconds_since_finished(self):
+        """Returns how long ago the job ended, or None while it is queued or running."""
+        finished_at = self._created if self.job is None else self.job.finished_at
+        return None if finished_at is None else time.monotonic() - finished_at
+
+    def output(self):
+        """Returns (output path, stats markdown) of a finished job."""
+        if self.job is None:
+            return self.cached_path, "Served from the render cache."
+        return self.job.result()
+
+    def describe(self):
+        info = {"id": self.id, "status": self.status, "input": self.input_name, "target": self.target,
+                "client": self.client, "created_at": self.created_at}
+        if self.status in ("queued", "running"):
+            position, eta = scheduler.position(self.job)
+            info.update(position=position, eta_seconds=round(eta, 2))
+        elif self.status == "finished":
+            output_path, stats = self.output()
+            info.update(result=f"/jobs/{self.id}/result", filename=os.path.basename(output_path), stats=stats)
+        else:
+            try:
+                self.job.result()
+            except Exception as e:
+                info["error"] = str(e) or type(e).__name__
+        return info
+
+
+class ApiJobs:
+    """Jobs submitted through the API by id, dropped API_JOB_TTL seconds after they finish."""
+
+    def __init__(self, ttl=API_JOB_TTL):
+        self.ttl = ttl
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, api_job):
+        with self._lock:
+            self._prune()
+            self._jobs[api_job.id] = api_job
+
+    def get(self, job_id):
+        with self._lock:
+            api_job = self._jobs.get(job_id)
+        if api_job is None:
+            raise HTTPException(404, f"Unknown job {job_id}")
+        return api_job
+
+    def list(self, client=None):
+        with self._lock:
+            self._prune()
+            return [j for j in self._jobs.values() if client is None or j.client == client]
+
+    def _prune(self):
+        # Caller holds the lock.
+        for job_id in [i for i, j in self._jobs.items() if (j.seconds_since_finished() or 0.0) > self.ttl]:
+            del self._jobs[job_id]
+
+    def stats(self):
+        with self._lock:
+            counts = {"queued": 0, "running": 0, "finished": 0, "failed": 0, "cancelled": 0}
+            for api_job in self._jobs.values():
+                counts[api_job.status] = counts.get(api_job.status, 0) + 1
+            return counts
+
+
+api_jobs = ApiJobs()
+api = FastAPI(title="Pedalboard Job API")
+
+
+def client_id(request):
+    """Identifies the caller for fair scheduling: the X-Client-Id header or its address."""
+    return request.headers.get("X-Client-Id") or (request.client.host if request.client else "api")
+
+
+def check_input_path(path):
+    """Returns the real path of a server-side input, or raises a 400/404 HTTPException."""
+    real_path = os.path.realpath(path)
+    if not any(os.path.commonpath([real_path, root]) == root for root in API_INPUT_ROOTS):
+        raise HTTPException(400, f"{path} is outside the allowed input directories")
+    if not os.path.isfile(real_path):
+        raise HTTPException(404, f"No such input file: {path}")
+    return real_path
+
+
+async def spool_upload(upload):
+    """Writes an upload to a temporary file in chunks and returns its path."""
+    suffix = os.path.splitext(upload.filename or "")[1]
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as spool:
+        while True:
+            chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            spool.write(chunk)
+    return spool.name
+
+
+async def load_upload(upload):
+    path = await spool_upload(upload)
+    try:
+        return await asyncio.to_thread(decode, path)
+    finally:
+        os.remove(path)
+
+
+def parse_setting(key, value, params):
+    """
+    Checks one Designer setting: "<section>.enabled" flags must be booleans and slider
+    values numbers (or numeric strings) within the slider's range.
+    """
+    param = params.get(key)
+    if param is None:
+        if not isinstance(value, bool):
+            raise HTTPException(400, f"{key} must be true or false")
+        return value
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise HTTPException(400, f"{key} must be a number")
+    if isinstance(value, str):
+        try:
+            value = float(value)
+        except ValueError:
+            raise HTTPException(400, f"{key} must be a number, not {value!r}")
+    if not param.minimum <= value <= param.maximum:
+        raise HTTPException(400, f"{key} must be between {param.minimum} and {param.maximum}")
+    return value
+
+
+def parse_settings(text):
+    """Merges a JSON object of Designer settings over the defaults, checking each value."""
+    settings = default_settings()
+    params = {param_key(slot, param): param
+              for effect in DESIGNER_EFFECTS for slot in effect.slots for param in slot.params}
+    try:
+        overrides = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise HTTPException(400, f"settings is not valid JSON: {e}")
+    if not isinstance(overrides, dict):
+        raise HTTPException(400, "settings must be a JSON object")
+    unknown = sorted(set(overrides) - set(settings))
+    if unknown:
+        raise HTTPException(400, f"Unknown Designer settings: {', '.join(unknown)}")
+    settings.update((key, parse_setting(key, value, params)) for key, value in overrides.items())
+    return settings
+
+
+def parse_loudness_target(text):
+    """
+    Returns the LUFS target of a loudness_target form value: the server default when
+    omitted, None (peak normalization) for "peak", otherwise the number given.
+    """
+    if text is None:
+        return DEFAULT_LOUDNESS_TARGET
+    if text.strip().lower() == "peak":
+        return None
+    try:
+        target = float(text)
+    except ValueError:
+        raise HTTPException(400, f"loudness_target must be a LUFS value or \"peak\", not {text!r}")
+    if not math.isfinite(target):
+        raise HTTPException(400, "loudness_target must be finite")
+    return target
+
+
+@api.post("/jobs", status_code=202)
+async def submit_job(request: Request, file: Optional[UploadFile] = File(None), path: Optional[str] = Form(None),
+                     preset: Optional[str] = Form(None), settings: Optional[str] = Form(None),
+                     title: str = Form(""), output_format: Optional[str] = Form(None),
+                     loudness_target: Optional[str] = Form(None)):
+    """
+    Submits a render. The input is an uploaded `file` or a server-side `path`; the
+    chain is a `preset` from the preset directory or Designer `settings` (a JSON
+    object of "<section>.enabled" / "<slot>.<param>" values over the defaults). The
+    output is normalized to `loudness_target` (LUFS), or peak-normalized when it is
+    "peak"; when omitted the server's PEDALBOARD_LOUDNESS_TARGET applies.
+    """
+    if (file is None) == (path is None):
+        raise HTTPException(400, "Pass exactly one of file or path")
+    if (preset is None) == (settings is None):
+        raise HTTPException(400, "Pass exactly one of preset or settings")
+    try:
+        lookup_output_format(output_format)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    if preset is not None and (os.path.basename(preset) != preset or not os.path.isfile(os.path.join(PRESET_DIR, preset))):
+        raise HTTPException(404, f"No such preset: {preset}")
+    designer_settings = parse_settings(settings) if settings is not None else None
+    loudness_target = parse_loudness_target(loudness_target)
+    client = client_id(request)
+    try:
+        if path is not None:
+            decoded = await asyncio.to_thread(input_store.get, f"api:{client}", check_input_path(path))
+            input_key = decoded.key
+        else:
+            decoded = await load_upload(file)
+            input_key = None
+        if preset is not None:
+            plan = await asyncio.to_thread(plan_effect, decoded.sample_rate, decoded.audio_data, preset,
+                                           input_key=input_key, output_format=output_format,
+                                           loudness_target=loudness_target)
+        else:
+            plan = await asyncio.to_thread(plan_designer, decoded.sample_rate, decoded.audio_data, title,
+                                           designer_settings, f"api:{client}", input_key=input_key,
+                                           output_format=output_format, loudness_target=loudness_target)
+    except (RuntimeError, ValueError) as e:
+        raise HTTPException(400, str(e))
+    input_name = path if path is not None else file.filename
+    target = preset if preset is not None else (title or "designer")
+    if plan.cached_path is not None:
+        api_job = ApiJob(client, input_name, target, cached_path=plan.cached_path)
+    else:
+        audio_data = decoded.audio_data
+        cost = estimate_cost(audio_data.shape[1], decoded.sample_rate, audio_data.shape[0], plan.chain_length)
+        try:
+            job = scheduler.submit(client, cost, plan.work)
+        except SchedulerBusy as e:
+            raise HTTPException(503, str(e))
+        api_job = ApiJob(client, input_name, target, job=job)
+    api_jobs.add(api_job)
+    return api_job.describe()
+
+
+@api.get("/jobs")
+async def list_jobs(client: Optional[str] = None):
+    return [api_job.describe() for api_job in api_jobs.list(client)]
+
+
+@api.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    return api_jobs.get(job_id).describe()
+
+
+@api.get("/jobs/{job_id}/result")
+async def job_result(job_id: str):
+    api_job = api_jobs.get(job_id)
+    if api_job.status != "finished":
+        raise HTTPException(409, f"Job {job_id} is {api_job.status}")
+    output_path, _ = api_job.output()
+    if not os.path.isfile(output_path):
+        raise HTTPException(410, f"The output of job {job_id} has been deleted")
+    return FileResponse(output_path, filename=os.path.basename(output_path))
+
+
+@api.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    api_job = api_jobs.get(job_id)
+    if api_job.job is not None and not api_job.job.done:
+        scheduler.cancel(api_job.job)
+        await asyncio.to_thread(api_job.job.wait, 5)
+    return api_job.describe()
+
+
+@api.get("/presets")
+async def list_presets(q: str = "", page: int = 1):
+    entries, total, pages = preset_catalog.search(q, page)
+    return {"total": total, "pages": pages, "presets": [
+        {"filename": e.filename, "title": e.title, "effects": list(e.effects), "output_filename": e.output_filename}
+        for e in entries]}
+
+
+def start_api_server(host=API_HOST, port=API_PORT):
+    """
+    Serves the job API on a daemon thread running its own asyncio loop. Returns the
+    uvicorn Server, or None if the port is unavailable.
+    """
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    try:
+        sock.bind((host, port))
+    except OSError as e:
+        sock.close()
+        print(f"Job API disabled: {e}")
+        return None
+    server = uvicorn.Server(uvicorn.Config(api, log_level="warning"))
+    threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True, name="job-api").start()
+    return server
+
+
+def main():
+    """Command line entry point: runs the job API without the Gradio UI."""
+    parser = argparse.ArgumentParser(description="Serve the headless render job API.")
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    args = parser.parse_args()
+    preset_catalog.start_watcher()
+    output_store.start_janitor()
+    registry.register_gauge("pedalboard_api_jobs", "Job API jobs by status.", api_jobs.stats)
+    start_metrics_server()
+    uvicorn.run(api, host=args.host, port=args.port, log_level="info")
+
+if __name__ == "__main__":
+    main()
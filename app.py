@@ -1,563 +1,469 @@
 import gradio as gr
-import numpy as np
-import soundfile as sf
-import datetime
 import os
-import re
-from pedalboard import (
-    Pedalboard,
-    Chorus,
-    Compressor,
-    Delay,
-    Distortion,
-    HighpassFilter,
-    LowpassFilter,
-    Phaser,
-    Reverb,
-    PitchShift,
-    Limiter,
-    LadderFilter
-)
-
-def load_effect_presets():
+import time
+from api import API_ENABLED, api_jobs, start_api_server
+from audition import audition
+from catalog import CATALOG_POLL_SECONDS, PRESET_DIR, preset_catalog
+from designer import DESIGNER_EFFECTS, build_chain, default_settings, enable_key, param_key, preset_text, preset_title
+from draft import DRAFT_EXCERPT_SECONDS, DRAFT_SAMPLE_RATE, DRAFT_SAMPLE_RATES, draft_audio
+from encode import DEFAULT_OUTPUT_FORMAT, OUTPUT_FORMATS
+from ingest import ingest
+from input_store import input_store
+from jobs import plan_designer, plan_effect
+from live import DEFAULT_LIVE_BLOCK_SIZE, LIVE_CHUNK_SECONDS, LiveSession, to_int16
+from loudness import DEFAULT_LOUDNESS_TARGET, LOUDNESS_TARGETS
+from metrics import registry, start_metrics_server
+from presets import preset_cache
+from output_store import output_store
+from overview import load_overview, overview_path, render_image
+from plugin_pool import plugin_pools
+from render_cache import render_cache
+from scheduler import RenderCancelled, SchedulerBusy, estimate_cost, scheduler
+from stage_cache import stage_cache
+
+# Handlers that render outside the scheduler (Live monitoring, overview images) run
+# at most this many at once; handlers that wait on the scheduler are not limited.
+UNSCHEDULED_CONCURRENCY = int(os.environ.get("PEDALBOARD_UNSCHEDULED_CONCURRENCY", str(os.cpu_count() or 1)))
+
+def preset_page(query, page, selected=None):
+    """
+    Returns (dropdown update, page, page info) for one page of catalog search results.
+    Selected presets stay among the choices when they are not on the page.
+    """
+    entries, total, pages = preset_catalog.search(query or "", page)
+    page = min(max(int(page or 1), 1), pages)
+    choices = [(entry.label, entry.filename) for entry in entries]
+    on_page = {entry.filename for entry in entries}
+    if not isinstance(selected, list):
+        selected = [selected] if selected else []
+    for filename in selected:
+        entry = preset_catalog.get(filename)
+        if filename not in on_page and entry is not None:
+            choices.insert(0, (entry.label, filename))
+    return gr.update(choices=choices), page, f"{total} presets, page {page} of {pages}"
+
+def refresh_preset_page(query, page, selected, version):
+    """Timer handler: reloads the picker's page only when the catalog has changed."""
+    if version == preset_catalog.version:
+        return gr.update(), page, gr.update(), version
+    return (*preset_page(query, page, selected), preset_catalog.version)
+
+def preset_picker(label, multiselect=False):
+    """
+    Builds a search box, a dropdown holding one page of matching presets and paging
+    buttons, and returns the dropdown. The page is reloaded when the catalog changes.
+    """
+    choices, page, info = preset_page("", 1)
+    search = gr.Textbox(label="Search Presets", placeholder="Title, effect, parameter or output name")
+    picker = gr.Dropdown(choices=choices["choices"], label=label, multiselect=multiselect)
+    with gr.Row():
+        previous_button = gr.Button("Previous Page", size="sm")
+        page_info = gr.Markdown(info)
+        next_button = gr.Button("Next Page", size="sm")
+    current_page = gr.State(page)
+    version = gr.State(preset_catalog.version)
+    outputs = [picker, current_page, page_info]
+    search.change(lambda query, selected: preset_page(query, 1, selected), inputs=[search, picker],
+        outputs=outputs, queue=False, show_progress="hidden")
+    previous_button.click(lambda query, page, selected: preset_page(query, page - 1, selected),
+        inputs=[search, current_page, picker], outputs=outputs, queue=False)
+    next_button.click(lambda query, page, selected: preset_page(query, page + 1, selected),
+        inputs=[search, current_page, picker], outputs=outputs, queue=False)
+    gr.Timer(CATALOG_POLL_SECONDS).tick(refresh_preset_page, inputs=[search, current_page, picker, version],
+        outputs=outputs + [version], queue=False, show_progress="hidden")
+    return picker
+
+def run_scheduled(request, audio_data, sample_rate, chain_length, work):
+    """
+    Submits work to the render scheduler and yields (status, result) pairs: a queue
+    position and ETA while waiting, then the job's result once it finishes. If the
+    generator is closed early (the Cancel button) the job is cancelled.
+    """
+    user = request.session_hash if request is not None else "local"
+    cost = estimate_cost(audio_data.shape[1], sample_rate, audio_data.shape[0], chain_length)
+    try:
+        job = scheduler.submit(user, cost, work)
+    except SchedulerBusy as e:
+        raise gr.Error(str(e))
+    try:
+        while not job.wait(0.5):
+            position, eta = scheduler.position(job)
+            status = "Rendering" if position == 0 else f"Queue position {position}"
+            yield f"{status}, ETA {eta:.0f}s", None
+        try:
+            result = job.result()
+        except RenderCancelled:
+            raise gr.Error("Render cancelled")
+        yield "Done", result
+    finally:
+        if not job.done:
+            scheduler.cancel(job)
+
+def load_input(audio_path, request):
+    """Returns the session's decoded copy of an uploaded file, decoding it only once."""
+    return input_store.get(request.session_hash if request is not None else None, audio_path)
+
+def end_session(request: gr.Request):
+    """Frees the decoded uploads of a browser session that has closed."""
+    input_store.end_session(request.session_hash)
+
+def run_plan(plan, request, audio_data, sample_rate):
+    """
+    Yields (path, stats, status) updates for a RenderPlan: the cached output right
+    away, or queue updates from the shared scheduler until the render finishes.
     """
-    Scans the 'pedalboard/' directory for .pdl files and returns a sorted list of filenames.
+    if plan.cached_path is not None:
+        yield plan.cached_path, "Served from the render cache.", "Done (cached)"
+        return
+    for status, result in run_scheduled(request, audio_data, sample_rate, plan.chain_length, plan.work):
+        if result is None:
+            yield gr.update(), gr.update(), status
+        else:
+            yield result[0], result[1], status
+
+def loudness_choice(target):
+    """Loudness Target dropdown value of a target; "peak" stands for None."""
+    return "peak" if target is None else f"{target:g}"
+
+def loudness_choices():
+    """Loudness Target dropdown choices, including a PEDALBOARD_LOUDNESS_TARGET not in the list."""
+    choices = [(label, loudness_choice(target)) for label, target in LOUDNESS_TARGETS]
+    if loudness_choice(DEFAULT_LOUDNESS_TARGET) not in dict(choices).values():
+        choices.append((f"{DEFAULT_LOUDNESS_TARGET:g} LUFS", loudness_choice(DEFAULT_LOUDNESS_TARGET)))
+    return choices
+
+def loudness_target(choice):
+    """Returns the LUFS target of a Loudness Target choice, or None for peak normalization."""
+    return None if choice in (None, "", "peak") else float(choice)
+
+def render_effect(sample_rate, audio_data, effect, request, draft=False, input_key=None, output_format=None,
+                  loudness=None):
     """
-    return sorted([f for f in os.listdir("pedalboard") if f.endswith(".pdl")])
+    Renders ingested audio through the selected .pdl preset on the shared scheduler,
+    checking the render cache first, and yields (path, stats, status) updates. Pass
+    input_key when the input's content hash is already known.
+    """
+    plan = plan_effect(sample_rate, audio_data, effect, draft, input_key, output_format, loudness_target(loudness))
+    yield from run_plan(plan, request, audio_data, sample_rate)
 
-def process_effect(audio_input, effect):
+def process_effect(audio_input, effect, output_format, loudness, request: gr.Request = None):
     """
     Process the uploaded or recorded audio using the selected effect from a .pdl file.
     The function reads the effect chain and output filename from the .pdl file,
     applies the chain to the input audio, saves the processed audio with a timestamp,
-    and returns the file path.
+    normalized to the selected loudness target and encoded in the selected output
+    format, and yields the file path together with the
+    render stats table and queue status. The render runs on the shared scheduler, so
+    this yields queue updates until it starts.
     """
     if audio_input is None:
-        return None
+        yield None, "", ""
+        return
+    decoded = load_input(audio_input, request)
+    yield from render_effect(decoded.sample_rate, decoded.audio_data, effect, request, input_key=decoded.key,
+                             output_format=output_format, loudness=loudness)
 
-    sample_rate, audio_data = audio_input
-    audio_data = np.array(audio_data, dtype=np.float32)
-    if audio_data.ndim == 1:
-        audio_data = np.expand_dims(audio_data, axis=1)
+def preview_effect(audio_input, effect, output_format, loudness, preview_rate, excerpt_start, excerpt_length,
+                   request: gr.Request = None):
+    """
+    Draft version of process_effect: renders only the excerpt window, downsampled to
+    the preview rate, so judging a preset on long material stays quick.
+    """
+    if audio_input is None:
+        yield None, "", ""
+        return
+    decoded = load_input(audio_input, request)
+    sample_rate, audio_data = draft_audio(decoded.audio_data, decoded.sample_rate, preview_rate, excerpt_start, excerpt_length)
+    yield from render_effect(sample_rate, audio_data, effect, request, draft=True, output_format=output_format,
+                             loudness=loudness)
 
-    pdl_file_path = os.path.join("pedalboard", effect)
-    try:
-        with open(pdl_file_path, "r") as f:
-            content = f.read()
-    except Exception as e:
-        raise ValueError(f"Error reading {pdl_file_path}: {e}")
-
-    match = re.search(r'(\[.*?\])\s*,\s*"([^"]+)"', content, re.DOTALL)
-    if not match:
-        raise ValueError("Invalid .pdl file format. Expected format: [effects], \"output_filename.wav\"")
-
-    effect_chain_str = match.group(1)
-    output_filename = match.group(2)
-
-    allowed_effects = {
-        "Chorus": Chorus,
-        "Compressor": Compressor,
-        "Delay": Delay,
-        "Distortion": Distortion,
-        "HighpassFilter": HighpassFilter,
-        "LowpassFilter": LowpassFilter,
-        "Phaser": Phaser,
-        "Reverb": Reverb,
-        "PitchShift": PitchShift,
-        "Limiter": Limiter,
-        "LadderFilter": LadderFilter,
-    }
+def find_overview(output_path):
+    """
+    Returns the overview cached for a rendered file, looking beside the path Gradio
+    passes back and then in the output store, or None when there is none.
+    """
+    for path in (output_path, os.path.join(output_store.directory, os.path.basename(output_path))):
+        if os.path.isfile(overview_path(path)):
+            return load_overview(overview_path(path))
+    return None
 
-    try:
-        board_list = eval(effect_chain_str, {"__builtins__": None}, allowed_effects)
-    except Exception as e:
-        raise ValueError(f"Error evaluating effect chain: {e}")
-
-    board = Pedalboard(board_list)
-    processed_audio = board(audio_data, sample_rate)
-
-    max_amp = np.max(np.abs(processed_audio))
-    if max_amp > 1.0:
-        processed_audio = processed_audio / max_amp
-
-    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    name, ext = output_filename.rsplit('.', 1)
-    timestamped_filename = f"{name}_{timestamp}.{ext}"
-    sf.write(timestamped_filename, processed_audio, sample_rate)
-
-    return timestamped_filename
-
-def build_designer_chain(
-    # Chorus Subtle
-    chorus_subtle_enable, chorus_subtle_rate_hz, chorus_subtle_depth, chorus_subtle_mix,
-    # Chorus Intense
-    chorus_intense_enable, chorus_intense_rate_hz, chorus_intense_depth, chorus_intense_mix,
-    # Compressor
-    compressor_enable, comp_threshold_db, comp_ratio, comp_attack_ms, comp_release_ms,
-    # Delay Single
-    delay_single_enable, delay_single_delay_seconds, delay_single_feedback, delay_single_mix,
-    # Delay Multi
-    delay_multi_enable, delay_multi_1_delay_seconds, delay_multi_1_feedback, delay_multi_1_mix,
-    delay_multi_2_delay_seconds, delay_multi_2_feedback, delay_multi_2_mix,
-    # Distortion Mild
-    distortion_mild_enable, distortion_mild_drive_db,
-    # Distortion Heavy
-    distortion_heavy_enable, distortion_heavy_drive_db,
-    # Filters (combined Highpass and Lowpass)
-    filters_enable, filters_highpass_cutoff, filters_lowpass_cutoff,
-    # Ladder Filter
-    ladder_filter_enable, ladder_cutoff_hz, ladder_resonance, ladder_drive,
-    # Phaser
-    phaser_enable, phaser_rate_hz, phaser_depth, phaser_feedback, phaser_mix,
-    # Reverb Small
-    reverb_small_enable, reverb_small_room_size, reverb_small_damping, reverb_small_width, reverb_small_wet_level,
-    # Reverb Large
-    reverb_large_enable, reverb_large_room_size, reverb_large_damping, reverb_large_width, reverb_large_wet_level,
-    # Pitch Shift Up & Down
-    pitch_shift_up_enable, pitch_shift_down_enable, pitch_shift_up_value, pitch_shift_down_value
-):
-    effects_str_list = []
-    effects_objs_list = []
-    enabled_effect_names = []
-
-    if chorus_subtle_enable:
-        s = f"Chorus(rate_hz={chorus_subtle_rate_hz}, depth={chorus_subtle_depth}, mix={chorus_subtle_mix})"
-        effects_str_list.append(s)
-        effects_objs_list.append(Chorus(rate_hz=chorus_subtle_rate_hz, depth=chorus_subtle_depth, mix=chorus_subtle_mix))
-        enabled_effect_names.append("Chorus Subtle")
-    if chorus_intense_enable:
-        s = f"Chorus(rate_hz={chorus_intense_rate_hz}, depth={chorus_intense_depth}, mix={chorus_intense_mix})"
-        effects_str_list.append(s)
-        effects_objs_list.append(Chorus(rate_hz=chorus_intense_rate_hz, depth=chorus_intense_depth, mix=chorus_intense_mix))
-        enabled_effect_names.append("Chorus Intense")
-    if compressor_enable:
-        s = f"Compressor(threshold_db={comp_threshold_db}, ratio={comp_ratio}, attack_ms={comp_attack_ms}, release_ms={comp_release_ms})"
-        effects_str_list.append(s)
-        effects_objs_list.append(Compressor(threshold_db=comp_threshold_db, ratio=comp_ratio, attack_ms=comp_attack_ms, release_ms=comp_release_ms))
-        enabled_effect_names.append("Compressor")
-    if delay_single_enable:
-        s = f"Delay(delay_seconds={delay_single_delay_seconds}, feedback={delay_single_feedback}, mix={delay_single_mix})"
-        effects_str_list.append(s)
-        effects_objs_list.append(Delay(delay_seconds=delay_single_delay_seconds, feedback=delay_single_feedback, mix=delay_single_mix))
-        enabled_effect_names.append("Delay Single")
-    if delay_multi_enable:
-        s1 = f"Delay(delay_seconds={delay_multi_1_delay_seconds}, feedback={delay_multi_1_feedback}, mix={delay_multi_1_mix})"
-        s2 = f"Delay(delay_seconds={delay_multi_2_delay_seconds}, feedback={delay_multi_2_feedback}, mix={delay_multi_2_mix})"
-        effects_str_list.append(s1)
-        effects_str_list.append(s2)
-        effects_objs_list.append(Delay(delay_seconds=delay_multi_1_delay_seconds, feedback=delay_multi_1_feedback, mix=delay_multi_1_mix))
-        effects_objs_list.append(Delay(delay_seconds=delay_multi_2_delay_seconds, feedback=delay_multi_2_feedback, mix=delay_multi_2_mix))
-        enabled_effect_names.append("Delay Multi")
-    if distortion_mild_enable:
-        s = f"Distortion(drive_db={distortion_mild_drive_db})"
-        effects_str_list.append(s)
-        effects_objs_list.append(Distortion(drive_db=distortion_mild_drive_db))
-        enabled_effect_names.append("Distortion Mild")
-    if distortion_heavy_enable:
-        s = f"Distortion(drive_db={distortion_heavy_drive_db})"
-        effects_str_list.append(s)
-        effects_objs_list.append(Distortion(drive_db=distortion_heavy_drive_db))
-        enabled_effect_names.append("Distortion Heavy")
-    if filters_enable:
-        s1 = f"HighpassFilter(cutoff_frequency_hz={filters_highpass_cutoff})"
-        s2 = f"LowpassFilter(cutoff_frequency_hz={filters_lowpass_cutoff})"
-        effects_str_list.append(s1)
-        effects_str_list.append(s2)
-        effects_objs_list.append(HighpassFilter(cutoff_frequency_hz=filters_highpass_cutoff))
-        effects_objs_list.append(LowpassFilter(cutoff_frequency_hz=filters_lowpass_cutoff))
-        enabled_effect_names.append("Filters")
-    if ladder_filter_enable:
-        s = f"LadderFilter(mode=LadderFilter.Mode.HPF12, cutoff_hz={ladder_cutoff_hz}, resonance={ladder_resonance}, drive={ladder_drive})"
-        effects_str_list.append(s)
-        effects_objs_list.append(LadderFilter(mode=LadderFilter.Mode.HPF12, cutoff_hz=ladder_cutoff_hz, resonance=ladder_resonance, drive=ladder_drive))
-        enabled_effect_names.append("Ladder Filter")
-    if phaser_enable:
-        s = f"Phaser(rate_hz={phaser_rate_hz}, depth={phaser_depth}, feedback={phaser_feedback}, mix={phaser_mix})"
-        effects_str_list.append(s)
-        effects_objs_list.append(Phaser(rate_hz=phaser_rate_hz, depth=phaser_depth, feedback=phaser_feedback, mix=phaser_mix))
-        enabled_effect_names.append("Phaser")
-    if reverb_small_enable:
-        s = f"Reverb(room_size={reverb_small_room_size}, damping={reverb_small_damping}, width={reverb_small_width}, wet_level={reverb_small_wet_level})"
-        effects_str_list.append(s)
-        effects_objs_list.append(Reverb(room_size=reverb_small_room_size, damping=reverb_small_damping, width=reverb_small_width, wet_level=reverb_small_wet_level))
-        enabled_effect_names.append("Reverb Small")
-    if reverb_large_enable:
-        s = f"Reverb(room_size={reverb_large_room_size}, damping={reverb_large_damping}, width={reverb_large_width}, wet_level={reverb_large_wet_level})"
-        effects_str_list.append(s)
-        effects_objs_list.append(Reverb(room_size=reverb_large_room_size, damping=reverb_large_damping, width=reverb_large_width, wet_level=reverb_large_wet_level))
-        enabled_effect_names.append("Reverb Large")
-    if pitch_shift_up_enable:
-        s = f"PitchShift(semitones={pitch_shift_up_value})"
-        effects_str_list.append(s)
-        effects_objs_list.append(PitchShift(semitones=pitch_shift_up_value))
-        enabled_effect_names.append("Pitch Shift Up")
-    if pitch_shift_down_enable:
-        s = f"PitchShift(semitones={pitch_shift_down_value})"
-        effects_str_list.append(s)
-        effects_objs_list.append(PitchShift(semitones=pitch_shift_down_value))
-        enabled_effect_names.append("Pitch Shift Down")
-        
-    chain_str = "[" + ", ".join(effects_str_list) + "],"
-    return chain_str, effects_objs_list, enabled_effect_names
-
-def generate_preset_preview(preset_title,
-    # Chorus Subtle
-    chorus_subtle_enable, chorus_subtle_rate_hz, chorus_subtle_depth, chorus_subtle_mix,
-    # Chorus Intense
-    chorus_intense_enable, chorus_intense_rate_hz, chorus_intense_depth, chorus_intense_mix,
-    # Compressor
-    compressor_enable, comp_threshold_db, comp_ratio, comp_attack_ms, comp_release_ms,
-    # Delay Single
-    delay_single_enable, delay_single_delay_seconds, delay_single_feedback, delay_single_mix,
-    # Delay Multi
-    delay_multi_enable, delay_multi_1_delay_seconds, delay_multi_1_feedback, delay_multi_1_mix,
-    delay_multi_2_delay_seconds, delay_multi_2_feedback, delay_multi_2_mix,
-    # Distortion Mild
-    distortion_mild_enable, distortion_mild_drive_db,
-    # Distortion Heavy
-    distortion_heavy_enable, distortion_heavy_drive_db,
-    # Filters
-    filters_enable, filters_highpass_cutoff, filters_lowpass_cutoff,
-    # Ladder Filter
-    ladder_filter_enable, ladder_cutoff_hz, ladder_resonance, ladder_drive,
-    # Phaser
-    phaser_enable, phaser_rate_hz, phaser_depth, phaser_feedback, phaser_mix,
-    # Reverb Small
-    reverb_small_enable, reverb_small_room_size, reverb_small_damping, reverb_small_width, reverb_small_wet_level,
-    # Reverb Large
-    reverb_large_enable, reverb_large_room_size, reverb_large_damping, reverb_large_width, reverb_large_wet_level,
-    # Pitch Shifts
-    pitch_shift_up_enable, pitch_shift_down_enable, pitch_shift_up_value, pitch_shift_down_value
-):
-    now = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    chain_str, _, enabled_effect_names = build_designer_chain(
-        chorus_subtle_enable, chorus_subtle_rate_hz, chorus_subtle_depth, chorus_subtle_mix,
-        chorus_intense_enable, chorus_intense_rate_hz, chorus_intense_depth, chorus_intense_mix,
-        compressor_enable, comp_threshold_db, comp_ratio, comp_attack_ms, comp_release_ms,
-        delay_single_enable, delay_single_delay_seconds, delay_single_feedback, delay_single_mix,
-        delay_multi_enable, delay_multi_1_delay_seconds, delay_multi_1_feedback, delay_multi_1_mix,
-        delay_multi_2_delay_seconds, delay_multi_2_feedback, delay_multi_2_mix,
-        distortion_mild_enable, distortion_mild_drive_db,
-        distortion_heavy_enable, distortion_heavy_drive_db,
-        filters_enable, filters_highpass_cutoff, filters_lowpass_cutoff,
-        ladder_filter_enable, ladder_cutoff_hz, ladder_resonance, ladder_drive,
-        phaser_enable, phaser_rate_hz, phaser_depth, phaser_feedback, phaser_mix,
-        reverb_small_enable, reverb_small_room_size, reverb_small_damping, reverb_small_width, reverb_small_wet_level,
-        reverb_large_enable, reverb_large_room_size, reverb_large_damping, reverb_large_width, reverb_large_wet_level,
-        pitch_shift_up_enable, pitch_shift_down_enable, pitch_shift_up_value, pitch_shift_down_value
-    )
-    if preset_title.strip():
-        final_title = preset_title.strip()
-    else:
-        if enabled_effect_names:
-            final_title = "_".join(enabled_effect_names) + "_" + now
+def show_overview(audio_input, output_path, view_start, view_length, request: gr.Request = None):
+    """
+    Draws the waveform and spectrogram of the input and of the rendered output for
+    the view window, from overviews computed once per file, so zooming and scrolling
+    never reread the audio.
+    """
+    input_image = output_image = None
+    if audio_input is not None:
+        input_image = render_image(load_input(audio_input, request).overview, view_start, view_length)
+    if output_path:
+        overview = find_overview(output_path)
+        if overview is not None:
+            output_image = render_image(overview, view_start, view_length)
+    return input_image, output_image
+
+def overview_panel(suffix=""):
+    """Adds the view controls and the input/output overview images; returns them."""
+    with gr.Accordion(f"Overview{suffix}", open=False):
+        with gr.Row():
+            view_start = gr.Number(value=0, label="View Start (s)")
+            view_length = gr.Number(value=0, label="View Length (s, 0 = whole file)")
+        input_image = gr.Image(label="Input", type="numpy", interactive=False)
+        output_image = gr.Image(label="Output", type="numpy", interactive=False)
+    return view_start, view_length, input_image, output_image
+
+def process_audition(audio_input, effects, request: gr.Request = None):
+    """
+    Renders every selected .pdl preset on the same input on the shared scheduler and
+    streams the finished files and a status table back to the UI as each preset completes.
+    """
+    if audio_input is None or not effects:
+        yield [], ""
+        return
+
+    sample_rate, audio_data = ingest(audio_input)
+    output_files = []
+    status_lines = ["| Preset | Time (s) | Result |", "| --- | --- | --- |"]
+    user = request.session_hash if request is not None else "local"
+    for effect, output_path, seconds, error in audition(audio_data, sample_rate, effects, user):
+        if error:
+            status_lines.append(f"| {effect} | {seconds:.2f} | Error: {error} |")
         else:
-            final_title = "Preset_" + now
-    preset_content = "\n".join([
-        f"# {final_title}",
-        f"{chain_str}",
-        f"\"{final_title}.wav\""
-    ])
-    return preset_content
-
-def process_designer(audio_input, preset_title,
-    # Chorus Subtle
-    chorus_subtle_enable, chorus_subtle_rate_hz, chorus_subtle_depth, chorus_subtle_mix,
-    # Chorus Intense
-    chorus_intense_enable, chorus_intense_rate_hz, chorus_intense_depth, chorus_intense_mix,
-    # Compressor
-    compressor_enable, comp_threshold_db, comp_ratio, comp_attack_ms, comp_release_ms,
-    # Delay Single
-    delay_single_enable, delay_single_delay_seconds, delay_single_feedback, delay_single_mix,
-    # Delay Multi
-    delay_multi_enable, delay_multi_1_delay_seconds, delay_multi_1_feedback, delay_multi_1_mix,
-    delay_multi_2_delay_seconds, delay_multi_2_feedback, delay_multi_2_mix,
-    # Distortion Mild
-    distortion_mild_enable, distortion_mild_drive_db,
-    # Distortion Heavy
-    distortion_heavy_enable, distortion_heavy_drive_db,
-    # Filters
-    filters_enable, filters_highpass_cutoff, filters_lowpass_cutoff,
-    # Ladder Filter
-    ladder_filter_enable, ladder_cutoff_hz, ladder_resonance, ladder_drive,
-    # Phaser
-    phaser_enable, phaser_rate_hz, phaser_depth, phaser_feedback, phaser_mix,
-    # Reverb Small
-    reverb_small_enable, reverb_small_room_size, reverb_small_damping, reverb_small_width, reverb_small_wet_level,
-    # Reverb Large
-    reverb_large_enable, reverb_large_room_size, reverb_large_damping, reverb_large_width, reverb_large_wet_level,
-    # Pitch Shifts
-    pitch_shift_up_enable, pitch_shift_down_enable, pitch_shift_up_value, pitch_shift_down_value
-):
+            output_files.append(output_path)
+            status_lines.append(f"| {effect} | {seconds:.2f} | {output_path} |")
+        yield output_files, "\n".join(status_lines)
+
+def process_live(audio_chunk, effect, block_size, session):
+    """
+    Processes one microphone chunk through the session's long-lived board and returns
+    (output chunk, session, latency text). A new session is started whenever the
+    preset, block size or input format changes.
+    """
+    if audio_chunk is None or not effect:
+        return gr.update(), session, gr.update()
+    received_at = time.perf_counter()
+    sample_rate, audio_data = ingest(audio_chunk)
+    num_channels = audio_data.shape[0]
+    if session is None or not session.matches(effect, sample_rate, num_channels, block_size):
+        compiled = preset_cache.get(os.path.join(PRESET_DIR, effect))
+        session = LiveSession(effect, compiled.chain, sample_rate, num_channels, block_size)
+    processed = session.process(audio_data, received_at)
+    if processed.shape[1] == 0:
+        return gr.update(), session, session.describe()
+    return (sample_rate, to_int16(processed).T), session, session.describe()
+
+def update_setting(key):
+    """
+    Returns an event handler storing one Designer control's value in the session's
+    settings dict, so only the changed field is sent when a control moves.
+    """
+    def handler(value, settings):
+        settings[key] = value
+        return settings
+    return handler
+
+def generate_preset_preview(title, settings):
+    chain_str, _, enabled_effect_names = build_chain(settings)
+    return preset_text(preset_title(title, enabled_effect_names), chain_str)
+
+def render_designer(sample_rate, audio_data, title, settings, request, draft=False, input_key=None,
+                    output_format=None, loudness=None):
+    """
+    Renders ingested audio through the Designer chain on the shared scheduler, reusing
+    the session's plugins and cached stages, and yields (path, stats, status) updates.
+    Pass input_key when the input's content hash is already known.
+    """
+    session_id = request.session_hash if request is not None else None
+    plan = plan_designer(sample_rate, audio_data, title, settings, session_id, draft, input_key, output_format,
+                         loudness_target(loudness))
+    yield from run_plan(plan, request, audio_data, sample_rate)
+
+def process_designer(audio_input, title, settings, output_format, loudness, request: gr.Request = None):
     if audio_input is None:
-        return None
-    sample_rate, audio_data = audio_input
-    audio_data = np.array(audio_data, dtype=np.float32)
-    if audio_data.ndim == 1:
-        audio_data = np.expand_dims(audio_data, axis=1)
-    _, effects_objs, _ = build_designer_chain(
-        chorus_subtle_enable, chorus_subtle_rate_hz, chorus_subtle_depth, chorus_subtle_mix,
-        chorus_intense_enable, chorus_intense_rate_hz, chorus_intense_depth, chorus_intense_mix,
-        compressor_enable, comp_threshold_db, comp_ratio, comp_attack_ms, comp_release_ms,
-        delay_single_enable, delay_single_delay_seconds, delay_single_feedback, delay_single_mix,
-        delay_multi_enable, delay_multi_1_delay_seconds, delay_multi_1_feedback, delay_multi_1_mix,
-        delay_multi_2_delay_seconds, delay_multi_2_feedback, delay_multi_2_mix,
-        distortion_mild_enable, distortion_mild_drive_db,
-        distortion_heavy_enable, distortion_heavy_drive_db,
-        filters_enable, filters_highpass_cutoff, filters_lowpass_cutoff,
-        ladder_filter_enable, ladder_cutoff_hz, ladder_resonance, ladder_drive,
-        phaser_enable, phaser_rate_hz, phaser_depth, phaser_feedback, phaser_mix,
-        reverb_small_enable, reverb_small_room_size, reverb_small_damping, reverb_small_width, reverb_small_wet_level,
-        reverb_large_enable, reverb_large_room_size, reverb_large_damping, reverb_large_width, reverb_large_wet_level,
-        pitch_shift_up_enable, pitch_shift_down_enable, pitch_shift_up_value, pitch_shift_down_value
-    )
-    board = Pedalboard(effects_objs)
-    processed_audio = board(audio_data, sample_rate)
-    max_amp = np.max(np.abs(processed_audio))
-    if max_amp > 1.0:
-        processed_audio = processed_audio / max_amp
-
-    now = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    if preset_title.strip():
-        final_title = preset_title.strip()
-    else:
-        _, _, enabled_effect_names = build_designer_chain(
-            chorus_subtle_enable, chorus_subtle_rate_hz, chorus_subtle_depth, chorus_subtle_mix,
-            chorus_intense_enable, chorus_intense_rate_hz, chorus_intense_depth, chorus_intense_mix,
-            compressor_enable, comp_threshold_db, comp_ratio, comp_attack_ms, comp_release_ms,
-            delay_single_enable, delay_single_delay_seconds, delay_single_feedback, delay_single_mix,
-            delay_multi_enable, delay_multi_1_delay_seconds, delay_multi_1_feedback, delay_multi_1_mix,
-            delay_multi_2_delay_seconds, delay_multi_2_feedback, delay_multi_2_mix,
-            distortion_mild_enable, distortion_mild_drive_db,
-            distortion_heavy_enable, distortion_heavy_drive_db,
-            filters_enable, filters_highpass_cutoff, filters_lowpass_cutoff,
-            ladder_filter_enable, ladder_cutoff_hz, ladder_resonance, ladder_drive,
-            phaser_enable, phaser_rate_hz, phaser_depth, phaser_feedback, phaser_mix,
-            reverb_small_enable, reverb_small_room_size, reverb_small_damping, reverb_small_width, reverb_small_wet_level,
-            reverb_large_enable, reverb_large_room_size, reverb_large_damping, reverb_large_width, reverb_large_wet_level,
-            pitch_shift_up_enable, pitch_shift_down_enable, pitch_shift_up_value, pitch_shift_down_value
-        )
-        if enabled_effect_names:
-            final_title = "_".join(enabled_effect_names) + "_" + now
-        else:
-            final_title = "Preset_" + now
-
-    output_filename = f"{final_title}_{now}.wav"
-    sf.write(output_filename, processed_audio, sample_rate)
-    return output_filename
-
-def save_preset(preset_title,
-    # Chorus Subtle
-    chorus_subtle_enable, chorus_subtle_rate_hz, chorus_subtle_depth, chorus_subtle_mix,
-    # Chorus Intense
-    chorus_intense_enable, chorus_intense_rate_hz, chorus_intense_depth, chorus_intense_mix,
-    # Compressor
-    compressor_enable, comp_threshold_db, comp_ratio, comp_attack_ms, comp_release_ms,
-    # Delay Single
-    delay_single_enable, delay_single_delay_seconds, delay_single_feedback, delay_single_mix,
-    # Delay Multi
-    delay_multi_enable, delay_multi_1_delay_seconds, delay_multi_1_feedback, delay_multi_1_mix,
-    delay_multi_2_delay_seconds, delay_multi_2_feedback, delay_multi_2_mix,
-    # Distortion Mild
-    distortion_mild_enable, distortion_mild_drive_db,
-    # Distortion Heavy
-    distortion_heavy_enable, distortion_heavy_drive_db,
-    # Filters
-    filters_enable, filters_highpass_cutoff, filters_lowpass_cutoff,
-    # Ladder Filter
-    ladder_filter_enable, ladder_cutoff_hz, ladder_resonance, ladder_drive,
-    # Phaser
-    phaser_enable, phaser_rate_hz, phaser_depth, phaser_feedback, phaser_mix,
-    # Reverb Small
-    reverb_small_enable, reverb_small_room_size, reverb_small_damping, reverb_small_width, reverb_small_wet_level,
-    # Reverb Large
-    reverb_large_enable, reverb_large_room_size, reverb_large_damping, reverb_large_width, reverb_large_wet_level,
-    # Pitch Shifts
-    pitch_shift_up_enable, pitch_shift_down_enable, pitch_shift_up_value, pitch_shift_down_value
-):
-    preview = generate_preset_preview(preset_title,
-        chorus_subtle_enable, chorus_subtle_rate_hz, chorus_subtle_depth, chorus_subtle_mix,
-        chorus_intense_enable, chorus_intense_rate_hz, chorus_intense_depth, chorus_intense_mix,
-        compressor_enable, comp_threshold_db, comp_ratio, comp_attack_ms, comp_release_ms,
-        delay_single_enable, delay_single_delay_seconds, delay_single_feedback, delay_single_mix,
-        delay_multi_enable, delay_multi_1_delay_seconds, delay_multi_1_feedback, delay_multi_1_mix,
-        delay_multi_2_delay_seconds, delay_multi_2_feedback, delay_multi_2_mix,
-        distortion_mild_enable, distortion_mild_drive_db,
-        distortion_heavy_enable, distortion_heavy_drive_db,
-        filters_enable, filters_highpass_cutoff, filters_lowpass_cutoff,
-        ladder_filter_enable, ladder_cutoff_hz, ladder_resonance, ladder_drive,
-        phaser_enable, phaser_rate_hz, phaser_depth, phaser_feedback, phaser_mix,
-        reverb_small_enable, reverb_small_room_size, reverb_small_damping, reverb_small_width, reverb_small_wet_level,
-        reverb_large_enable, reverb_large_room_size, reverb_large_damping, reverb_large_width, reverb_large_wet_level,
-        pitch_shift_up_enable, pitch_shift_down_enable, pitch_shift_up_value, pitch_shift_down_value
-    )
+        yield None, "", ""
+        return
+    decoded = load_input(audio_input, request)
+    yield from render_designer(decoded.sample_rate, decoded.audio_data, title, settings, request,
+                               input_key=decoded.key, output_format=output_format, loudness=loudness)
+
+def preview_designer(audio_input, title, settings, output_format, loudness, preview_rate, excerpt_start,
+                     excerpt_length, request: gr.Request = None):
+    """Draft version of process_designer: renders a downsampled excerpt."""
+    if audio_input is None:
+        yield None, "", ""
+        return
+    decoded = load_input(audio_input, request)
+    sample_rate, audio_data = draft_audio(decoded.audio_data, decoded.sample_rate, preview_rate, excerpt_start, excerpt_length)
+    yield from render_designer(sample_rate, audio_data, title, settings, request, draft=True,
+                               output_format=output_format, loudness=loudness)
+
+def save_preset(title, settings):
+    preview = generate_preset_preview(title, settings)
     final_title = preview.splitlines()[0].lstrip("# ").strip()
-    filename = f"{final_title}.pdl"
+    filename = os.path.join(PRESET_DIR, f"{final_title.replace(os.sep, '_')}.pdl")
     try:
         with open(filename, "w") as f:
             f.write(preview)
+        # Index it now so it shows up in the pickers without waiting for the next poll.
+        preset_catalog.refresh_path(filename)
         return f"Preset saved to {filename}"
     except Exception as e:
         return f"Error saving preset: {e}"
 
+preset_catalog.start_watcher()
+
 with gr.Blocks() as demo:
     gr.Markdown("## Pedalboard Audio Effects Demo")
     with gr.Tabs():
         with gr.Tab("Effects Demo"):
             with gr.Row():
-                audio_input = gr.Audio(type="numpy", label="Input Audio (upload or record)")
-                effect_select = gr.Dropdown(choices=load_effect_presets(), label="Select an Effect (.pdl)")
+                audio_input = gr.Audio(type="filepath", label="Input Audio (upload or record)")
+                with gr.Column():
+                    effect_select = preset_picker("Select an Effect (.pdl)")
             output_audio = gr.Audio(label="Processed Audio", type="filepath")
-            process_button = gr.Button("Process Audio")
-            process_button.click(process_effect, inputs=[audio_input, effect_select], outputs=output_audio)
+            output_format = gr.Dropdown(choices=[(f.label, name) for name, f in OUTPUT_FORMATS.items()],
+                                        value=DEFAULT_OUTPUT_FORMAT, label="Output Format")
+            loudness = gr.Dropdown(choices=loudness_choices(), value=loudness_choice(DEFAULT_LOUDNESS_TARGET),
+                                   label="Loudness Target")
+            with gr.Accordion("Draft Settings", open=False):
+                with gr.Row():
+                    preview_rate = gr.Dropdown(choices=DRAFT_SAMPLE_RATES, value=DRAFT_SAMPLE_RATE,
+                                                label="Preview Sample Rate (Hz)")
+                    excerpt_start = gr.Number(value=0, label="Excerpt Start (s)")
+                    excerpt_length = gr.Number(value=DRAFT_EXCERPT_SECONDS, label="Excerpt Length (s, 0 = whole file)")
+            with gr.Row():
+                draft_button = gr.Button("Draft Preview")
+                process_button = gr.Button("Process Audio (Final)")
+            cancel_button = gr.Button("Cancel")
+            render_status = gr.Markdown()
+            with gr.Accordion("Render Stats", open=False):
+                render_stats = gr.Markdown()
+            view_start, view_length, input_overview, output_overview = overview_panel()
+            overview_inputs = [audio_input, output_audio, view_start, view_length]
+            draft_event = draft_button.click(preview_effect,
+                inputs=[audio_input, effect_select, output_format, loudness, preview_rate, excerpt_start,
+                        excerpt_length],
+                outputs=[output_audio, render_stats, render_status], concurrency_limit=None)
+            draft_event.then(show_overview, inputs=overview_inputs, outputs=[input_overview, output_overview])
+            process_event = process_button.click(process_effect,
+                inputs=[audio_input, effect_select, output_format, loudness],
+                outputs=[output_audio, render_stats, render_status], concurrency_limit=None)
+            process_event.then(show_overview, inputs=overview_inputs, outputs=[input_overview, output_overview])
+            cancel_button.click(None, None, None, cancels=[draft_event, process_event])
+            for control in (view_start, view_length):
+                control.change(show_overview, inputs=overview_inputs, outputs=[input_overview, output_overview],
+                    queue=False, show_progress="hidden", trigger_mode="always_last")
+
+        with gr.Tab("Audition"):
+            gr.Markdown("## Audition: Compare Presets")
+            with gr.Row():
+                audition_audio_input = gr.Audio(type="numpy", label="Input Audio (Audition)")
+                with gr.Column():
+                    audition_effects = preset_picker("Presets to Audition (.pdl)", multiselect=True)
+            audition_button = gr.Button("Audition Presets")
+            audition_files = gr.File(label="Rendered Presets", file_count="multiple")
+            audition_status = gr.Markdown()
+            audition_button.click(process_audition, inputs=[audition_audio_input, audition_effects],
+                outputs=[audition_files, audition_status], concurrency_limit=None)
         
+        with gr.Tab("Live"):
+            gr.Markdown("## Live: Monitor the Microphone Through a Preset")
+            with gr.Row():
+                live_input = gr.Audio(sources=["microphone"], type="numpy", streaming=True, label="Microphone")
+                with gr.Column():
+                    live_effect = preset_picker("Select an Effect (.pdl)")
+                    live_block_size = gr.Slider(256, 8192, value=DEFAULT_LIVE_BLOCK_SIZE, step=256,
+                                                label="Block Size (frames)")
+            live_output = gr.Audio(label="Processed Audio", streaming=True, autoplay=True)
+            live_latency = gr.Markdown()
+            live_session = gr.State(None)
+            live_input.stream(process_live, inputs=[live_input, live_effect, live_block_size, live_session],
+                outputs=[live_output, live_session, live_latency], stream_every=LIVE_CHUNK_SECONDS)
+            live_input.stop_recording(lambda: None, None, live_session)
+
         with gr.Tab("Designer"):
             gr.Markdown("## Designer: Create New Presets")
-            preset_title = gr.Textbox(label="Preset Title", placeholder="Enter preset title (or leave blank for default)")
-            
-            gr.Markdown("### Chorus Subtle")
-            chorus_subtle_enable = gr.Checkbox(label="Enable Chorus Subtle", value=False)
-            chorus_subtle_rate_hz = gr.Slider(0, 5, value=1.0, label="Rate (Hz)")
-            chorus_subtle_depth = gr.Slider(0, 1, value=0.25, label="Depth")
-            chorus_subtle_mix = gr.Slider(0, 1, value=0.3, label="Mix")
-            
-            gr.Markdown("### Chorus Intense")
-            chorus_intense_enable = gr.Checkbox(label="Enable Chorus Intense", value=False)
-            chorus_intense_rate_hz = gr.Slider(0, 5, value=3.0, label="Rate (Hz)")
-            chorus_intense_depth = gr.Slider(0, 1, value=0.8, label="Depth")
-            chorus_intense_mix = gr.Slider(0, 1, value=0.7, label="Mix")
-            
-            gr.Markdown("### Compressor")
-            compressor_enable = gr.Checkbox(label="Enable Compressor", value=False)
-            comp_threshold_db = gr.Slider(-60, 0, value=-20, label="Threshold (dB)")
-            comp_ratio = gr.Slider(1, 20, value=4, label="Ratio")
-            comp_attack_ms = gr.Slider(1, 50, value=5, label="Attack (ms)")
-            comp_release_ms = gr.Slider(50, 500, value=100, label="Release (ms)")
-            
-            gr.Markdown("### Delay Single")
-            delay_single_enable = gr.Checkbox(label="Enable Delay Single", value=False)
-            delay_single_delay_seconds = gr.Slider(0, 1, value=0.3, label="Delay (seconds)")
-            delay_single_feedback = gr.Slider(0, 1, value=0.4, label="Feedback")
-            delay_single_mix = gr.Slider(0, 1, value=0.4, label="Mix")
-            
-            gr.Markdown("### Delay Multi")
-            delay_multi_enable = gr.Checkbox(label="Enable Delay Multi", value=False)
-            gr.Markdown("#### First Delay")
-            delay_multi_1_delay_seconds = gr.Slider(0, 1, value=0.2, label="Delay (seconds)")
-            delay_multi_1_feedback = gr.Slider(0, 1, value=0.3, label="Feedback")
-            delay_multi_1_mix = gr.Slider(0, 1, value=0.3, label="Mix")
-            gr.Markdown("#### Second Delay")
-            delay_multi_2_delay_seconds = gr.Slider(0, 1, value=0.4, label="Delay (seconds)")
-            delay_multi_2_feedback = gr.Slider(0, 1, value=0.2, label="Feedback")
-            delay_multi_2_mix = gr.Slider(0, 1, value=0.2, label="Mix")
-            
-            gr.Markdown("### Distortion Mild")
-            distortion_mild_enable = gr.Checkbox(label="Enable Distortion Mild", value=False)
-            distortion_mild_drive_db = gr.Slider(0, 30, value=10, label="Drive (dB)")
-            
-            gr.Markdown("### Distortion Heavy")
-            distortion_heavy_enable = gr.Checkbox(label="Enable Distortion Heavy", value=False)
-            distortion_heavy_drive_db = gr.Slider(0, 30, value=25, label="Drive (dB)")
-            
-            gr.Markdown("### Filters")
-            filters_enable = gr.Checkbox(label="Enable Filters", value=False)
-            filters_highpass_cutoff = gr.Slider(20, 2000, value=500, label="Highpass Cutoff (Hz)")
-            filters_lowpass_cutoff = gr.Slider(2000, 20000, value=5000, label="Lowpass Cutoff (Hz)")
-            
-            gr.Markdown("### Ladder Filter")
-            ladder_filter_enable = gr.Checkbox(label="Enable Ladder Filter", value=False)
-            ladder_cutoff_hz = gr.Slider(20, 20000, value=1000, label="Cutoff (Hz)")
-            ladder_resonance = gr.Slider(0, 1, value=0.7, label="Resonance")
-            ladder_drive = gr.Slider(0, 3, value=1.5, label="Drive")
-            
-            gr.Markdown("### Phaser")
-            phaser_enable = gr.Checkbox(label="Enable Phaser", value=False)
-            phaser_rate_hz = gr.Slider(0, 5, value=1.0, label="Rate (Hz)")
-            phaser_depth = gr.Slider(0, 1, value=0.5, label="Depth")
-            phaser_feedback = gr.Slider(0, 1, value=0.5, label="Feedback")
-            phaser_mix = gr.Slider(0, 1, value=0.5, label="Mix")
-            
-            gr.Markdown("### Reverb Small")
-            reverb_small_enable = gr.Checkbox(label="Enable Reverb Small", value=False)
-            reverb_small_room_size = gr.Slider(0, 1, value=0.3, label="Room Size")
-            reverb_small_damping = gr.Slider(0, 1, value=0.5, label="Damping")
-            reverb_small_width = gr.Slider(0, 1, value=0.7, label="Width")
-            reverb_small_wet_level = gr.Slider(0, 1, value=0.4, label="Wet Level")
-            
-            gr.Markdown("### Reverb Large")
-            reverb_large_enable = gr.Checkbox(label="Enable Reverb Large", value=False)
-            reverb_large_room_size = gr.Slider(0, 1, value=0.9, label="Room Size")
-            reverb_large_damping = gr.Slider(0, 1, value=0.2, label="Damping")
-            reverb_large_width = gr.Slider(0, 1, value=1.0, label="Width")
-            reverb_large_wet_level = gr.Slider(0, 1, value=0.5, label="Wet Level")
-            
-            gr.Markdown("### Pitch Shift Up")
-            pitch_shift_up_enable = gr.Checkbox(label="Enable Pitch Shift Up", value=False)
-            pitch_shift_up_value = gr.Slider(1, 12, value=12, label="Semitones (Up)")
-            
-            gr.Markdown("### Pitch Shift Down")
-            pitch_shift_down_enable = gr.Checkbox(label="Enable Pitch Shift Down", value=False)
-            pitch_shift_down_value = gr.Slider(-12, -1, value=-12, label="Semitones (Down)")
-            
+            preset_title_box = gr.Textbox(label="Preset Title", placeholder="Enter preset title (or leave blank for default)")
+            designer_settings = gr.State(default_settings())
+
+            for effect in DESIGNER_EFFECTS:
+                gr.Markdown(f"### {effect.title}")
+                enable = gr.Checkbox(label=f"Enable {effect.title}", value=False)
+                enable.change(update_setting(enable_key(effect)), inputs=[enable, designer_settings],
+                    outputs=designer_settings, queue=False, show_progress="hidden", trigger_mode="always_last")
+                for slot in effect.slots:
+                    if slot.heading:
+                        gr.Markdown(f"#### {slot.heading}")
+                    for param in slot.params:
+                        slider = gr.Slider(param.minimum, param.maximum, value=param.default, label=param.label)
+                        slider.change(update_setting(param_key(slot, param)), inputs=[slider, designer_settings],
+                            outputs=designer_settings, queue=False, show_progress="hidden", trigger_mode="always_last")
+
             preview_button = gr.Button("Preview Preset")
             preset_preview_box = gr.Textbox(label="Preset Preview", lines=4)
-            preview_button.click(generate_preset_preview, 
-                inputs=[preset_title,
-                        chorus_subtle_enable, chorus_subtle_rate_hz, chorus_subtle_depth, chorus_subtle_mix,
-                        chorus_intense_enable, chorus_intense_rate_hz, chorus_intense_depth, chorus_intense_mix,
-                        compressor_enable, comp_threshold_db, comp_ratio, comp_attack_ms, comp_release_ms,
-                        delay_single_enable, delay_single_delay_seconds, delay_single_feedback, delay_single_mix,
-                        delay_multi_enable, delay_multi_1_delay_seconds, delay_multi_1_feedback, delay_multi_1_mix,
-                        delay_multi_2_delay_seconds, delay_multi_2_feedback, delay_multi_2_mix,
-                        distortion_mild_enable, distortion_mild_drive_db,
-                        distortion_heavy_enable, distortion_heavy_drive_db,
-                        filters_enable, filters_highpass_cutoff, filters_lowpass_cutoff,
-                        ladder_filter_enable, ladder_cutoff_hz, ladder_resonance, ladder_drive,
-                        phaser_enable, phaser_rate_hz, phaser_depth, phaser_feedback, phaser_mix,
-                        reverb_small_enable, reverb_small_room_size, reverb_small_damping, reverb_small_width, reverb_small_wet_level,
-                        reverb_large_enable, reverb_large_room_size, reverb_large_damping, reverb_large_width, reverb_large_wet_level,
-                        pitch_shift_up_enable, pitch_shift_down_enable, pitch_shift_up_value, pitch_shift_down_value],
+            preview_button.click(generate_preset_preview, inputs=[preset_title_box, designer_settings],
                 outputs=preset_preview_box)
-            
-            designer_audio_input = gr.Audio(type="numpy", label="Input Audio (Designer)")
+
+            designer_audio_input = gr.Audio(type="filepath", label="Input Audio (Designer)")
             designer_output_audio = gr.Audio(label="Processed Audio (Designer)", type="filepath")
-            process_designer_button = gr.Button("Process Audio (Designer)")
-            process_designer_button.click(process_designer, 
-                inputs=[designer_audio_input, preset_title,
-                        chorus_subtle_enable, chorus_subtle_rate_hz, chorus_subtle_depth, chorus_subtle_mix,
-                        chorus_intense_enable, chorus_intense_rate_hz, chorus_intense_depth, chorus_intense_mix,
-                        compressor_enable, comp_threshold_db, comp_ratio, comp_attack_ms, comp_release_ms,
-                        delay_single_enable, delay_single_delay_seconds, delay_single_feedback, delay_single_mix,
-                        delay_multi_enable, delay_multi_1_delay_seconds, delay_multi_1_feedback, delay_multi_1_mix,
-                        delay_multi_2_delay_seconds, delay_multi_2_feedback, delay_multi_2_mix,
-                        distortion_mild_enable, distortion_mild_drive_db,
-                        distortion_heavy_enable, distortion_heavy_drive_db,
-                        filters_enable, filters_highpass_cutoff, filters_lowpass_cutoff,
-                        ladder_filter_enable, ladder_cutoff_hz, ladder_resonance, ladder_drive,
-                        phaser_enable, phaser_rate_hz, phaser_depth, phaser_feedback, phaser_mix,
-                        reverb_small_enable, reverb_small_room_size, reverb_small_damping, reverb_small_width, reverb_small_wet_level,
-                        reverb_large_enable, reverb_large_room_size, reverb_large_damping, reverb_large_width, reverb_large_wet_level,
-                        pitch_shift_up_enable, pitch_shift_down_enable, pitch_shift_up_value, pitch_shift_down_value],
-                outputs=designer_output_audio)
-            
+            designer_output_format = gr.Dropdown(choices=[(f.label, name) for name, f in OUTPUT_FORMATS.items()],
+                                                 value=DEFAULT_OUTPUT_FORMAT, label="Output Format (Designer)")
+            designer_loudness = gr.Dropdown(choices=loudness_choices(), value=loudness_choice(DEFAULT_LOUDNESS_TARGET),
+                                            label="Loudness Target (Designer)")
+            designer_cancel_button = gr.Button("Cancel (Designer)")
+            designer_render_status = gr.Markdown()
+            with gr.Accordion("Render Stats (Designer)", open=False):
+                designer_render_stats = gr.Markdown()
+            with gr.Accordion("Draft Settings (Designer)", open=False):
+                with gr.Row():
+                    designer_preview_rate = gr.Dropdown(choices=DRAFT_SAMPLE_RATES, value=DRAFT_SAMPLE_RATE,
+                                                label="Preview Sample Rate (Hz)")
+                    designer_excerpt_start = gr.Number(value=0, label="Excerpt Start (s)")
+                    designer_excerpt_length = gr.Number(value=DRAFT_EXCERPT_SECONDS, label="Excerpt Length (s, 0 = whole file)")
+            with gr.Row():
+                draft_designer_button = gr.Button("Draft Preview (Designer)")
+                process_designer_button = gr.Button("Process Audio (Designer, Final)")
+            draft_designer_event = draft_designer_button.click(preview_designer,
+                inputs=[designer_audio_input, preset_title_box, designer_settings, designer_output_format,
+                        designer_loudness, designer_preview_rate, designer_excerpt_start, designer_excerpt_length],
+                outputs=[designer_output_audio, designer_render_stats, designer_render_status],
+                concurrency_limit=None)
+            process_designer_event = process_designer_button.click(process_designer,
+                inputs=[designer_audio_input, preset_title_box, designer_settings, designer_output_format,
+                        designer_loudness],
+                outputs=[designer_output_audio, designer_render_stats, designer_render_status],
+                concurrency_limit=None)
+            designer_cancel_button.click(None, None, None, cancels=[draft_designer_event, process_designer_event])
+            (designer_view_start, designer_view_length, designer_input_overview,
+             designer_output_overview) = overview_panel(" (Designer)")
+            designer_overview_inputs = [designer_audio_input, designer_output_audio, designer_view_start,
+                                        designer_view_length]
+            for event in (draft_designer_event, process_designer_event):
+                event.then(show_overview, inputs=designer_overview_inputs,
+                    outputs=[designer_input_overview, designer_output_overview])
+            for control in (designer_view_start, designer_view_length):
+                control.change(show_overview, inputs=designer_overview_inputs,
+                    outputs=[designer_input_overview, designer_output_overview],
+                    queue=False, show_progress="hidden", trigger_mode="always_last")
+
             save_button = gr.Button("Save Preset")
             save_message = gr.Textbox(label="Save Preset Message")
-            save_button.click(save_preset, 
-                inputs=[preset_title,
-                        chorus_subtle_enable, chorus_subtle_rate_hz, chorus_subtle_depth, chorus_subtle_mix,
-                        chorus_intense_enable, chorus_intense_rate_hz, chorus_intense_depth, chorus_intense_mix,
-                        compressor_enable, comp_threshold_db, comp_ratio, comp_attack_ms, comp_release_ms,
-                        delay_single_enable, delay_single_delay_seconds, delay_single_feedback, delay_single_mix,
-                        delay_multi_enable, delay_multi_1_delay_seconds, delay_multi_1_feedback, delay_multi_1_mix,
-                        delay_multi_2_delay_seconds, delay_multi_2_feedback, delay_multi_2_mix,
-                        distortion_mild_enable, distortion_mild_drive_db,
-                        distortion_heavy_enable, distortion_heavy_drive_db,
-                        filters_enable, filters_highpass_cutoff, filters_lowpass_cutoff,
-                        ladder_filter_enable, ladder_cutoff_hz, ladder_resonance, ladder_drive,
-                        phaser_enable, phaser_rate_hz, phaser_depth, phaser_feedback, phaser_mix,
-                        reverb_small_enable, reverb_small_room_size, reverb_small_damping, reverb_small_width, reverb_small_wet_level,
-                        reverb_large_enable, reverb_large_room_size, reverb_large_damping, reverb_large_width, reverb_large_wet_level,
-                        pitch_shift_up_enable, pitch_shift_down_enable, pitch_shift_up_value, pitch_shift_down_value],
-                outputs=save_message)
-                
-demo.launch()
+            save_button.click(save_preset, inputs=[preset_title_box, designer_settings], outputs=save_message)
+
+    demo.unload(end_session)
+
+registry.register_gauge("pedalboard_preset_catalog", "Preset catalog size and refresh counters.", preset_catalog.stats)
+registry.register_gauge("pedalboard_preset_cache", "Compiled preset cache counters.", preset_cache.stats)
+registry.register_gauge("pedalboard_stage_cache", "Designer stage cache counters.", stage_cache.stats)
+registry.register_gauge("pedalboard_plugin_pools", "Designer plugin pool counters.", plugin_pools.stats)
+registry.register_gauge("pedalboard_input_store", "Decoded upload store counters.", input_store.stats)
+registry.register_gauge("pedalboard_output_store", "Output directory disk usage and janitor evictions.", output_store.stats)
+registry.register_gauge("pedalboard_render_cache", "Content-addressed render cache counters.", render_cache.stats)
+registry.register_gauge("pedalboard_api_jobs", "Job API jobs by status.", api_jobs.stats)
+start_metrics_server()
+output_store.start_janitor()
+if API_ENABLED:
+    start_api_server()
+# Scheduled handlers opt out of this limit; the render scheduler enforces theirs.
+demo.queue(default_concurrency_limit=UNSCHEDULED_CONCURRENCY)
+demo.launch(allowed_paths=[output_store.directory])
@@ -0,0 +1,64 @@
+import os
+import time
+from functools import partial
+from catalog import PRESET_DIR
+from metrics import RenderStats
+from presets import preset_cache
+from render import render_preset
+from scheduler import RenderCancelled, estimate_cost, scheduler
+
+# Seconds between checks for finished audition jobs.
+AUDITION_POLL_SECONDS = 0.2
+
+
+def _render_timed(effect, audio_data, sample_rate):
+    """Renders one preset and returns (output_path, seconds, error)."""
+    start = time.perf_counter()
+    output_filename = os.path.splitext(effect)[0] + ".wav"
+    stats = RenderStats("audition")
+    try:
+        output_path = render_preset(effect, audio_data, sample_rate, output_filename, stats)
+    except Exception as e:
+        return None, time.perf_counter() - start, str(e)
+    stats.finish()
+    return output_path, time.perf_counter() - start, None
+
+
+def audition(audio_data, sample_rate, effects, user="local"):
+    """
+    Renders several .pdl presets on the same channels-first input and yields
+    (effect, output_path, seconds, error) as each one finishes. Every preset is a job
+    on the shared render scheduler, so auditions share its worker pool, per-session
+    limit and admission control with the other tabs; all jobs share one read-only
+    view of the input. Outputs are named after the .pdl file so presets that share an
+    output name do not overwrite each other. Closing the generator cancels the jobs
+    that have not finished.
+    """
+    if not effects:
+        return
+    shared = audio_data.view()
+    shared.flags.writeable = False
+    jobs = {}
+    try:
+        for effect in effects:
+            try:
+                chain_length = len(preset_cache.get(os.path.join(PRESET_DIR, effect)).chain)
+                cost = estimate_cost(shared.shape[1], sample_rate, shared.shape[0], chain_length)
+                job = scheduler.submit(user, cost, partial(_render_timed, effect, shared, sample_rate))
+            except Exception as e:
+                yield effect, None, 0.0, str(e)
+                continue
+            jobs[job] = effect
+        pending = list(jobs)
+        while pending:
+            pending[0].wait(AUDITION_POLL_SECONDS)
+            for job in [job for job in pending if job.done]:
+                pending.remove(job)
+                try:
+                    yield (jobs[job],) + job.result()
+                except RenderCancelled:
+                    yield jobs[job], None, 0.0, "Render cancelled"
+    finally:
+        for job in jobs:
+            if not job.done:
+                scheduler.cancel(job)
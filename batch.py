@@ -0,0 +1,197 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import soundfile as sf
+from catalog import PRESET_DIR
+from plan import PedalboardDemo
+from presets import build_board, preset_cache
+from render import render_file
+
+PROGRESS_FILE = ".batch_progress.jsonl"
+# Bytes per input sample needed by an in-memory render: the float64 read, its
+# float32 channels-first copy and the processed output with its tail.
+IN_MEMORY_BYTES_PER_SAMPLE = 16
+
+
+def expand_globs(patterns):
+    """Expands glob patterns into a sorted, de-duplicated list of files."""
+    paths = set()
+    for pattern in patterns:
+        paths.update(p for p in glob.glob(pattern, recursive=True) if os.path.isfile(p))
+    return sorted(paths)
+
+
+def file_signature(path):
+    st = os.stat(path)
+    return [st.st_mtime_ns, st.st_size]
+
+
+def job_key(input_path, preset_path):
+    """
+    Identifies a (file, preset) job by both paths and their mtime/size, so editing
+    either one makes the job run again on resume.
+    """
+    return json.dumps([os.path.abspath(input_path), file_signature(input_path),
+                       os.path.abspath(preset_path), file_signature(preset_path)])
+
+
+def output_name(input_path, preset_path):
+    input_stem = os.path.splitext(os.path.basename(input_path))[0]
+    preset_stem = os.path.splitext(os.path.basename(preset_path))[0]
+    return f"{input_stem}__{preset_stem}.wav"
+
+
+class Progress:
+    """
+    Append-only JSON-lines log of finished jobs in the output directory. A job counts
+    as done only if its entry exists and its output file is still on disk.
+    """
+
+    def __init__(self, output_dir):
+        self.path = os.path.join(output_dir, PROGRESS_FILE)
+        self.done = {}
+        self._lock = threading.Lock()
+        if os.path.exists(self.path):
+            with open(self.path, "r") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # a crash mid-write can leave a truncated last line
+                    self.done[entry["key"]] = entry
+
+    def is_done(self, key):
+        entry = self.done.get(key)
+        return entry is not None and os.path.exists(entry["output"])
+
+    def record(self, key, result):
+        entry = dict(result, key=key)
+        with self._lock:
+            self.done[key] = entry
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+
+
+def run_job(input_path, preset_path, output_path, memory_limit=None):
+    """
+    Renders one (file, preset) job. Files whose in-memory render fits the per-job memory
+    limit go through PedalboardDemo; larger files are streamed block by block, which keeps
+    the job's working set to a few blocks whatever the file length. Both keep the same
+    effect tail, skip the same silence and write the same format, so the limit only
+    changes how a job is computed, not its output. Every job renders on a board of its
+    own, so thread workers can run the same preset in parallel. The output is written
+    under a temporary name and moved into place only once complete.
+    """
+    start = time.perf_counter()
+    info = sf.info(input_path)
+    output_dir, filename = os.path.split(output_path)
+    partial_name = f".{os.path.splitext(filename)[0]}.partial.wav"
+    partial_path = os.path.join(output_dir, partial_name)
+    needed = info.frames * info.channels * IN_MEMORY_BYTES_PER_SAMPLE
+    if memory_limit is None or needed <= memory_limit:
+        PedalboardDemo(input_path, output_dir).apply_preset(preset_path, partial_name)
+        mode = "memory"
+    else:
+        render_file(build_board(preset_cache.get(preset_path).chain), input_path, partial_path)
+        mode = "stream"
+    os.replace(partial_path, output_path)
+    return {
+        "input": input_path,
+        "preset": preset_path,
+        "output": output_path,
+        "mode": mode,
+        "audio_seconds": info.frames / info.samplerate,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def run_batch(input_patterns, preset_patterns, output_dir, workers=None,
+              executor="process", memory_limit=None, log=print):
+    """
+    Schedules every (input file, preset) pair on a process or thread pool, skipping
+    jobs already recorded in the output directory's progress log. Returns a summary
+    with realtime factor and files/sec for the jobs run in this session.
+    """
+    inputs = expand_globs(input_patterns)
+    presets = [p for p in expand_globs(preset_patterns) if p.endswith(".pdl")]
+    os.makedirs(output_dir, exist_ok=True)
+    progress = Progress(output_dir)
+
+    jobs = []
+    skipped = 0
+    for input_path in inputs:
+        for preset_path in presets:
+            key = job_key(input_path, preset_path)
+            if progress.is_done(key):
+                skipped += 1
+                continue
+            jobs.append((key, input_path, preset_path, os.path.join(output_dir, output_name(input_path, preset_path))))
+    log(f"{len(inputs)} files x {len(presets)} presets: {len(jobs)} jobs to run, {skipped} already done")
+
+    workers = workers or os.cpu_count() or 1
+    if executor == "process":
+        pool = ProcessPoolExecutor(max_workers=workers)
+    else:
+        pool = ThreadPoolExecutor(max_workers=workers)
+
+    start = time.perf_counter()
+    audio_seconds = 0.0
+    completed = 0
+    failed = 0
+    with pool:
+        futures = {pool.submit(run_job, input_path, preset_path, output_path, memory_limit): (key, input_path, preset_path)
+                   for key, input_path, preset_path, output_path in jobs}
+        for future in as_completed(futures):
+            key, input_path, preset_path = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                failed += 1
+                log(f"FAILED {input_path} x {preset_path}: {e}")
+                continue
+            progress.record(key, result)
+            completed += 1
+            audio_seconds += result["audio_seconds"]
+            log(f"[{completed + failed}/{len(jobs)}] {result['output']} ({result['mode']}, {result['seconds']:.2f}s)")
+
+    elapsed = time.perf_counter() - start
+    summary = {
+        "completed": completed,
+        "failed": failed,
+        "skipped": skipped,
+        "seconds": elapsed,
+        "audio_seconds": audio_seconds,
+        "realtime_factor": audio_seconds / elapsed if elapsed > 0 else 0.0,
+        "files_per_second": completed / elapsed if elapsed > 0 else 0.0,
+    }
+    log(f"Done: {completed} rendered, {failed} failed, {skipped} skipped in {elapsed:.2f}s "
+        f"({summary['realtime_factor']:.1f}x realtime, {summary['files_per_second']:.2f} files/sec)")
+    return summary
+
+
+def main():
+    """Command line entry point for batch rendering."""
+    parser = argparse.ArgumentParser(description="Render many audio files with many .pdl presets.")
+    parser.add_argument("-i", "--input", action="append", required=True,
+                        help="Input file glob, e.g. 'stems/**/*.wav' (repeatable)")
+    parser.add_argument("-p", "--preset", action="append", default=None,
+                        help="Preset glob (repeatable, default: pedalboard/*.pdl)")
+    parser.add_argument("-o", "--output-dir", default="batch_output", help="Directory for rendered files")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Pool size (default: CPU count)")
+    parser.add_argument("--executor", choices=["process", "thread"], default="process")
+    parser.add_argument("--memory-limit-mb", type=int, default=None,
+                        help="Per-job memory budget; files that would not fit are streamed instead")
+    args = parser.parse_args()
+
+    memory_limit = args.memory_limit_mb * 1024 * 1024 if args.memory_limit_mb else None
+    summary = run_batch(args.input, args.preset or [os.path.join(PRESET_DIR, "*.pdl")], args.output_dir,
+                        args.workers, args.executor, memory_limit)
+    sys.exit(1 if summary["failed"] else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from catalog import PRESET_DIR
+from encode import DEFAULT_OUTPUT_FORMAT
+from ingest import to_channels_first
+from loudness import LoudnessMeter, write_loudness_normalized
+from metrics import RenderStats
+from normalize import block_peak, write_normalized
+from plugin_pool import PluginPool
+from presets import ALLOWED_EFFECTS, OPTIMIZE, EffectSpec, build_board, optimize_chain, parse_chain, preset_cache
+from render import render_board
+
+SIGNALS = ["noise", "sines", "silence"]
+SAMPLE_RATES = [22050, 44100, 48000, 96000]
+STAGES = ["ingest", "build", "process", "normalize", "write"]
+
+
+def make_signal(kind, sample_rate, duration, channels, seed=0):
+    """
+    Returns int16 (samples, channels) PCM shaped like gr.Audio(type="numpy") output.
+    """
+    frames = int(sample_rate * duration)
+    if kind == "noise":
+        audio = np.random.default_rng(seed).standard_normal((frames, channels)) * 0.25
+    elif kind == "sines":
+        t = np.arange(frames) / sample_rate
+        freqs = 220.0 * (1 + np.arange(channels))
+        audio = 0.5 * np.sin(2 * np.pi * t[:, np.newaxis] * freqs)
+    elif kind == "silence":
+        audio = np.zeros((frames, channels))
+    else:
+        raise ValueError(f"Unknown signal '{kind}'")
+    return np.clip(audio * 32767, -32768, 32767).astype(np.int16)
+
+
+def benchmark_chains(preset_dir=PRESET_DIR):
+    """
+    Returns (name, chain) for every allowed effect with default parameters and
+    every shipped .pdl preset.
+    """
+    chains = [(f"effect:{name}", (EffectSpec(name, (), ()),)) for name in sorted(ALLOWED_EFFECTS)]
+    for f in sorted(os.listdir(preset_dir)):
+        if f.endswith(".pdl"):
+            chains.append((f"preset:{f}", preset_cache.get(os.path.join(preset_dir, f)).chain))
+    return chains
+
+
+def time_render(chain, pcm, sample_rate, output_path, output_format=None):
+    """
+    Times each stage of one render along the path process_effect takes: ingest, the
+    optimizer and board build, then render.render_board with its tail flush, silence
+    skipping, streaming of long clips and background encode to output_format.
+    "process" is the time spent in the effect stages, "normalize" and "write" are the
+    normalization and file I/O render_board reports (streamed renders count their
+    normalization as I/O).
+    """
+    timings = {}
+    start = time.perf_counter()
+    audio_data = to_channels_first(pcm)
+    timings["ingest"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if OPTIMIZE:
+        chain, _, _ = optimize_chain(chain)
+    board = build_board(chain)
+    timings["build"] = time.perf_counter() - start
+
+    stats = RenderStats("benchmark")
+    render_board(board, audio_data, sample_rate, output_path, stats, output_format)
+    timings["process"] = stats.stage_seconds()
+    timings["normalize"] = stats.normalize
+    timings["write"] = stats.io
+    return timings
+
+
+def run(signals, sample_rates, durations, channel_counts, repeats, chain_filter=None, output_format=None, log=print):
+    """
+    Runs the benchmark matrix and returns a JSON-serialisable report. Each case keeps
+    the fastest of `repeats` runs per stage.
+    """
+    chains = [(name, chain) for name, chain in benchmark_chains()
+              if not chain_filter or chain_filter in name]
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        output_path = os.path.join(tmp, "bench.wav")
+        for signal in signals:
+            for sample_rate in sample_rates:
+                for duration in durations:
+                    for channels in channel_counts:
+                        pcm = make_signal(signal, sample_rate, duration, channels)
+                        for name, chain in chains:
+                            runs = [time_render(chain, pcm, sample_rate, output_path, output_format)
+                                    for _ in range(repeats)]
+                            stages = {stage: min(r[stage] for r in runs) for stage in STAGES}
+                            total = sum(stages.values())
+                            results.append({
+                                "chain": name,
+                                "signal": signal,
+                                "sample_rate": sample_rate,
+                                "duration": duration,
+                                "channels": channels,
+                                "stages": stages,
+                                "total": total,
+                                "realtime_factor": duration / total if total > 0 else 0.0,
+                            })
+                            log(f"{name:36s} {signal:8s} {sample_rate:6d}Hz {duration:5.1f}s {channels}ch "
+                                f"{total * 1000:9.2f} ms  {duration / total:8.1f}x realtime")
+    return {
+        "meta": {
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "repeats": repeats,
+            "output_format": output_format or DEFAULT_OUTPUT_FORMAT,
+        },
+        "results": results,
+    }
+
+
+def case_key(result):
+    return (result["chain"], result["signal"], result["sample_rate"], result["duration"], result["channels"])
+
+
+def compare(baseline, current, threshold=0.10, min_seconds=0.001):
+    """
+    Returns a list of regression descriptions: stages (or totals) that got slower than
+    the baseline by more than `threshold` and by more than `min_seconds`.
+    """
+    base = {case_key(r): r for r in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        old = base.get(case_key(result))
+        if old is None:
+            continue
+        pairs = [(stage, old["stages"][stage], result["stages"][stage]) for stage in STAGES if stage in old["stages"]]
+        pairs.append(("total", old["total"], result["total"]))
+        for stage, before, after in pairs:
+            if after > before * (1 + threshold) and after - before > min_seconds:
+                label = "/".join(str(k) for k in case_key(result))
+                regressions.append(f"{label} {stage}: {before * 1000:.2f} ms -> {after * 1000:.2f} ms "
+                                   f"(+{(after / before - 1) * 100 if before else float('inf'):.0f}%)")
+    return regressions
+
+
+# One Designer slot per stage, with the parameter a click changes and its range.
+SETUP_SLOTS = [
+    ("Chorus Subtle", "Chorus(rate_hz={}, depth=0.25, mix=0.5)", 0.1, 5.0),
+    ("Compressor", "Compressor(threshold_db={}, ratio=4.0, attack_ms=1.0, release_ms=100.0)", -40.0, 0.0),
+    ("Delay Single", "Delay(delay_seconds={}, feedback=0.3, mix=0.5)", 0.05, 1.0),
+    ("Distortion Mild", "Distortion(drive_db={})", 0.0, 30.0),
+    ("Filters/1", "HighpassFilter(cutoff_frequency_hz={})", 20.0, 500.0),
+    ("Filters/2", "LowpassFilter(cutoff_frequency_hz={})", 2000.0, 18000.0),
+    ("Ladder Filter", "LadderFilter(mode=LadderFilter.Mode.HPF12, cutoff_hz={}, resonance=0.2, drive=1.0)", 100.0, 2000.0),
+    ("Phaser", "Phaser(rate_hz={}, depth=0.5, feedback=0.2, mix=0.5)", 0.1, 5.0),
+    ("Reverb Large", "Reverb(room_size={}, damping=0.5, width=1.0, wet_level=0.33)", 0.1, 1.0),
+    ("Pitch Shift Up", "PitchShift(semitones={})", 1.0, 12.0),
+]
+
+
+def setup_clicks(clicks):
+    """
+    Returns the parsed chain for each of `clicks` Designer clicks, each moving one
+    slider of a full chain, as the Designer would send them.
+    """
+    slots = [slot for slot, _, _, _ in SETUP_SLOTS]
+    values = [low for _, _, low, _ in SETUP_SLOTS]
+    chains = []
+    for click in range(clicks):
+        i = click % len(SETUP_SLOTS)
+        _, _, low, high = SETUP_SLOTS[i]
+        values[i] = round(low + (high - low) * ((click * 0.37) % 1.0), 3)
+        chains.append(parse_chain("[" + ", ".join(t.format(v) for (_, t, _, _), v in zip(SETUP_SLOTS, values)) + "]"))
+    return slots, chains
+
+
+def time_setup(clicks=200):
+    """
+    Compares per-click setup cost of building a fresh board against updating a
+    PluginPool in place. Allocations are Python-heap bytes seen by tracemalloc, so
+    memory the plugins allocate natively is not included.
+    """
+    slots, chains = setup_clicks(clicks)
+    pool = PluginPool()
+    strategies = [("rebuild", lambda chain: build_board(chain)), ("pool", lambda chain: pool.update(slots, chain))]
+    report = {}
+    for name, setup in strategies:
+        setup(chains[0])
+        tracemalloc.start()
+        start = time.perf_counter()
+        for chain in chains:
+            setup(chain)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        allocated = sum(stat.size for stat in snapshot.statistics("filename"))
+        report[name] = {"seconds_per_click": elapsed / clicks, "peak_bytes": peak, "retained_bytes": allocated}
+    report["pool"]["board_rebuilds"] = pool.rebuilds
+    report["pool"]["parameters_updated"] = pool.updated
+    return report
+
+
+def time_levels(duration=300.0, sample_rate=48000, channels=2, target=-14.0, block_size=65536, repeats=3):
+    """
+    Compares the peak pass of streamed peak normalization with the BS.1770 loudness
+    meter on the same blocks, then the two complete two-pass writes (spool, measure,
+    scale and encode to float WAV). Keeps the fastest of `repeats` runs of each.
+    """
+    audio_data = (np.random.default_rng(0).standard_normal((channels, int(sample_rate * duration))) * 0.25).astype(np.float32)
+
+    def blocks():
+        for start in range(0, audio_data.shape[1], block_size):
+            yield audio_data[:, start:start + block_size]
+
+    def peak_pass():
+        return max(block_peak(block) for block in blocks())
+
+    def loudness_pass():
+        meter = LoudnessMeter(sample_rate, channels)
+        for block in blocks():
+            meter.add(block)
+        return meter.measurement()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        output_path = os.path.join(tmp, "levels.wav")
+        cases = [
+            ("peak pass", peak_pass),
+            ("loudness meter", loudness_pass),
+            ("peak-normalized write", lambda: write_normalized(blocks(), output_path, sample_rate, channels)),
+            ("loudness-normalized write",
+             lambda: write_loudness_normalized(blocks(), output_path, sample_rate, channels, target)),
+        ]
+        report = {}
+        for name, case in cases:
+            seconds = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                case()
+                seconds.append(time.perf_counter() - start)
+            report[name] = {"seconds": min(seconds), "realtime_factor": duration / min(seconds)}
+    return report
+
+
+def main():
+    """Command line entry point: `run` writes a JSON report, `compare` checks it against a baseline, `setup` times Designer clicks, `levels` times loudness against peak normalization."""
+    parser = argparse.ArgumentParser(description="Benchmark per-effect and per-preset realtime factor.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="Run the benchmark matrix")
+    run_parser.add_argument("-o", "--output", default="benchmark.json")
+    run_parser.add_argument("--signals", nargs="+", choices=SIGNALS, default=SIGNALS)
+    run_parser.add_argument("--sample-rates", nargs="+", type=int, default=SAMPLE_RATES)
+    run_parser.add_argument("--durations", nargs="+", type=float, default=[5.0])
+    run_parser.add_argument("--channels", nargs="+", type=int, default=[1, 2])
+    run_parser.add_argument("--repeats", type=int, default=3)
+    run_parser.add_argument("--filter", default=None, help="Only chains whose name contains this text")
+    run_parser.add_argument("-f", "--format", default=None, help="Output format (wav, wav24, wav16, flac, ogg)")
+    run_parser.add_argument("--quick", action="store_true", help="Noise only, 44.1 kHz, 2 s stereo, 1 repeat")
+
+    setup_parser = sub.add_parser("setup", help="Per-click Designer setup cost: fresh boards vs the plugin pool")
+    setup_parser.add_argument("--clicks", type=int, default=200)
+
+    levels_parser = sub.add_parser("levels", help="Loudness metering and normalization vs the peak pass")
+    levels_parser.add_argument("--duration", type=float, default=300.0)
+    levels_parser.add_argument("--sample-rate", type=int, default=48000)
+    levels_parser.add_argument("--channels", type=int, default=2)
+    levels_parser.add_argument("--target", type=float, default=-14.0, help="Loudness target (LUFS)")
+    levels_parser.add_argument("--repeats", type=int, default=3)
+
+    compare_parser = sub.add_parser("compare", help="Flag regressions against a saved baseline")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.10, help="Allowed slowdown (0.10 = 10%%)")
+    compare_parser.add_argument("--min-ms", type=float, default=1.0, help="Ignore differences below this many ms")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        if args.quick:
+            args.signals, args.sample_rates, args.durations, args.channels, args.repeats = ["noise"], [44100], [2.0], [2], 1
+        report = run(args.signals, args.sample_rates, args.durations, args.channels, args.repeats, args.filter,
+                     args.format)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {len(report['results'])} results to {args.output}")
+    elif args.command == "setup":
+        report = time_setup(args.clicks)
+        for name, result in report.items():
+            print(f"{name:8s} {result['seconds_per_click'] * 1e6:9.1f} us/click  "
+                  f"peak {result['peak_bytes']:,} B  retained {result['retained_bytes']:,} B")
+        print(f"pool: {report['pool']['board_rebuilds']} board rebuilds, "
+              f"{report['pool']['parameters_updated']} parameter updates over {args.clicks} clicks")
+    elif args.command == "levels":
+        report = time_levels(args.duration, args.sample_rate, args.channels, args.target, repeats=args.repeats)
+        for name, result in report.items():
+            print(f"{name:26s} {result['seconds'] * 1000:9.1f} ms  {result['realtime_factor']:9.1f}x realtime")
+    else:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        with open(args.current, "r") as f:
+            current = json.load(f)
+        regressions = compare(baseline, current, args.threshold, args.min_ms / 1000)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        print(f"{len(regressions)} regressions")
+        sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import bisect
+import os
+import threading
+import time
+from collections import namedtuple
+from presets import parse_pdl
+
+PRESET_DIR = "pedalboard"
+# Seconds between polls of the preset directory for added, changed or removed files.
+CATALOG_POLL_SECONDS = float(os.environ.get("PEDALBOARD_CATALOG_POLL_SECONDS", "2"))
+CATALOG_PAGE_SIZE = int(os.environ.get("PEDALBOARD_CATALOG_PAGE_SIZE", "25"))
+
+
+class CatalogEntry(namedtuple("CatalogEntry", ["filename", "title", "effects", "summary", "output_filename",
+                                               "signature", "error"])):
+    """
+    Index record of one .pdl file. `effects` lists the effect types in chain order and
+    `summary` is a short parameter description; `error` is set, and the rest left
+    empty, when the file does not parse.
+    """
+
+    @property
+    def label(self):
+        return f"{self.title} ({', '.join(self.effects)})" if self.effects else self.title
+
+
+def _summary(chain):
+    parts = []
+    for spec in chain:
+        params = ", ".join(f"{k}={v}" for k, v in spec.kwargs)
+        parts.append(f"{spec.name}({params})" if params else spec.name)
+    return " > ".join(parts)
+
+
+def index_preset(path, signature=None):
+    """Reads a .pdl file and returns its CatalogEntry."""
+    filename = os.path.basename(path)
+    title = os.path.splitext(filename)[0]
+    try:
+        with open(path, "r") as f:
+            content = f.read()
+        first_line = content.lstrip().split("\n", 1)[0]
+        if first_line.startswith("#"):
+            title = first_line.lstrip("# ").strip() or title
+        chain, output_filename = parse_pdl(content)
+    except (OSError, ValueError) as e:
+        return CatalogEntry(filename, title, (), "", "", signature, str(e))
+    return CatalogEntry(filename, title, tuple(spec.name for spec in chain), _summary(chain),
+                        output_filename, signature, None)
+
+
+class PresetCatalog:
+    """
+    Index of the .pdl presets in a directory for searching and paging through large
+    libraries. refresh() stats every file but only re-reads those whose mtime or size
+    changed, and updates the sorted name list and search text of just those entries,
+    so the parsing cost of a poll is proportional to what changed. A background
+    watcher polls every poll_interval seconds; `version` increases on every change so
+    pickers can tell when their page is stale.
+    """
+
+    def __init__(self, directory=PRESET_DIR, poll_interval=CATALOG_POLL_SECONDS):
+        self.directory = directory
+        self.poll_interval = poll_interval
+        self.version = 0
+        self.refreshes = 0
+        self.indexed = 0
+        self.refresh_seconds = 0.0
+        self._entries = {}
+        self._search_text = {}
+        self._names = []
+        self._lock = threading.Lock()
+        self._watcher = None
+
+    def _put(self, entry):
+        # Caller holds the lock.
+        if entry.filename not in self._entries:
+            bisect.insort(self._names, entry.filename)
+        self._entries[entry.filename] = entry
+        self._search_text[entry.filename] = " ".join(
+            [entry.filename, entry.title, " ".join(entry.effects), entry.summary, entry.output_filename]).lower()
+
+    def _remove(self, filename):
+        # Caller holds the lock.
+        del self._entries[filename]
+        del self._search_text[filename]
+        del self._names[bisect.bisect_left(self._names, filename)]
+
+    def refresh(self):
+        """Brings the index up to date with the directory; returns the number of changes."""
+        start = time.perf_counter()
+        seen = {}
+        try:
+            with os.scandir(self.directory) as it:
+                for item in it:
+                    if item.name.endswith(".pdl") and item.is_file():
+                        st = item.stat()
+                        seen[item.name] = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            pass
+        with self._lock:
+            changed = [name for name, signature in seen.items()
+                       if name not in self._entries or self._entries[name].signature != signature]
+            removed = [name for name in self._entries if name not in seen]
+        entries = [index_preset(os.path.join(self.directory, name), seen[name]) for name in changed]
+        with self._lock:
+            for name in removed:
+                self._remove(name)
+            for entry in entries:
+                self._put(entry)
+            if changed or removed:
+                self.version += 1
+            self.refreshes += 1
+            self.indexed += len(entries)
+            self.refresh_seconds = time.perf_counter() - start
+        return len(changed) + len(removed)
+
+    def refresh_path(self, path):
+        """Indexes a single file right away, e.g. one the app just saved."""
+        filename = os.path.basename(path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            with self._lock:
+                if filename in self._entries:
+                    self._remove(filename)
+                    self.version += 1
+            return
+        entry = index_preset(path, (st.st_mtime_ns, st.st_size))
+        with self._lock:
+            self._put(entry)
+            self.version += 1
+            self.indexed += 1
+
+    def get(self, filename):
+        with self._lock:
+            return self._entries.get(filename)
+
+    def names(self):
+        """Returns the filenames of every preset that parses, sorted."""
+        with self._lock:
+            return [name for name in self._names if self._entries[name].error is None]
+
+    def search(self, query="", page=1, page_size=CATALOG_PAGE_SIZE):
+        """
+        Returns (entries, total, pages) for one page of the presets whose filename,
+        title, effects, parameters or output name contain every word of query.
+        Presets that fail to parse are left out.
+        """
+        terms = query.lower().split()
+        with self._lock:
+            matches = [self._entries[name] for name in self._names
+                       if self._entries[name].error is None
+                       and all(term in self._search_text[name] for term in terms)]
+        pages = max((len(matches) + page_size - 1) // page_size, 1)
+        page = min(max(int(page or 1), 1), pages)
+        return matches[(page - 1) * page_size:page * page_size], len(matches), pages
+
+    def _watch_loop(self):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Preset catalog refresh failed: {e}")
+
+    def start_watcher(self):
+        """Indexes the directory and starts the background polling thread once."""
+        if self._watcher is None:
+            self.refresh()
+            self._watcher = threading.Thread(target=self._watch_loop, daemon=True, name="preset-catalog")
+            self._watcher.start()
+
+    def stats(self):
+        with self._lock:
+            errors = sum(1 for e in self._entries.values() if e.error is not None)
+            return {"entries": len(self._entries), "errors": errors, "version": self.version,
+                    "refreshes": self.refreshes, "indexed": self.indexed,
+                    "refresh_seconds": self.refresh_seconds}
+
+
+preset_catalog = PresetCatalog()
@@ -0,0 +1,180 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import httpx
+
+API_URL = os.environ.get("PEDALBOARD_API_URL", f"http://127.0.0.1:{os.environ.get('PEDALBOARD_API_PORT', '7861')}")
+# Seconds between status polls while waiting for a job.
+POLL_SECONDS = 0.5
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class JobFailed(Exception):
+    """Raised when a job ends in any state other than finished."""
+
+
+class JobClient:
+    """
+    Client for the job API in api.py. Inputs are sent as server-side paths by default,
+    since the API normally runs on the same machine; pass upload=True to send the file.
+    The client is safe to share between threads.
+    """
+
+    def __init__(self, base_url=API_URL, client_id=None, timeout=60.0):
+        headers = {"X-Client-Id": client_id} if client_id else {}
+        self.http = httpx.Client(base_url=base_url, headers=headers, timeout=timeout)
+
+    def _check(self, response):
+        if response.is_error:
+            try:
+                detail = response.json().get("detail", response.text)
+            except ValueError:
+                detail = response.text
+            raise JobFailed(f"{response.status_code}: {detail}")
+        return response
+
+    def submit(self, input_path, preset=None, settings=None, title="", output_format=None, upload=False,
+               loudness_target=None):
+        """
+        Submits a render of input_path through a preset filename or a dict of Designer
+        settings and returns the job's status dict. loudness_target (LUFS) normalizes
+        the output to that loudness, "peak" to a 0 dBFS peak; None leaves it to the
+        server's default.
+        """
+        data = {"title": title}
+        if preset is not None:
+            data["preset"] = preset
+        if settings is not None:
+            data["settings"] = json.dumps(settings)
+        if output_format:
+            data["output_format"] = output_format
+        if loudness_target is not None:
+            data["loudness_target"] = str(loudness_target)
+        if upload:
+            with open(input_path, "rb") as f:
+                response = self.http.post("/jobs", data=data, files={"file": (os.path.basename(input_path), f)})
+        else:
+            data["path"] = os.path.abspath(input_path)
+            response = self.http.post("/jobs", data=data)
+        return self._check(response).json()
+
+    def status(self, job_id):
+        return self._check(self.http.get(f"/jobs/{job_id}")).json()
+
+    def cancel(self, job_id):
+        return self._check(self.http.delete(f"/jobs/{job_id}")).json()
+
+    def wait(self, job_id, timeout=None, poll_seconds=POLL_SECONDS):
+        """Polls until the job ends and returns its status; raises JobFailed unless it finished."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            info = self.status(job_id)
+            if info["status"] == "finished":
+                return info
+            if info["status"] not in ("queued", "running"):
+                raise JobFailed(f"Job {job_id} {info['status']}: {info.get('error', '')}")
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError(f"Job {job_id} still {info['status']} after {timeout}s")
+            time.sleep(poll_seconds)
+
+    def download(self, job_id, output_dir, filename=None):
+        """Streams a finished job's output into output_dir and returns the local path."""
+        os.makedirs(output_dir, exist_ok=True)
+        with self.http.stream("GET", f"/jobs/{job_id}/result") as response:
+            if response.is_error:
+                response.read()
+                self._check(response)
+            path = os.path.join(output_dir, filename or self.status(job_id)["filename"])
+            with open(path, "wb") as f:
+                for chunk in response.iter_bytes(DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+        return path
+
+    def submit_many(self, input_paths, presets, output_format=None, upload=False, workers=4, loudness_target=None):
+        """
+        Submits every input with every preset, a few requests at a time, and returns
+        [(input_path, preset, status dict or exception)] in submission order.
+        """
+        pairs = [(input_path, preset) for input_path in input_paths for preset in presets]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(self.submit, input_path, preset, output_format=output_format, upload=upload,
+                                   loudness_target=loudness_target)
+                       for input_path, preset in pairs]
+            results = []
+            for (input_path, preset), future in zip(pairs, futures):
+                try:
+                    results.append((input_path, preset, future.result()))
+                except Exception as e:
+                    results.append((input_path, preset, e))
+        return results
+
+    def run_many(self, input_paths, presets, output_dir, output_format=None, upload=False, workers=4,
+                 timeout=None, log=print, loudness_target=None):
+        """
+        Submits every input with every preset, then waits for the jobs and downloads the
+        results in parallel as they finish. Returns a summary dict.
+        """
+        submitted = self.submit_many(input_paths, presets, output_format, upload, workers, loudness_target)
+        failures = [(i, p, str(r)) for i, p, r in submitted if isinstance(r, Exception)]
+        jobs = [(i, p, r["id"]) for i, p, r in submitted if not isinstance(r, Exception)]
+        outputs = []
+
+        def fetch(job_id):
+            self.wait(job_id, timeout)
+            return self.download(job_id, output_dir)
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(fetch, job_id): (input_path, preset) for input_path, preset, job_id in jobs}
+            for future in as_completed(futures):
+                input_path, preset = futures[future]
+                try:
+                    outputs.append(future.result())
+                    log(f"[{len(outputs) + len(failures)}/{len(submitted)}] {outputs[-1]}")
+                except Exception as e:
+                    failures.append((input_path, preset, str(e)))
+                    log(f"FAILED {input_path} x {preset}: {e}")
+        return {"outputs": outputs, "failures": failures}
+
+    def close(self):
+        self.http.close()
+
+
+def lufs_target(text):
+    """Parses --lufs: a LUFS value, or "peak" for peak normalization."""
+    return "peak" if text.lower() == "peak" else float(text)
+
+
+def main():
+    """Command line entry point: renders many inputs with many presets through the job API."""
+    parser = argparse.ArgumentParser(description="Submit renders to the job API and download the results.")
+    parser.add_argument("-i", "--input", action="append", required=True,
+                        help="Input file or glob; repeat for more")
+    parser.add_argument("-p", "--preset", action="append", required=True, help="Preset filename; repeat for more")
+    parser.add_argument("-o", "--output-dir", default="api_output")
+    parser.add_argument("-f", "--format", default=None, help="Output format (wav, wav24, wav16, flac, ogg)")
+    parser.add_argument("-l", "--lufs", type=lufs_target, default=None,
+                        help="Normalize to this integrated loudness (LUFS), or 'peak' for a 0 dBFS peak; "
+                             "defaults to the server's target")
+    parser.add_argument("-w", "--workers", type=int, default=4, help="Parallel submissions and downloads")
+    parser.add_argument("--upload", action="store_true", help="Upload the files instead of sending their paths")
+    parser.add_argument("--url", default=API_URL)
+    parser.add_argument("--client-id", default=None)
+    args = parser.parse_args()
+    inputs = sorted({path for pattern in args.input for path in glob.glob(pattern)})
+    if not inputs:
+        parser.error("no input files matched")
+    client = JobClient(args.url, args.client_id)
+    try:
+        summary = client.run_many(inputs, args.preset, args.output_dir, args.format, args.upload, args.workers,
+                                  loudness_target=args.lufs)
+    finally:
+        client.close()
+    print(f"{len(summary['outputs'])} downloaded, {len(summary['failures'])} failed")
+    sys.exit(1 if summary["failures"] else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+import datetime
+from collections import namedtuple
+
+
+class Param(namedtuple("Param", ["name", "label", "minimum", "maximum", "default"])):
+    """A slider-controlled keyword argument of an effect."""
+
+
+class Slot(namedtuple("Slot", ["key", "heading", "effect", "params", "fixed"])):
+    """
+    One plugin in the chain. `fixed` holds keyword arguments that are not exposed as
+    sliders, as (name, source text) pairs written into the chain as they are.
+    """
+
+
+class DesignerEffect(namedtuple("DesignerEffect", ["title", "slots"])):
+    """A Designer section: one enable checkbox controlling one or more slots."""
+
+
+def _slot(key, effect, *params, heading=None, fixed=()):
+    return Slot(key, heading, effect, tuple(Param(*p) for p in params), fixed)
+
+
+def _single(title, effect, *params, fixed=()):
+    return DesignerEffect(title, (_slot(title, effect, *params, fixed=fixed),))
+
+
+# Every Designer section, in chain order. Adding an effect to the Designer only
+# needs an entry here (and the effect in presets.ALLOWED_EFFECTS).
+DESIGNER_EFFECTS = (
+    _single("Chorus Subtle", "Chorus",
+            ("rate_hz", "Rate (Hz)", 0, 5, 1.0), ("depth", "Depth", 0, 1, 0.25), ("mix", "Mix", 0, 1, 0.3)),
+    _single("Chorus Intense", "Chorus",
+            ("rate_hz", "Rate (Hz)", 0, 5, 3.0), ("depth", "Depth", 0, 1, 0.8), ("mix", "Mix", 0, 1, 0.7)),
+    _single("Compressor", "Compressor",
+            ("threshold_db", "Threshold (dB)", -60, 0, -20), ("ratio", "Ratio", 1, 20, 4),
+            ("attack_ms", "Attack (ms)", 1, 50, 5), ("release_ms", "Release (ms)", 50, 500, 100)),
+    _single("Delay Single", "Delay",
+            ("delay_seconds", "Delay (seconds)", 0, 1, 0.3), ("feedback", "Feedback", 0, 1, 0.4),
+            ("mix", "Mix", 0, 1, 0.4)),
+    DesignerEffect("Delay Multi", (
+        _slot("Delay Multi/1", "Delay",
+              ("delay_seconds", "Delay (seconds)", 0, 1, 0.2), ("feedback", "Feedback", 0, 1, 0.3),
+              ("mix", "Mix", 0, 1, 0.3), heading="First Delay"),
+        _slot("Delay Multi/2", "Delay",
+              ("delay_seconds", "Delay (seconds)", 0, 1, 0.4), ("feedback", "Feedback", 0, 1, 0.2),
+              ("mix", "Mix", 0, 1, 0.2), heading="Second Delay"),
+    )),
+    _single("Distortion Mild", "Distortion", ("drive_db", "Drive (dB)", 0, 30, 10)),
+    _single("Distortion Heavy", "Distortion", ("drive_db", "Drive (dB)", 0, 30, 25)),
+    DesignerEffect("Filters", (
+        _slot("Filters/1", "HighpassFilter", ("cutoff_frequency_hz", "Highpass Cutoff (Hz)", 20, 2000, 500)),
+        _slot("Filters/2", "LowpassFilter", ("cutoff_frequency_hz", "Lowpass Cutoff (Hz)", 2000, 20000, 5000)),
+    )),
+    _single("Ladder Filter", "LadderFilter",
+            ("cutoff_hz", "Cutoff (Hz)", 20, 20000, 1000), ("resonance", "Resonance", 0, 1, 0.7),
+            ("drive", "Drive", 0, 3, 1.5), fixed=(("mode", "LadderFilter.Mode.HPF12"),)),
+    _single("Phaser", "Phaser",
+            ("rate_hz", "Rate (Hz)", 0, 5, 1.0), ("depth", "Depth", 0, 1, 0.5),
+            ("feedback", "Feedback", 0, 1, 0.5), ("mix", "Mix", 0, 1, 0.5)),
+    _single("Reverb Small", "Reverb",
+            ("room_size", "Room Size", 0, 1, 0.3), ("damping", "Damping", 0, 1, 0.5),
+            ("width", "Width", 0, 1, 0.7), ("wet_level", "Wet Level", 0, 1, 0.4)),
+    _single("Reverb Large", "Reverb",
+            ("room_size", "Room Size", 0, 1, 0.9), ("damping", "Damping", 0, 1, 0.2),
+            ("width", "Width", 0, 1, 1.0), ("wet_level", "Wet Level", 0, 1, 0.5)),
+    _single("Pitch Shift Up", "PitchShift", ("semitones", "Semitones (Up)", 1, 12, 12)),
+    _single("Pitch Shift Down", "PitchShift", ("semitones", "Semitones (Down)", -12, -1, -12)),
+    _single("Gain", "Gain", ("gain_db", "Gain (dB)", -24, 24, 0)),
+    _single("Limiter", "Limiter", ("threshold_db", "Threshold (dB)", -30, 0, -1), ("release_ms", "Release (ms)", 10, 500, 100)),
+)
+
+
+def enable_key(effect):
+    return f"{effect.title}.enabled"
+
+
+def param_key(slot, param):
+    return f"{slot.key}.{param.name}"
+
+
+def default_settings():
+    """
+    Returns the Designer's settings as a flat dict: one "<title>.enabled" flag per
+    section and one "<slot>.<param>" value per slider, all at their defaults.
+    """
+    settings = {}
+    for effect in DESIGNER_EFFECTS:
+        settings[enable_key(effect)] = False
+        for slot in effect.slots:
+            for param in slot.params:
+                settings[param_key(slot, param)] = param.default
+    return settings
+
+
+def build_chain(settings):
+    """
+    Returns (chain_str, slot keys, enabled section titles) for the enabled sections,
+    where chain_str is the chain as written in a .pdl file and slot keys name the
+    Designer slot each stage came from.
+    """
+    effects_str_list = []
+    effect_slots = []
+    enabled_effect_names = []
+    for effect in DESIGNER_EFFECTS:
+        if not settings.get(enable_key(effect)):
+            continue
+        for slot in effect.slots:
+            kwargs = [f"{name}={text}" for name, text in slot.fixed]
+            kwargs += [f"{param.name}={settings.get(param_key(slot, param), param.default)}" for param in slot.params]
+            effects_str_list.append(f"{slot.effect}({', '.join(kwargs)})")
+            effect_slots.append(slot.key)
+        enabled_effect_names.append(effect.title)
+    chain_str = "[" + ", ".join(effects_str_list) + "],"
+    return chain_str, effect_slots, enabled_effect_names
+
+
+def preset_title(title, enabled_effect_names, now=None):
+    """Returns the user's title, or one made from the enabled sections and the time."""
+    now = now or datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    if title.strip():
+        return title.strip()
+    if enabled_effect_names:
+        return "_".join(enabled_effect_names) + "_" + now
+    return "Preset_" + now
+
+
+def preset_text(final_title, chain_str):
+    """Returns the contents of a .pdl file for a chain."""
+    return "\n".join([
+        f"# {final_title}",
+        f"{chain_str}",
+        f"\"{final_title}.wav\""
+    ])
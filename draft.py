@@ -0,0 +1,57 @@
+import os
+import numpy as np
+
+# Sample rate draft previews are rendered at.
+DRAFT_SAMPLE_RATE = int(os.environ.get("PEDALBOARD_DRAFT_SAMPLE_RATE", "22050"))
+DRAFT_SAMPLE_RATES = [11025, 16000, 22050, 32000, 44100]
+# Default excerpt length for drafts, in seconds; 0 renders the whole input.
+DRAFT_EXCERPT_SECONDS = float(os.environ.get("PEDALBOARD_DRAFT_EXCERPT_SECONDS", "30"))
+
+
+def resample(audio_data, from_rate, to_rate):
+    """
+    Downsamples channels-first float32 audio by truncating its spectrum: one real FFT
+    per channel, computed for all channels at once. Band-limiting in the frequency
+    domain removes everything above the new Nyquist frequency, so there is no aliasing.
+    Audio is returned unchanged when to_rate is not lower than from_rate.
+    """
+    num_frames = audio_data.shape[1]
+    if to_rate >= from_rate or num_frames == 0:
+        return audio_data
+    out_frames = max(int(round(num_frames * to_rate / from_rate)), 1)
+    spectrum = np.fft.rfft(audio_data, axis=1)
+    resampled = np.fft.irfft(spectrum[:, :out_frames // 2 + 1], n=out_frames, axis=1)
+    resampled *= out_frames / num_frames
+    return np.ascontiguousarray(resampled, dtype=np.float32)
+
+
+def excerpt(audio_data, sample_rate, start_seconds=0.0, length_seconds=DRAFT_EXCERPT_SECONDS):
+    """
+    Returns a view of the frames from start_seconds lasting length_seconds (to the end
+    if length_seconds is 0). Starts past the end fall back to the start of the input.
+    """
+    num_frames = audio_data.shape[1]
+    start = int(max(start_seconds or 0.0, 0.0) * sample_rate)
+    if start >= num_frames:
+        start = 0
+    end = num_frames if not length_seconds else min(start + int(length_seconds * sample_rate), num_frames)
+    return audio_data[:, start:end]
+
+
+def draft_audio(audio_data, sample_rate, preview_rate=DRAFT_SAMPLE_RATE, start_seconds=0.0,
+                length_seconds=DRAFT_EXCERPT_SECONDS):
+    """
+    Cuts the excerpt and downsamples it to preview_rate. Returns (sample_rate, audio)
+    like ingest, so the draft can go through the same render path as the full input.
+    """
+    audio_data = excerpt(audio_data, sample_rate, start_seconds, length_seconds)
+    preview_rate = int(preview_rate or sample_rate)
+    if preview_rate >= sample_rate:
+        return sample_rate, np.ascontiguousarray(audio_data)
+    return preview_rate, resample(audio_data, sample_rate, preview_rate)
+
+
+def draft_filename(output_filename):
+    """Marks an output filename as a draft, before its extension."""
+    name, ext = output_filename.rsplit('.', 1)
+    return f"{name}_draft.{ext}"
@@ -0,0 +1,139 @@
+import os
+import queue
+import threading
+from collections import namedtuple
+import numpy as np
+import soundfile as sf
+
+
+class OutputFormat(namedtuple("OutputFormat", ["label", "extension", "format", "subtype", "bits"])):
+    """
+    A libsndfile container and subtype. `bits` is the integer sample width the audio
+    is dithered to before writing, or None for float and lossy formats.
+    """
+
+
+OUTPUT_FORMATS = {
+    "wav": OutputFormat("WAV (32-bit float)", "wav", "WAV", "FLOAT", None),
+    "wav24": OutputFormat("WAV (24-bit PCM)", "wav", "WAV", "PCM_24", 24),
+    "wav16": OutputFormat("WAV (16-bit PCM)", "wav", "WAV", "PCM_16", 16),
+    "flac": OutputFormat("FLAC (24-bit)", "flac", "FLAC", "PCM_24", 24),
+    "ogg": OutputFormat("OGG Vorbis", "ogg", "OGG", "VORBIS", None),
+}
+DEFAULT_OUTPUT_FORMAT = os.environ.get("PEDALBOARD_OUTPUT_FORMAT", "wav")
+# Blocks waiting for the writer thread; rendering blocks when the queue is full.
+WRITER_QUEUE_BLOCKS = 4
+
+
+def output_format(name):
+    """Returns the OutputFormat registered under name, or raises ValueError."""
+    try:
+        return OUTPUT_FORMATS[name or DEFAULT_OUTPUT_FORMAT]
+    except KeyError:
+        raise ValueError(f"Unknown output format '{name}'; expected one of {', '.join(OUTPUT_FORMATS)}")
+
+
+def with_extension(output_filename, name):
+    """Replaces the extension of output_filename with the one of the output format."""
+    return f"{os.path.splitext(output_filename)[0]}.{output_format(name).extension}"
+
+
+def dither(block, bits, rng):
+    """
+    Converts a channels-first float block to interleaved integer samples of the given
+    width with triangular (TPDF) dither: two uniform noise arrays of one LSB each are
+    added to the whole block at once before rounding, which decorrelates the
+    quantization error from the signal. 24-bit samples are returned left-aligned in
+    int32, the layout libsndfile expects.
+    """
+    scale = float(2 ** (bits - 1) - 1)
+    samples = np.multiply(block.T, scale, dtype=np.float64)
+    samples += rng.random(samples.shape)
+    samples -= rng.random(samples.shape)
+    np.rint(samples, out=samples)
+    np.clip(samples, -scale - 1, scale, out=samples)
+    if bits == 16:
+        return samples.astype(np.int16)
+    ints = samples.astype(np.int32)
+    ints <<= 32 - bits
+    return ints
+
+
+class BackgroundWriter:
+    """
+    Encodes channels-first float32 blocks to output_path on a dedicated I/O thread.
+    write() only queues the block, so dithering, compression and the disk write of one
+    block overlap with rendering the next; the bounded queue keeps at most a few blocks
+    in flight. Blocks must not be modified after they are queued. close() waits for
+    the thread and re-raises any error it hit.
+    """
+
+    def __init__(self, output_path, sample_rate, num_channels, output_format_name=None,
+                 queue_blocks=WRITER_QUEUE_BLOCKS):
+        self.output_path = output_path
+        self.format = output_format(output_format_name)
+        self.frames = 0
+        self._file = sf.SoundFile(output_path, "w", samplerate=sample_rate, channels=num_channels,
+                                  format=self.format.format, subtype=self.format.subtype)
+        self._queue = queue.Queue(maxsize=queue_blocks)
+        self._error = None
+        self._rng = np.random.default_rng()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="output-writer")
+        self._thread.start()
+
+    def _encode(self, block):
+        if self.format.bits:
+            return dither(block, self.format.bits, self._rng)
+        return np.ascontiguousarray(block.T, dtype=np.float32)
+
+    def _run(self):
+        try:
+            while True:
+                block = self._queue.get()
+                if block is None:
+                    break
+                self._file.write(self._encode(block))
+        except Exception as e:
+            self._error = e
+            # Keep draining so write() never blocks on a full queue.
+            while self._queue.get() is not None:
+                pass
+        finally:
+            self._file.close()
+
+    def write(self, block):
+        if self._error is not None:
+            raise self._error
+        if block.shape[1]:
+            self._queue.put(block)
+            self.frames += block.shape[1]
+
+    def close(self):
+        """Waits until every queued block is written and returns the frame count."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        if self._error is not None:
+            raise self._error
+        return self.frames
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        elif self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+
+def write_audio(audio_data, output_path, sample_rate, output_format_name=None, block_size=65536):
+    """
+    Writes a channels-first array in the given format through a BackgroundWriter and
+    returns the number of frames written.
+    """
+    with BackgroundWriter(output_path, sample_rate, audio_data.shape[0], output_format_name) as writer:
+        for start in range(0, audio_data.shape[1], block_size):
+            writer.write(audio_data[:, start:start + block_size])
+    return writer.frames
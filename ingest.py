@@ -0,0 +1,121 @@
+import argparse
+import sys
+import tracemalloc
+import numpy as np
+
+# Bytes of bookkeeping `check` allows on top of the expected buffer allocations.
+CHECK_ALLOCATION_SLACK = 4096
+
+
+def to_channels_first(audio_data, channels_first=False):
+    """
+    Converts PCM samples into a C-contiguous float32 (channels, samples) buffer.
+
+    Input is (samples,) or (samples, channels) as delivered by gr.Audio(type="numpy")
+    and soundfile, or (channels, samples) when channels_first is set. Integer PCM is
+    scaled to [-1.0, 1.0) in place after a single cast into the output buffer. Float32
+    data that is already contiguous in the target layout is returned without a copy.
+    """
+    audio_data = np.asarray(audio_data)
+    if audio_data.ndim == 1:
+        audio_data = audio_data[np.newaxis, :]
+    elif audio_data.ndim == 2:
+        if not channels_first:
+            audio_data = audio_data.T
+    else:
+        raise ValueError(f"Expected 1-D or 2-D audio, got shape {audio_data.shape}")
+
+    dtype = audio_data.dtype
+    if dtype == np.float32 and audio_data.flags.c_contiguous:
+        return audio_data
+
+    out = np.empty(audio_data.shape, dtype=np.float32)
+    out[...] = audio_data
+    if np.issubdtype(dtype, np.signedinteger):
+        out *= np.float32(1.0 / 2 ** (dtype.itemsize * 8 - 1))
+    elif np.issubdtype(dtype, np.unsignedinteger):
+        half = np.float32(2 ** (dtype.itemsize * 8 - 1))
+        out -= half
+        out *= np.float32(1.0) / half
+    elif not np.issubdtype(dtype, np.floating):
+        raise ValueError(f"Unsupported audio sample type {dtype}")
+    return out
+
+
+def ingest(audio_input):
+    """
+    Unpacks a Gradio (sample_rate, data) tuple into (sample_rate, channels-first float32 audio).
+    """
+    sample_rate, audio_data = audio_input
+    return sample_rate, to_channels_first(audio_data)
+
+
+def check_cases(frames=48000, seed=0):
+    """
+    Returns (name, input, channels_first, expected output, expected output-sized
+    allocations) for mono and stereo int16, int32 and float32 PCM. Float32 input
+    already laid out channels-first must come back without any allocation.
+    """
+    rng = np.random.default_rng(seed)
+    mono = rng.uniform(-1.0, 1.0, frames)
+    stereo = rng.uniform(-1.0, 1.0, (frames, 2))
+    cases = []
+    for kind, dtype in (("int16", np.int16), ("int32", np.int32)):
+        scale = 2 ** (np.dtype(dtype).itemsize * 8 - 1)
+        for layout, data in (("mono", mono), ("stereo", stereo)):
+            pcm = np.clip(np.round(data * scale), -scale, scale - 1).astype(dtype)
+            expected = np.atleast_2d((pcm.astype(np.float64) / scale).T).astype(np.float32)
+            cases.append((f"{layout} {kind}", pcm, False, expected, 1))
+    cases.append(("mono float32", mono.astype(np.float32), False, mono.astype(np.float32)[np.newaxis, :], 0))
+    cases.append(("stereo float32 interleaved", stereo.astype(np.float32), False,
+                  np.ascontiguousarray(stereo.T, dtype=np.float32), 1))
+    cases.append(("stereo float32 channels-first", np.ascontiguousarray(stereo.T, dtype=np.float32), True,
+                  np.ascontiguousarray(stereo.T, dtype=np.float32), 0))
+    cases.append(("stereo float64", stereo, False, stereo.T.astype(np.float32), 1))
+    return cases
+
+
+def check(log=print):
+    """
+    Converts each check case and returns the names that fail: output not C-contiguous
+    float32 (channels, samples), values different from the reference conversion,
+    integer output outside [-1, 1), zero-copy input not returned as the same buffer,
+    or more memory allocated than the expected number of output-sized buffers.
+    """
+    failures = []
+    for name, audio_data, channels_first, expected, allocations in check_cases():
+        tracemalloc.start()
+        try:
+            before, _ = tracemalloc.get_traced_memory()
+            out = to_channels_first(audio_data, channels_first)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        allocated = peak - before
+        problems = []
+        if out.dtype != np.float32 or not out.flags.c_contiguous or out.shape != expected.shape:
+            problems.append(f"got {out.dtype} {out.shape}")
+        elif not np.array_equal(out, expected):
+            problems.append(f"max diff {float(np.abs(out - expected).max()):.3g}")
+        if np.issubdtype(audio_data.dtype, np.integer) and (out.min() < -1.0 or out.max() >= 1.0):
+            problems.append(f"range [{out.min()}, {out.max()}]")
+        if allocations == 0 and not np.shares_memory(out, audio_data):
+            problems.append("copied zero-copy input")
+        budget = allocations * expected.nbytes + CHECK_ALLOCATION_SLACK
+        if allocated > budget or allocated < allocations * expected.nbytes:
+            problems.append(f"allocated {allocated:,} B, expected {allocations} x {expected.nbytes:,} B")
+        if problems:
+            failures.append(name)
+        log(f"{'ok  ' if not problems else 'FAIL'} {name:30s} {allocated:>10,} B allocated  {'; '.join(problems)}")
+    return failures
+
+
+def main():
+    """Command line entry point: checks conversions, zero-copy paths and allocation counts."""
+    argparse.ArgumentParser(description="Check ingest conversions and their allocations.").parse_args()
+    failures = check()
+    print(f"{len(failures)} cases failed")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+import numpy as np
+import soundfile as sf
+from overview import build_overview
+from stage_cache import audio_key
+
+# Total bytes of decoded inputs kept across all sessions.
+INPUT_STORE_MAX_BYTES = int(os.environ.get("PEDALBOARD_INPUT_STORE_MAX_BYTES", str(1024 ** 3)))
+# Decoded inputs larger than this are kept in a memory-mapped temporary file.
+INPUT_MEMMAP_BYTES = int(os.environ.get("PEDALBOARD_INPUT_MEMMAP_BYTES", str(64 * 1024 * 1024)))
+# Frames decoded per read when filling the buffer.
+DECODE_BLOCK_SIZE = 262144
+
+
+class DecodedInput:
+    """
+    An upload decoded once into a read-only, channels-first float32 buffer, shared by
+    every render of it in the session. The content hash and the waveform/spectrogram
+    overview are computed on first use.
+    """
+
+    def __init__(self, path, sample_rate, audio_data, mapped):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.audio_data = audio_data
+        self.mapped = mapped
+        self._key = None
+        self._overview = None
+
+    @property
+    def nbytes(self):
+        return self.audio_data.nbytes
+
+    @property
+    def key(self):
+        if self._key is None:
+            self._key = audio_key(self.sample_rate, self.audio_data)
+        return self._key
+
+    @property
+    def overview(self):
+        if self._overview is None:
+            self._overview = build_overview(self.audio_data, self.sample_rate)
+        return self._overview
+
+
+def decode(path, memmap_bytes=INPUT_MEMMAP_BYTES):
+    """
+    Decodes an audio file block by block into a channels-first float32 buffer, backed
+    by an unlinked temporary file when it is larger than memmap_bytes.
+    """
+    with sf.SoundFile(path) as f:
+        shape = (f.channels, f.frames)
+        mapped = shape[0] * shape[1] * 4 > memmap_bytes
+        if mapped:
+            with tempfile.TemporaryFile() as spool:
+                spool.truncate(shape[0] * shape[1] * 4)
+                audio_data = np.memmap(spool, dtype=np.float32, mode="r+", shape=shape)
+        else:
+            audio_data = np.empty(shape, dtype=np.float32)
+        position = 0
+        for block in f.blocks(blocksize=DECODE_BLOCK_SIZE, dtype="float32", always_2d=True):
+            audio_data[:, position:position + len(block)] = block.T
+            position += len(block)
+        sample_rate = f.samplerate
+    audio_data.flags.writeable = False
+    return DecodedInput(path, sample_rate, audio_data, mapped)
+
+
+class InputStore:
+    """
+    Decoded uploads keyed by session and file. Handlers pass the upload's path and get
+    back the already decoded buffer instead of re-decoding and converting it on every
+    click. Entries are dropped when their session ends, and least recently used ones
+    once the store exceeds max_bytes.
+    """
+
+    def __init__(self, max_bytes=INPUT_STORE_MAX_BYTES, memmap_bytes=INPUT_MEMMAP_BYTES):
+        self.max_bytes = max_bytes
+        self.memmap_bytes = memmap_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id, path):
+        """Returns the DecodedInput for a session's upload, decoding it on a miss."""
+        try:
+            st = os.stat(path)
+        except OSError as e:
+            raise ValueError(f"Error reading {path}: {e}")
+        key = (session_id, path, st.st_mtime_ns, st.st_size)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+        entry = decode(path, self.memmap_bytes)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            total = sum(e.nbytes for e in self._entries.values())
+            while total > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                total -= evicted.nbytes
+                self.evictions += 1
+        return entry
+
+    def end_session(self, session_id):
+        """Drops every entry belonging to a session."""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == session_id]:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            entries = list(self._entries.values())
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "entries": len(entries), "bytes": sum(e.nbytes for e in entries),
+                    "mapped_entries": sum(1 for e in entries if e.mapped)}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+input_store = InputStore()
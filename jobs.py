@@ -0,0 +1,108 @@
+import os
+from collections import namedtuple
+from catalog import PRESET_DIR
+from designer import build_chain, preset_title
+from draft import draft_filename
+from encode import with_extension, write_audio
+from metrics import RenderStats
+from output_store import output_store
+from overview import save_overview
+from plugin_pool import plugin_pools
+from presets import OPTIMIZE, chain_signature, optimize_chain, parse_chain, preset_cache
+from render import DEFAULT_MAX_TAIL_SECONDS, normalize_output, render_board, render_preset, with_tail
+from render_cache import render_cache, render_key
+from stage_cache import audio_key, render_incremental, stage_cache
+
+
+class RenderPlan(namedtuple("RenderPlan", ["cached_path", "work", "chain_length"])):
+    """
+    A render ready to hand to the scheduler. `cached_path` is set when the render
+    cache already holds the output; otherwise `work()` renders it and returns
+    (output path, stats markdown).
+    """
+
+
+def plan_effect(sample_rate, audio_data, effect, draft=False, input_key=None, output_format=None,
+                loudness_target=None):
+    """
+    Plans a render of audio through a .pdl preset, checking the render cache first.
+    Pass input_key when the input's content hash is already known, and loudness_target
+    (LUFS) to normalize to a loudness instead of a 0 dBFS peak.
+    """
+    preset = preset_cache.get(os.path.join(PRESET_DIR, effect))
+    chain = preset.chain
+    cache_key = render_key(input_key or audio_key(sample_rate, audio_data), chain_signature(chain), output_format,
+                           loudness_target, preset.output_filename, draft)
+    cached_path = render_cache.get(cache_key)
+    if cached_path is not None:
+        return RenderPlan(cached_path, None, len(chain))
+    stats = RenderStats("effect_draft" if draft else "effect")
+    output_filename = draft_filename(preset.output_filename) if draft else None
+
+    def work():
+        stats.start_running()
+        output_path = render_preset(effect, audio_data, sample_rate, output_filename, stats=stats, content_key=cache_key,
+                                    output_format=output_format, loudness_target=loudness_target)
+        render_cache.put(cache_key, output_path)
+        return output_path, stats.finish().to_markdown()
+
+    return RenderPlan(None, work, len(chain))
+
+
+def plan_designer(sample_rate, audio_data, title, settings, session_id, draft=False, input_key=None,
+                  output_format=None, loudness_target=None):
+    """
+    Plans a render of audio through the chain built from Designer settings, reusing
+    the session's plugins and cached stages, checking the render cache first.
+    """
+    chain_str, effect_slots, enabled_effect_names = build_chain(settings)
+    final_title = preset_title(title, enabled_effect_names)
+    output_filename = with_extension(f"{final_title}.wav", output_format)
+    if draft:
+        output_filename = draft_filename(output_filename)
+    chain = parse_chain(chain_str)
+    optimizations = []
+    if OPTIMIZE:
+        chain, optimizations, sources = optimize_chain(chain)
+        effect_slots = [effect_slots[i] for i in sources]
+    input_key = input_key or audio_key(sample_rate, audio_data)
+    # Key on the title as entered: a blank title's generated name has a fresh timestamp
+    # on every render, while the chain signature already tells the chains apart.
+    cache_key = render_key(input_key, chain_signature(chain), output_format, loudness_target, title.strip(), draft)
+    cached_path = render_cache.get(cache_key)
+    if cached_path is not None:
+        return RenderPlan(cached_path, None, len(chain))
+    stats = RenderStats("designer_draft" if draft else "designer")
+    output_path = output_store.path_for(output_filename, cache_key)
+    stats.optimizations = optimizations
+
+    pool = plugin_pools.get(session_id)
+
+    def work():
+        stats.start_running()
+        with pool.lock:
+            # Reuse this session's plugins, only touching the parameters that changed.
+            board = pool.update(effect_slots, chain)
+            tail_bytes = audio_data.shape[0] * int(DEFAULT_MAX_TAIL_SECONDS * sample_rate) * 4
+            if stage_cache.fits(audio_data.nbytes + tail_bytes):
+                # Resume from the last unchanged stage so slider tweaks only re-render the suffix.
+                # Each stage flushes its own tail, so the cached stages carry the tail
+                # render_board would keep and nothing else.
+                def flush(plugin, processed):
+                    return with_tail(plugin, processed, audio_data.shape[1], sample_rate)
+
+                processed_audio = render_incremental(stage_cache, chain, list(board), audio_data, sample_rate, stats,
+                                                     input_key, flush)
+                # The last stage is a read-only cache entry, so normalize a copy.
+                processed_audio = processed_audio.copy()
+                with stats.timed("normalize"):
+                    processed_audio = normalize_output(processed_audio, sample_rate, loudness_target, stats)
+                with stats.timed("io"):
+                    write_audio(processed_audio, output_path, sample_rate, output_format)
+                    save_overview(processed_audio, sample_rate, output_path)
+            else:
+                render_board(board, audio_data, sample_rate, output_path, stats, output_format, loudness_target)
+        render_cache.put(cache_key, output_path)
+        return output_path, stats.finish().to_markdown()
+
+    return RenderPlan(None, work, len(chain))
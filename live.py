@@ -0,0 +1,71 @@
+import os
+import time
+import numpy as np
+from presets import build_board
+
+# How often the browser sends microphone chunks, in seconds.
+LIVE_CHUNK_SECONDS = float(os.environ.get("PEDALBOARD_LIVE_CHUNK_SECONDS", "0.1"))
+# Frames per block passed through the board; incoming chunks are re-cut to this size.
+DEFAULT_LIVE_BLOCK_SIZE = 1024
+
+
+def to_int16(audio_data):
+    """Converts float audio in [-1.0, 1.0] to int16 PCM for the streaming output."""
+    out = np.clip(audio_data, -1.0, 1.0)
+    out *= 32767.0
+    return out.astype(np.int16)
+
+
+class LiveSession:
+    """
+    State for one live monitoring session: a board of its own whose plugin state
+    (Reverb tails, Delay lines, Compressor envelopes) carries over from chunk to chunk,
+    and a small buffer that re-cuts the browser's chunks into fixed-size blocks.
+
+    Latency is measured per chunk as the chunk's own duration (capture time), the
+    audio still waiting in the block buffer, and the server time from receiving the
+    chunk to returning its output.
+    """
+
+    def __init__(self, effect, chain, sample_rate, num_channels, block_size=DEFAULT_LIVE_BLOCK_SIZE):
+        self.effect = effect
+        self.sample_rate = sample_rate
+        self.num_channels = num_channels
+        self.block_size = int(block_size)
+        self.board = build_board(chain)
+        self.board.reset()
+        self._pending = np.zeros((num_channels, 0), dtype=np.float32)
+        self.chunks = 0
+        self.latency_ms = 0.0
+        self.processing_ms = 0.0
+        self.buffered_ms = 0.0
+
+    def matches(self, effect, sample_rate, num_channels, block_size):
+        return (self.effect, self.sample_rate, self.num_channels, self.block_size) == \
+            (effect, sample_rate, num_channels, int(block_size))
+
+    def process(self, chunk, received_at):
+        """
+        Processes a channels-first chunk and returns whatever full blocks of output are
+        ready (possibly zero frames while a plugin with latency fills up).
+        """
+        pending = np.concatenate([self._pending, chunk], axis=1) if self._pending.shape[1] else chunk
+        ready = pending.shape[1] - pending.shape[1] % self.block_size
+        if ready:
+            processed = self.board(pending[:, :ready], self.sample_rate, buffer_size=self.block_size, reset=False)
+        else:
+            processed = np.zeros((self.num_channels, 0), dtype=np.float32)
+        self._pending = pending[:, ready:].copy()
+
+        self.chunks += 1
+        self.processing_ms = (time.perf_counter() - received_at) * 1000
+        self.buffered_ms = self._pending.shape[1] / self.sample_rate * 1000
+        chunk_ms = chunk.shape[1] / self.sample_rate * 1000
+        latency = chunk_ms + self.buffered_ms + self.processing_ms
+        self.latency_ms = latency if self.chunks == 1 else 0.9 * self.latency_ms + 0.1 * latency
+        return processed
+
+    def describe(self):
+        return (f"Latency ~{self.latency_ms:.0f} ms (block {self.block_size} frames = "
+                f"{self.block_size / self.sample_rate * 1000:.1f} ms, buffered {self.buffered_ms:.1f} ms, "
+                f"processing {self.processing_ms:.1f} ms) after {self.chunks} chunks")
@@ -0,0 +1,342 @@
+import argparse
+import math
+import os
+import sys
+import time
+from collections import namedtuple
+from functools import lru_cache
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from normalize import block_peak, write_two_pass
+
+# Integrated loudness, in LUFS, that renders are normalized to; unset means peak
+# normalization to 0 dBFS.
+DEFAULT_LOUDNESS_TARGET = float(os.environ["PEDALBOARD_LOUDNESS_TARGET"]) if os.environ.get("PEDALBOARD_LOUDNESS_TARGET") else None
+# Loudness-normalized output is turned down further if its true peak would exceed this.
+TRUE_PEAK_CEILING_DB = float(os.environ.get("PEDALBOARD_TRUE_PEAK_CEILING", "-1.0"))
+# Targets offered in the UI, as (label, LUFS or None for peak normalization).
+LOUDNESS_TARGETS = [
+    ("Peak (0 dBFS)", None),
+    ("-14 LUFS (streaming)", -14.0),
+    ("-16 LUFS (podcast)", -16.0),
+    ("-23 LUFS (EBU R128)", -23.0),
+    ("-24 LUFS (ATSC A/85)", -24.0),
+]
+# BS.1770 gating: 400 ms blocks every 100 ms, an absolute gate at -70 LUFS and a
+# relative gate 10 LU below the loudness of the blocks above it.
+GATE_BLOCK_STEPS = 4
+GATE_STEP_SECONDS = 0.1
+ABSOLUTE_GATE_LUFS = -70.0
+RELATIVE_GATE_LU = -10.0
+# The K-weighting impulse response is cut once the rest of it sums below this.
+K_WEIGHTING_TOLERANCE = 1e-8
+# True peak is measured on a 4x oversampled signal, interpolated with this many taps
+# per phase (BS.1770 Annex 2).
+TRUE_PEAK_OVERSAMPLING = 4
+TRUE_PEAK_TAPS = 12
+# Frames per meter update when measuring an in-memory array.
+METER_BLOCK_SIZE = 65536
+# Largest error, in LU or dB, `check` accepts against the EBU Tech 3341 references.
+CHECK_TOLERANCE = 0.1
+
+Loudness = namedtuple("Loudness", ["integrated", "true_peak", "sample_peak"])
+Loudness.__doc__ = "Integrated loudness in LUFS and true/sample peaks in dBTP/dBFS; -inf when silent."
+
+
+def _db(value):
+    return 20 * math.log10(value) if value > 0 else -math.inf
+
+
+def k_weighting(sample_rate):
+    """
+    Returns (b, a) of the BS.1770 K-weighting filter at sample_rate: the pre-filter
+    high shelf followed by the RLB high-pass. The biquads are derived from their
+    analog prototypes, which reproduces the standard's 48 kHz coefficients exactly.
+    """
+    k = math.tan(math.pi * 1681.974450955533 / sample_rate)
+    q = 0.7071752369554196
+    vh = 10 ** (3.999843853973347 / 20)
+    vb = vh ** 0.4996667741545416
+    a0 = 1 + k / q + k * k
+    shelf_b = [(vh + vb * k / q + k * k) / a0, 2 * (k * k - vh) / a0, (vh - vb * k / q + k * k) / a0]
+    shelf_a = [1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0]
+    k = math.tan(math.pi * 38.13547087602444 / sample_rate)
+    q = 0.5003270373238773
+    a0 = 1 + k / q + k * k
+    highpass_b = [1.0, -2.0, 1.0]
+    highpass_a = [1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0]
+    return np.polymul(shelf_b, highpass_b), np.polymul(shelf_a, highpass_a)
+
+
+@lru_cache(maxsize=8)
+def k_weighting_kernel(sample_rate):
+    """
+    Returns the K-weighting impulse response, cut where its remainder sums below
+    K_WEIGHTING_TOLERANCE. It is read off the filter's frequency response over a
+    second, by which point the response has decayed far below float precision, so no
+    per-sample recursion is needed.
+    """
+    b, a = k_weighting(sample_rate)
+    n = 1 << max(int(sample_rate) - 1, 1).bit_length()
+    z = np.exp(-1j * np.pi * np.arange(n // 2 + 1) / (n // 2))
+    response = np.polyval(b[::-1], z) / np.polyval(a[::-1], z)
+    kernel = np.fft.irfft(response, n)
+    remainder = np.cumsum(np.abs(kernel[::-1]))[::-1]
+    return kernel[:max(int(np.argmax(remainder < K_WEIGHTING_TOLERANCE)), 1)]
+
+
+@lru_cache(maxsize=1)
+def true_peak_phases(oversampling=TRUE_PEAK_OVERSAMPLING, taps=TRUE_PEAK_TAPS):
+    """
+    Returns the (taps, oversampling) polyphase interpolator: column p holds the
+    Hann-windowed sinc that estimates the signal p/oversampling of a sample after the
+    centre tap, from taps input samples.
+    """
+    offsets = np.arange(taps) - (taps // 2 - 1)
+    fractions = np.arange(oversampling) / oversampling
+    t = offsets[:, None] - fractions[None, :]
+    window = 0.5 * (1 + np.cos(np.pi * t / (taps / 2 + 0.5)))
+    return (np.sinc(t) * window).astype(np.float32)
+
+
+def channel_weights(num_channels):
+    """BS.1770 channel weights: surrounds of a 5.0 or 5.1 layout count +1.5 dB, LFE not at all."""
+    if num_channels == 6:
+        return np.array([1.0, 1.0, 1.0, 0.0, 1.41, 1.41])
+    if num_channels == 5:
+        return np.array([1.0, 1.0, 1.0, 1.41, 1.41])
+    return np.ones(num_channels)
+
+
+class LoudnessMeter:
+    """
+    Incremental ITU-R BS.1770 loudness and true-peak meter. Channels-first blocks of
+    any size are K-weighted by FFT convolution, carrying the filter overlap between
+    blocks, and their weighted power is summed into 100 ms steps; gating over the
+    400 ms blocks those steps form happens only when a result is asked for. True peak
+    is the largest magnitude of the 4x oversampled signal.
+    """
+
+    def __init__(self, sample_rate, num_channels):
+        self.sample_rate = sample_rate
+        self.num_channels = num_channels
+        self.frames = 0
+        self.sample_peak = 0.0
+        self._true_peak = 0.0
+        kernel = k_weighting_kernel(sample_rate)
+        self._fft_size = 1 << (4 * len(kernel)).bit_length()
+        self._segment = self._fft_size - len(kernel) + 1
+        self._spectrum = np.fft.rfft(kernel, self._fft_size).astype(np.complex64)
+        self._overlap = np.zeros((num_channels, len(kernel) - 1))
+        self._weights = channel_weights(num_channels)
+        self._step_frames = max(int(round(GATE_STEP_SECONDS * sample_rate)), 1)
+        self._steps = []
+        self._carry_power = np.empty(0)
+        # Phase 0 reproduces the samples themselves, which sample_peak covers.
+        self._phases = true_peak_phases()[:, 1:]
+        # No interpolated sample can exceed the input peak times this.
+        self._overshoot = float(np.abs(self._phases).sum(axis=0).max())
+        self._history = np.zeros((num_channels, len(self._phases) - 1), dtype=np.float32)
+
+    def add(self, block):
+        frames = block.shape[1]
+        if frames == 0:
+            return
+        self.frames += frames
+        self.sample_peak = max(self.sample_peak, block_peak(block))
+
+        weighted = self._k_weighted(block)
+        power = self._weights @ np.square(weighted)
+        power = np.concatenate((self._carry_power, power))
+        full = len(power) // self._step_frames * self._step_frames
+        if full:
+            self._steps.append(power[:full].reshape(-1, self._step_frames).sum(axis=1))
+        self._carry_power = power[full:]
+
+        history = np.concatenate((self._history, block.astype(np.float32, copy=False)), axis=1)
+        if block_peak(history) * self._overshoot > self._true_peak:
+            self._true_peak = max(self._true_peak, self._interpolated_peak(history))
+        self._history = history[:, -self._history.shape[1]:]
+
+    def _k_weighted(self, block):
+        # Overlap-add: every segment of the block is convolved in one batched FFT, and
+        # the filter tail running past the block is carried into the next one.
+        frames = block.shape[1]
+        overlap = self._overlap.shape[1]
+        segments = -(-frames // self._segment)
+        padded = np.zeros((self.num_channels, segments * self._segment), dtype=np.float32)
+        padded[:, :frames] = block
+        spectra = np.fft.rfft(padded.reshape(self.num_channels, segments, self._segment), self._fft_size, axis=2)
+        convolved = np.fft.irfft(spectra * self._spectrum, self._fft_size, axis=2)
+        weighted = np.zeros((self.num_channels, segments + 1, self._segment))
+        weighted[:, :segments] = convolved[:, :, :self._segment]
+        weighted[:, 1:, :overlap] += convolved[:, :, self._segment:self._segment + overlap]
+        weighted = weighted.reshape(self.num_channels, -1)
+        weighted[:, :overlap] += self._overlap
+        self._overlap = weighted[:, frames:frames + overlap].copy()
+        return weighted[:, :frames]
+
+    def _interpolated_peak(self, signal):
+        peak = 0.0
+        for channel in signal:
+            if len(channel) >= len(self._phases):
+                interpolated = sliding_window_view(channel, len(self._phases)) @ self._phases
+                peak = max(peak, block_peak(interpolated))
+        return peak
+
+    def block_loudness(self):
+        """Returns the mean-square power of every complete 400 ms gating block."""
+        steps = np.concatenate(self._steps) if self._steps else np.empty(0)
+        if len(steps) < GATE_BLOCK_STEPS:
+            return np.empty(0)
+        return np.convolve(steps, np.ones(GATE_BLOCK_STEPS), "valid") / (GATE_BLOCK_STEPS * self._step_frames)
+
+    def integrated(self):
+        """Returns the gated integrated loudness in LUFS, or -inf when every block is gated out."""
+        power = self.block_loudness()
+        power = power[power > 10 ** ((ABSOLUTE_GATE_LUFS + 0.691) / 10)]
+        if len(power) == 0:
+            return -math.inf
+        relative_gate = power.mean() * 10 ** (RELATIVE_GATE_LU / 10)
+        return -0.691 + 10 * math.log10(power[power > relative_gate].mean())
+
+    def true_peak(self):
+        """Returns the true peak (linear), including the interpolation past the last sample."""
+        flushed = np.concatenate((self._history, np.zeros((self.num_channels, len(self._phases) // 2),
+                                                          dtype=np.float32)), axis=1)
+        return max(self._true_peak, self._interpolated_peak(flushed), self.sample_peak)
+
+    def measurement(self):
+        return Loudness(self.integrated(), _db(self.true_peak()), _db(self.sample_peak))
+
+
+def measure(audio_data, sample_rate, block_size=METER_BLOCK_SIZE):
+    """Measures a channels-first array and returns its Loudness."""
+    meter = LoudnessMeter(sample_rate, audio_data.shape[0])
+    for start in range(0, audio_data.shape[1], block_size):
+        meter.add(audio_data[:, start:start + block_size])
+    return meter.measurement()
+
+
+def loudness_gain(loudness, target, ceiling_db=TRUE_PEAK_CEILING_DB):
+    """
+    Returns the linear gain that brings a measurement to the target loudness, lowered
+    so the true peak stays at or under ceiling_db. Silence is left as it is.
+    """
+    if math.isinf(loudness.integrated):
+        return 1.0
+    gain_db = min(target - loudness.integrated, ceiling_db - loudness.true_peak)
+    return 10 ** (gain_db / 20)
+
+
+def describe(loudness, gain, ceiling_db=TRUE_PEAK_CEILING_DB):
+    """One-line summary of a normalization for the render stats."""
+    if math.isinf(loudness.integrated):
+        return "silent, left unchanged"
+    text = f"{loudness.integrated:.1f} LUFS, {loudness.true_peak:.1f} dBTP before; gain {_db(gain):+.1f} dB"
+    if abs(loudness.true_peak + _db(gain) - ceiling_db) < 1e-6:
+        text += f" (held to the {ceiling_db:.1f} dBTP ceiling)"
+    return text
+
+
+def loudness_normalized(audio_data, sample_rate, target, ceiling_db=TRUE_PEAK_CEILING_DB):
+    """
+    Returns (audio, loudness, gain): audio_data scaled to the target loudness under the
+    true-peak ceiling. Like peak_normalized it never modifies its argument; a new array
+    is allocated only when the gain is not 1.
+    """
+    loudness = measure(audio_data, sample_rate)
+    gain = loudness_gain(loudness, target, ceiling_db)
+    if gain != 1.0:
+        audio_data = np.multiply(audio_data, gain, dtype=np.float32)
+    return audio_data, loudness, gain
+
+
+def write_loudness_normalized(processed_blocks, output_path, sample_rate, num_channels, target,
+                              ceiling_db=TRUE_PEAK_CEILING_DB, output_format=None, tap=None):
+    """
+    Two-pass out-of-core loudness normalization (see normalize.write_two_pass): the
+    first pass meters the blocks as they are rendered and the second applies the
+    gain. Returns (frames, loudness, gain).
+    """
+    meter = LoudnessMeter(sample_rate, num_channels)
+    frames = write_two_pass(processed_blocks, output_path, sample_rate, num_channels, meter.add,
+                            lambda: loudness_gain(meter.measurement(), target, ceiling_db), output_format, tap=tap)
+    loudness = meter.measurement()
+    return frames, loudness, loudness_gain(loudness, target, ceiling_db)
+
+
+def tone(sample_rate, seconds, level_db, frequency=997.0, num_channels=2, phase=0.0, fade_seconds=0.0):
+    """
+    Returns a channels-first sine at level_db dBFS peak, as used by EBU Tech 3341,
+    optionally with raised-cosine fades so its ends do not overshoot when oversampled.
+    """
+    t = np.arange(int(sample_rate * seconds)) / sample_rate
+    wave = 10 ** (level_db / 20) * np.sin(2 * np.pi * frequency * t + phase)
+    fade = int(sample_rate * fade_seconds)
+    if fade:
+        ramp = 0.5 - 0.5 * np.cos(np.pi * np.arange(fade) / fade)
+        wave[:fade] *= ramp
+        wave[-fade:] *= ramp[::-1]
+    return np.tile(wave.astype(np.float32), (num_channels, 1))
+
+
+def reference_cases(sample_rate):
+    """
+    Returns (name, audio, expected LUFS or None, expected dBTP or None): EBU Tech 3341
+    cases 1, 2, 3 and 5 (gating) and a true-peak case at a quarter of the sample rate
+    whose samples miss the crest by 3 dB.
+    """
+    return [
+        ("tech3341:1 -23 dBFS tone", tone(sample_rate, 20, -23.0), -23.0, None),
+        ("tech3341:2 -33 dBFS tone", tone(sample_rate, 20, -33.0), -33.0, None),
+        ("tech3341:3 gated -36/-23/-36", np.concatenate(
+            [tone(sample_rate, 10, -36.0), tone(sample_rate, 60, -23.0), tone(sample_rate, 10, -36.0)], axis=1),
+         -23.0, None),
+        ("tech3341:5 gated -26/-20/-26", np.concatenate(
+            [tone(sample_rate, 20, -26.0), tone(sample_rate, 20.1, -20.0), tone(sample_rate, 20, -26.0)], axis=1),
+         -23.0, None),
+        ("true peak fs/4 at 45 degrees", tone(sample_rate, 5, 0.0, sample_rate / 4, phase=math.pi / 4, fade_seconds=0.1),
+         None, 0.0),
+    ]
+
+
+def check(sample_rate=48000, tolerance=CHECK_TOLERANCE, log=print):
+    """
+    Meters the reference cases in one block and in odd-sized streamed blocks and
+    returns the names whose readings miss the reference or differ between the two.
+    """
+    failures = []
+    for name, audio_data, expected_lufs, expected_peak in reference_cases(sample_rate):
+        whole = measure(audio_data, sample_rate, block_size=audio_data.shape[1])
+        streamed = measure(audio_data, sample_rate, block_size=4099)
+        errors = [abs(whole.integrated - streamed.integrated) if whole.integrated > -math.inf else 0.0,
+                  abs(whole.true_peak - streamed.true_peak)]
+        if expected_lufs is not None:
+            errors.append(abs(whole.integrated - expected_lufs))
+        if expected_peak is not None:
+            errors.append(abs(whole.true_peak - expected_peak))
+        ok = max(errors) <= tolerance
+        if not ok:
+            failures.append(name)
+        log(f"{'ok  ' if ok else 'FAIL'} {name:32s} {whole.integrated:7.2f} LUFS {whole.true_peak:6.2f} dBTP "
+            f"{whole.sample_peak:6.2f} dBFS (streamed {streamed.integrated:.2f} LUFS {streamed.true_peak:.2f} dBTP)")
+    return failures
+
+
+def main():
+    """Command line entry point: checks the meter against EBU Tech 3341 reference signals."""
+    parser = argparse.ArgumentParser(description="Check the BS.1770 loudness meter against reference signals.")
+    parser.add_argument("--sample-rates", nargs="+", type=int, default=[44100, 48000])
+    parser.add_argument("--tolerance", type=float, default=CHECK_TOLERANCE)
+    args = parser.parse_args()
+    failures = []
+    for sample_rate in args.sample_rates:
+        start = time.perf_counter()
+        failures += check(sample_rate, args.tolerance)
+        print(f"{sample_rate} Hz checked in {time.perf_counter() - start:.2f} s")
+    print(f"{len(failures)} cases failed")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from scheduler import check_cancelled
+
+# Run chains plugin by plugin so each stage is timed; set PEDALBOARD_INSTRUMENT=0 to
+# render through the board in one opaque call instead.
+INSTRUMENT = os.environ.get("PEDALBOARD_INSTRUMENT", "1") != "0"
+METRICS_HOST = os.environ.get("PEDALBOARD_METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.environ.get("PEDALBOARD_METRICS_PORT", "9464"))
+
+
+class RenderStats:
+    """
+    Timing record for one request: wall time, samples/sec and output bytes allocated
+    per chain stage, plus time spent waiting for a board (queue wait), normalizing and
+    reading or writing files.
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.stages = OrderedDict()
+        self.cached_stages = 0
+        self.optimizations = []
+        self.silence_skipped = None
+        self.loudness = None
+        self.queue_wait = 0.0
+        self.normalize = 0.0
+        self.io = 0.0
+        self._start = time.perf_counter()
+        self.total = None
+
+    def add_stage(self, index, name, seconds, frames, nbytes):
+        stage = self.stages.setdefault(index, {"name": name, "seconds": 0.0, "frames": 0, "bytes": 0})
+        stage["seconds"] += seconds
+        stage["frames"] += frames
+        stage["bytes"] += nbytes
+
+    def stage_seconds(self):
+        return sum(stage["seconds"] for stage in self.stages.values())
+
+    @contextmanager
+    def timed(self, field):
+        """Adds the duration of the with-block to queue_wait, normalize or io."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            setattr(self, field, getattr(self, field) + time.perf_counter() - start)
+
+    def start_running(self):
+        """Counts the time since the stats were created as queue wait."""
+        self.queue_wait += time.perf_counter() - self._start
+
+    def finish(self):
+        """Closes the record and adds it to the global metrics registry."""
+        self.total = time.perf_counter() - self._start
+        registry.observe(self)
+        return self
+
+    def to_markdown(self):
+        lines = ["| Stage | Time (ms) | Samples/sec | Bytes allocated |", "| --- | --- | --- | --- |"]
+        for stage in self.stages.values():
+            rate = stage["frames"] / stage["seconds"] if stage["seconds"] > 0 else 0.0
+            lines.append(f"| {stage['name']} | {stage['seconds'] * 1000:.1f} | {rate:,.0f} | {stage['bytes']:,} |")
+        lines.append(f"| Normalize | {self.normalize * 1000:.1f} | | |")
+        lines.append(f"| File I/O | {self.io * 1000:.1f} | | |")
+        lines.append(f"| Queue wait | {self.queue_wait * 1000:.1f} | | |")
+        if self.cached_stages:
+            lines.append(f"| Cached stages reused | {self.cached_stages} | | |")
+        if self.silence_skipped:
+            lines.append(f"| Silence skipped | {self.silence_skipped:.1%} of samples | | |")
+        if self.loudness:
+            lines.append(f"| Loudness | {self.loudness} | | |")
+        if self.total is not None:
+            lines.append(f"| **Total** | **{self.total * 1000:.1f}** | | |")
+        if self.optimizations:
+            lines.append("")
+            lines.append("Chain optimizations:")
+            lines.extend(f"- {change}" for change in self.optimizations)
+        return "\n".join(lines)
+
+
+class StageTimer:
+    """
+    Wraps a Pedalboard so each plugin is run and timed on its own. It accepts the
+    same call signature as the board, including reset=False for streaming renders.
+    """
+
+    def __init__(self, board, stats):
+        self.board = board
+        self.stats = stats
+
+    def __call__(self, audio_data, sample_rate, reset=True):
+        if not INSTRUMENT:
+            start = time.perf_counter()
+            audio_data = self.board(audio_data, sample_rate, reset=reset)
+            self.stats.add_stage(0, "Pedalboard", time.perf_counter() - start, audio_data.shape[-1], audio_data.nbytes)
+            return audio_data
+        for index, plugin in enumerate(self.board):
+            check_cancelled()
+            start = time.perf_counter()
+            audio_data = plugin(audio_data, sample_rate, reset=reset)
+            self.stats.add_stage(index, type(plugin).__name__, time.perf_counter() - start,
+                                 audio_data.shape[-1], audio_data.nbytes)
+        return audio_data
+
+    def reset(self):
+        self.board.reset()
+
+
+class MetricsRegistry:
+    """
+    Process-wide counters aggregated from finished RenderStats, exposed in the
+    Prometheus text exposition format.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = defaultdict(int)
+        self.request_seconds = defaultdict(float)
+        self.queue_wait_seconds = defaultdict(float)
+        self.io_seconds = defaultdict(float)
+        self.normalize_seconds = defaultdict(float)
+        self.stage_seconds = defaultdict(float)
+        self.stage_samples = defaultdict(int)
+        self.stage_bytes = defaultdict(int)
+        self.gauges = OrderedDict()
+
+    def observe(self, stats):
+        with self._lock:
+            h = stats.handler
+            self.requests[h] += 1
+            self.request_seconds[h] += stats.total or 0.0
+            self.queue_wait_seconds[h] += stats.queue_wait
+            self.io_seconds[h] += stats.io
+            self.normalize_seconds[h] += stats.normalize
+            for stage in stats.stages.values():
+                self.stage_seconds[stage["name"]] += stage["seconds"]
+                self.stage_samples[stage["name"]] += stage["frames"]
+                self.stage_bytes[stage["name"]] += stage["bytes"]
+
+    def register_gauge(self, name, help_text, callback):
+        """Registers a callback returning {label_value: number} sampled at scrape time."""
+        self.gauges[name] = (help_text, callback)
+
+    def render(self):
+        out = []
+
+        def family(name, kind, help_text, label, values):
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} {kind}")
+            for key, value in values.items():
+                out.append(f'{name}{{{label}="{key}"}} {value}')
+
+        with self._lock:
+            family("pedalboard_requests_total", "counter", "Finished render requests.", "handler", self.requests)
+            family("pedalboard_request_seconds_total", "counter", "Wall time of render requests.", "handler", self.request_seconds)
+            family("pedalboard_queue_wait_seconds_total", "counter", "Time spent waiting for a board or worker.", "handler", self.queue_wait_seconds)
+            family("pedalboard_io_seconds_total", "counter", "Time spent reading and writing audio files.", "handler", self.io_seconds)
+            family("pedalboard_normalize_seconds_total", "counter", "Time spent in peak or loudness normalization.", "handler", self.normalize_seconds)
+            family("pedalboard_stage_seconds_total", "counter", "Processing time per effect type.", "stage", self.stage_seconds)
+            family("pedalboard_stage_samples_total", "counter", "Frames processed per effect type.", "stage", self.stage_samples)
+            family("pedalboard_stage_bytes_total", "counter", "Output bytes allocated per effect type.", "stage", self.stage_bytes)
+            gauges = list(self.gauges.items())
+        for name, (help_text, callback) in gauges:
+            family(name, "gauge", help_text, "field", callback())
+        return "\n".join(out) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(host=METRICS_HOST, port=METRICS_PORT):
+    """
+    Serves GET /metrics on a daemon thread. Returns the server, or None if the port
+    is unavailable.
+    """
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        print(f"Metrics endpoint disabled: {e}")
+        return None
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
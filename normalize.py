@@ -0,0 +1,93 @@
+import os
+import tempfile
+import numpy as np
+from encode import BackgroundWriter
+
+# Frames rescaled per step in the second normalization pass.
+NORMALIZE_BLOCK_SIZE = 262144
+
+
+def block_peak(block):
+    """
+    Returns the absolute peak of a block without allocating an abs() temporary.
+    """
+    if block.size == 0:
+        return 0.0
+    return float(max(block.max(), -block.min()))
+
+
+def normalize_in_place(audio_data, ceiling=1.0):
+    """
+    Scales audio_data in place so its peak does not exceed the ceiling and returns the
+    original peak. Audio already under the ceiling is left untouched.
+    """
+    peak = block_peak(audio_data)
+    if peak > ceiling:
+        np.divide(audio_data, peak / ceiling, out=audio_data)
+    return peak
+
+
+def peak_normalized(audio_data, ceiling=1.0):
+    """
+    Returns audio_data scaled so its peak does not exceed the ceiling. Unlike
+    normalize_in_place this never modifies its argument, so it is safe on read-only
+    cached buffers; a new array is allocated only when scaling is needed.
+    """
+    peak = block_peak(audio_data)
+    if peak > ceiling:
+        return np.divide(audio_data, peak / ceiling, dtype=np.float32)
+    return audio_data
+
+
+def write_two_pass(processed_blocks, output_path, sample_rate, num_channels, observe, gain_for,
+                   output_format=None, block_size=NORMALIZE_BLOCK_SIZE, tap=None):
+    """
+    Two-pass out-of-core gain stage. The first pass spools the processed channels-first
+    blocks to a temporary float32 file next to the output, passing each to observe;
+    gain_for() then returns the gain to apply. The second pass memory-maps the spool,
+    scales it in place block by block and hands each block to a BackgroundWriter (and
+    to tap, if given), so encoding one block overlaps with scaling the next. Returns
+    the number of frames written.
+    """
+    spool_dir = os.path.dirname(os.path.abspath(output_path))
+    with tempfile.TemporaryFile(dir=spool_dir, suffix=".f32") as spool:
+        frames = 0
+        for block in processed_blocks:
+            observe(block)
+            interleaved = np.ascontiguousarray(block.T, dtype=np.float32)
+            spool.write(interleaved.data)
+            frames += interleaved.shape[0]
+        spool.flush()
+        gain = gain_for()
+
+        with BackgroundWriter(output_path, sample_rate, num_channels, output_format) as out:
+            if frames == 0:
+                return 0
+            rendered = np.memmap(spool, dtype=np.float32, mode="r+", shape=(frames, num_channels))
+            for start in range(0, frames, block_size):
+                chunk = rendered[start:start + block_size]
+                if gain != 1.0:
+                    np.multiply(chunk, gain, out=chunk)
+                out.write(chunk.T)
+                if tap is not None:
+                    tap(chunk.T)
+            del rendered
+    return frames
+
+
+def write_normalized(processed_blocks, output_path, sample_rate, num_channels,
+                     ceiling=1.0, output_format=None, block_size=NORMALIZE_BLOCK_SIZE, tap=None):
+    """
+    Two-pass out-of-core peak normalization (see write_two_pass): the first pass tracks
+    the running peak and the second scales the output down when it exceeds the
+    ceiling. Returns (frames, peak).
+    """
+    peaks = []
+
+    def gain_for():
+        peak = max(peaks, default=0.0)
+        return ceiling / peak if peak > ceiling else 1.0
+
+    frames = write_two_pass(processed_blocks, output_path, sample_rate, num_channels,
+                            lambda block: peaks.append(block_peak(block)), gain_for, output_format, block_size, tap)
+    return frames, max(peaks, default=0.0)
@@ -0,0 +1,62 @@
+import argparse
+import os
+import sys
+import numpy as np
+from catalog import PRESET_DIR
+from presets import build_board, optimize_chain, parse_chain, preset_cache
+
+# Largest difference from the unoptimized chain `check` accepts; PitchShift by 0
+# semitones is the only rule that is not bit-exact.
+CHECK_TOLERANCE = 1e-5
+
+
+def check(chains, sample_rate=44100, seconds=2.0, tolerance=CHECK_TOLERANCE, log=print):
+    """
+    Renders noise through each (name, chain) as written and optimized and returns the
+    names whose outputs differ by more than tolerance.
+    """
+    audio_data = (np.random.default_rng(0).standard_normal((2, int(sample_rate * seconds))) * 0.25).astype(np.float32)
+    failures = []
+    for name, chain in chains:
+        optimized, changes, _ = optimize_chain(chain)
+        expected = build_board(chain)(audio_data, sample_rate)
+        actual = build_board(optimized)(audio_data, sample_rate)
+        diff = float(np.abs(expected - actual).max()) if expected.shape == actual.shape else float("inf")
+        ok = diff <= tolerance
+        if not ok:
+            failures.append(name)
+        log(f"{'ok  ' if ok else 'FAIL'} {name:36s} {len(chain)} -> {len(optimized)} stages, max diff {diff:.3g}")
+        for change in changes:
+            log(f"       {change}")
+    return failures
+
+
+# Chains exercising every rule, checked alongside the shipped presets.
+CHECK_CHAINS = [
+    "[Chorus(mix=0.0), Reverb(room_size=0.8)]",
+    "[Delay(delay_seconds=0.3, feedback=0.5, mix=0), Compressor(threshold_db=-20, ratio=1)]",
+    "[Phaser(mix=0.0), PitchShift(semitones=0), Distortion(drive_db=6)]",
+    "[Reverb(wet_level=0.0), Gain(gain_db=3), Limiter()]",
+    "[Reverb(wet_level=0.0, dry_level=0.5), Gain(gain_db=-6), Gain(gain_db=2)]",
+    "[HighpassFilter(cutoff_frequency_hz=200), LowpassFilter(cutoff_frequency_hz=5000), Gain(gain_db=0)]",
+]
+
+
+def main():
+    """Command line entry point: checks optimized chains against the chains as written."""
+    parser = argparse.ArgumentParser(description="Check that optimized chains render the same audio.")
+    parser.add_argument("--tolerance", type=float, default=CHECK_TOLERANCE)
+    args = parser.parse_args()
+    chains = [(f"check:{i + 1}", parse_chain(text)) for i, text in enumerate(CHECK_CHAINS)]
+    for f in sorted(os.listdir(PRESET_DIR)):
+        if f.endswith(".pdl"):
+            try:
+                chains.append((f"preset:{f}", preset_cache.get(os.path.join(PRESET_DIR, f)).chain))
+            except ValueError as e:
+                print(f"Skipping {f}: {e}")
+    failures = check(chains, tolerance=args.tolerance)
+    print(f"{len(failures)} chains differ")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
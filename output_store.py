@@ -0,0 +1,110 @@
+import datetime
+import os
+import threading
+import time
+import uuid
+
+OUTPUT_DIR = os.environ.get("PEDALBOARD_OUTPUT_DIR", "outputs")
+# Rendered files older than this many seconds are deleted by the janitor.
+OUTPUT_MAX_AGE = float(os.environ.get("PEDALBOARD_OUTPUT_MAX_AGE", str(24 * 3600)))
+# Total bytes of rendered files kept; the oldest are deleted beyond this.
+OUTPUT_MAX_BYTES = int(os.environ.get("PEDALBOARD_OUTPUT_MAX_BYTES", str(5 * 1024 ** 3)))
+# Seconds between janitor sweeps.
+JANITOR_INTERVAL = float(os.environ.get("PEDALBOARD_OUTPUT_JANITOR_INTERVAL", "300"))
+
+
+class OutputStore:
+    """
+    Directory for rendered files. Every output gets a unique name made of the requested
+    stem, a timestamp, a per-request id and a content hash, so concurrent renders never
+    overwrite each other. A background janitor deletes files older than max_age and,
+    oldest first, files beyond max_bytes.
+    """
+
+    def __init__(self, directory=OUTPUT_DIR, max_age=OUTPUT_MAX_AGE, max_bytes=OUTPUT_MAX_BYTES,
+                 interval=JANITOR_INTERVAL):
+        self.directory = directory
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.sweeps = 0
+        self.evicted_files = 0
+        self.evicted_bytes = 0
+        self._usage = (0, 0)
+        self._lock = threading.Lock()
+        self._janitor = None
+
+    def path_for(self, output_filename, content_key=None, request_id=None):
+        """
+        Returns a new path in the store for output_filename, e.g.
+        "outputs/reverb_large_20250215_094114_3f2a9c1e_8d41b0aa.wav".
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        stem, ext = os.path.splitext(os.path.basename(output_filename))
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        request_id = request_id or uuid.uuid4().hex[:8]
+        parts = [stem, timestamp, request_id] + ([content_key[:8]] if content_key else [])
+        return os.path.join(self.directory, "_".join(parts) + (ext or ".wav"))
+
+    def _scan(self):
+        files = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return files
+        for name in names:
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if os.path.isfile(path):
+                files.append((st.st_mtime, st.st_size, path))
+        files.sort()
+        return files
+
+    def sweep(self, now=None):
+        """Deletes expired files, then the oldest ones beyond the byte budget."""
+        now = time.time() if now is None else now
+        files = self._scan()
+        total = sum(size for _, size, _ in files)
+        kept = 0
+        for mtime, size, path in files:
+            if now - mtime <= self.max_age and total <= self.max_bytes:
+                kept += 1
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                kept += 1
+                continue
+            total -= size
+            with self._lock:
+                self.evicted_files += 1
+                self.evicted_bytes += size
+        with self._lock:
+            self.sweeps += 1
+            self._usage = (kept, total)
+
+    def _janitor_loop(self):
+        while True:
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Output janitor failed: {e}")
+            time.sleep(self.interval)
+
+    def start_janitor(self):
+        """Starts the background janitor thread once."""
+        if self._janitor is None:
+            self._janitor = threading.Thread(target=self._janitor_loop, daemon=True, name="output-janitor")
+            self._janitor.start()
+
+    def stats(self):
+        with self._lock:
+            files, total = self._usage
+            return {"files": files, "bytes": total, "evicted_files": self.evicted_files,
+                    "evicted_bytes": self.evicted_bytes, "sweeps": self.sweeps}
+
+
+output_store = OutputStore()
@@ -0,0 +1,233 @@
+import os
+from functools import lru_cache
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Set PEDALBOARD_OVERVIEWS=0 to skip writing waveform/spectrogram overviews next to outputs.
+OVERVIEWS = os.environ.get("PEDALBOARD_OVERVIEWS", "1") != "0"
+# Frames summarized by one min/max pair at the finest pyramid level.
+OVERVIEW_BUCKET_FRAMES = 256
+# Each pyramid level merges this many buckets of the level below.
+PYRAMID_FACTOR = 4
+# Coarsest pyramid level has at most this many buckets.
+PYRAMID_MIN_BUCKETS = 1024
+# The spectrogram analyzes one SPECTRUM_FFT_SIZE window every SPECTRUM_HOP frames.
+SPECTRUM_FFT_SIZE = 2048
+SPECTRUM_HOP = 8192
+SPECTRUM_BANDS = 128
+# Spectrogram levels are stored as uint8 over this dB range below full scale.
+SPECTRUM_FLOOR_DB = -120.0
+
+
+def overview_path(output_path):
+    """Returns the path of the overview cached next to a rendered file."""
+    return output_path + ".overview.npz"
+
+
+def _band_starts(sample_rate, fft_size=SPECTRUM_FFT_SIZE, bands=SPECTRUM_BANDS):
+    # Log-spaced bands from 20 Hz to Nyquist; bands narrower than one bin are merged.
+    edges = np.geomspace(20.0, sample_rate / 2, bands + 1)
+    starts = np.unique(np.clip(np.round(edges[:-1] * fft_size / sample_rate).astype(int), 1, fft_size // 2))
+    return starts
+
+
+class Overview:
+    """
+    A min/max peak pyramid and a decimated, log-band spectrogram of a signal. Level 0
+    holds one (min, max) pair per bucket_frames frames (across all channels) and each
+    further level merges PYRAMID_FACTOR buckets, so any zoom is drawn from roughly as
+    many buckets as there are pixels. The spectrogram has one column per hop frames and
+    one row per band, as uint8 levels over SPECTRUM_FLOOR_DB..0 dB.
+    """
+
+    def __init__(self, sample_rate, frames, bucket_frames, mins, maxs, spectrum, hop, band_hz):
+        self.sample_rate = int(sample_rate)
+        self.frames = int(frames)
+        self.bucket_frames = int(bucket_frames)
+        self.mins = mins
+        self.maxs = maxs
+        self.spectrum = spectrum
+        self.hop = int(hop)
+        self.band_hz = band_hz
+
+    @property
+    def duration(self):
+        return self.frames / self.sample_rate
+
+    def save(self, path):
+        arrays = {f"min_{i}": level for i, level in enumerate(self.mins)}
+        arrays.update({f"max_{i}": level for i, level in enumerate(self.maxs)})
+        with open(path, "wb") as f:
+            np.savez_compressed(f, sample_rate=self.sample_rate, frames=self.frames, bucket_frames=self.bucket_frames,
+                                spectrum=self.spectrum, hop=self.hop, band_hz=self.band_hz, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            levels = sum(1 for name in data.files if name.startswith("min_"))
+            return cls(data["sample_rate"], data["frames"], data["bucket_frames"],
+                       [data[f"min_{i}"] for i in range(levels)], [data[f"max_{i}"] for i in range(levels)],
+                       data["spectrum"], data["hop"], data["band_hz"])
+
+    def _window(self, start_seconds, length_seconds):
+        start = min(max(int((start_seconds or 0.0) * self.sample_rate), 0), max(self.frames - 1, 0))
+        end = self.frames if not length_seconds else min(start + int(length_seconds * self.sample_rate), self.frames)
+        return start, max(end, start + 1)
+
+    def waveform(self, start_seconds=0.0, length_seconds=0.0, width=1000):
+        """
+        Returns (mins, maxs) with one pair per pixel column for the window, read from
+        the coarsest pyramid level that still has a bucket per column.
+        """
+        start, end = self._window(start_seconds, length_seconds)
+        level = 0
+        while (level + 1 < len(self.mins)
+               and (end - start) / (self.bucket_frames * PYRAMID_FACTOR ** (level + 1)) >= width):
+            level += 1
+        bucket = self.bucket_frames * PYRAMID_FACTOR ** level
+        first, last = start // bucket, min(-(-end // bucket), len(self.mins[level]))
+        mins = self.mins[level][first:max(last, first + 1)].astype(np.float32)
+        maxs = self.maxs[level][first:max(last, first + 1)].astype(np.float32)
+        columns = np.linspace(0, len(mins), width, endpoint=False).astype(int)
+        return np.minimum.reduceat(mins, columns), np.maximum.reduceat(maxs, columns)
+
+    def spectrogram(self, start_seconds=0.0, length_seconds=0.0, width=1000):
+        """Returns the (bands, width) uint8 spectrogram of the window, highest band first."""
+        start, end = self._window(start_seconds, length_seconds)
+        columns = self.spectrum[start // self.hop:max(-(-end // self.hop), start // self.hop + 1)]
+        if len(columns) == 0:
+            return np.zeros((len(self.band_hz), width), dtype=np.uint8)
+        picks = np.linspace(0, len(columns), width, endpoint=False).astype(int)
+        return np.maximum.reduceat(columns, picks, axis=0).T[::-1]
+
+
+class OverviewBuilder:
+    """
+    Builds an Overview from channels-first blocks as they are rendered, so it costs
+    one vectorized pass over data that is already in memory. Per-frame min/max across
+    channels are reduced into buckets, and every hop frames one Hann-windowed FFT of
+    the channel mix is reduced to log-spaced bands; partial buckets and windows carry
+    over to the next block.
+    """
+
+    def __init__(self, sample_rate, bucket_frames=OVERVIEW_BUCKET_FRAMES, fft_size=SPECTRUM_FFT_SIZE,
+                 hop=SPECTRUM_HOP):
+        self.sample_rate = sample_rate
+        self.bucket_frames = bucket_frames
+        self.fft_size = fft_size
+        self.hop = hop
+        self.frames = 0
+        self._mins = []
+        self._maxs = []
+        self._carry_min = np.empty(0, dtype=np.float32)
+        self._carry_max = np.empty(0, dtype=np.float32)
+        self._columns = []
+        self._mix = np.empty(0, dtype=np.float32)
+        self._mix_offset = 0
+        self._next_window = 0
+        self._window = np.hanning(fft_size).astype(np.float32)
+        # A full-scale sine reads 0 dB.
+        self._window_gain = 2.0 / self._window.sum()
+        self._band_starts = _band_starts(sample_rate, fft_size)
+
+    def add(self, block):
+        if block.shape[1] == 0:
+            return
+        self.frames += block.shape[1]
+        lo = np.concatenate((self._carry_min, block.min(axis=0)))
+        hi = np.concatenate((self._carry_max, block.max(axis=0)))
+        full = len(lo) // self.bucket_frames * self.bucket_frames
+        if full:
+            self._mins.append(lo[:full].reshape(-1, self.bucket_frames).min(axis=1))
+            self._maxs.append(hi[:full].reshape(-1, self.bucket_frames).max(axis=1))
+        self._carry_min, self._carry_max = lo[full:], hi[full:]
+
+        self._mix = np.concatenate((self._mix, block.mean(axis=0, dtype=np.float32)))
+        first = self._next_window - self._mix_offset
+        if len(self._mix) - first >= self.fft_size:
+            windows = sliding_window_view(self._mix, self.fft_size)[first::self.hop]
+            self._columns.append(self._bands(windows))
+            self._next_window += len(windows) * self.hop
+        drop = min(self._next_window - self._mix_offset, len(self._mix))
+        self._mix = self._mix[drop:]
+        self._mix_offset += drop
+
+    def _bands(self, windows):
+        magnitude = np.abs(np.fft.rfft(windows * self._window, axis=1)) * self._window_gain
+        bands = np.maximum.reduceat(magnitude, self._band_starts, axis=1)
+        return (20 * np.log10(np.maximum(bands, 1e-7))).astype(np.float32)
+
+    def finish(self, ceiling=None):
+        """
+        Returns the Overview. With a ceiling, levels are scaled the way peak
+        normalization scales the audio, so it can be built from the raw render.
+        """
+        mins = self._mins + ([self._carry_min[None].min(axis=1)] if len(self._carry_min) else [])
+        maxs = self._maxs + ([self._carry_max[None].max(axis=1)] if len(self._carry_max) else [])
+        mins = np.concatenate(mins) if mins else np.zeros(1, dtype=np.float32)
+        maxs = np.concatenate(maxs) if maxs else np.zeros(1, dtype=np.float32)
+        spectrum = np.concatenate(self._columns) if self._columns else np.empty((0, len(self._band_starts)), np.float32)
+        peak = float(max(maxs.max(), -mins.min()))
+        if ceiling is not None and peak > ceiling:
+            mins = mins * (ceiling / peak)
+            maxs = maxs * (ceiling / peak)
+            spectrum = spectrum + 20 * np.log10(ceiling / peak)
+        levels = np.clip((spectrum - SPECTRUM_FLOOR_DB) * (255 / -SPECTRUM_FLOOR_DB), 0, 255)
+        min_levels, max_levels = [mins.astype(np.float16)], [maxs.astype(np.float16)]
+        while len(min_levels[-1]) > PYRAMID_MIN_BUCKETS:
+            min_levels.append(_reduce(min_levels[-1], np.minimum))
+            max_levels.append(_reduce(max_levels[-1], np.maximum))
+        band_hz = self._band_starts * self.sample_rate / self.fft_size
+        return Overview(self.sample_rate, self.frames, self.bucket_frames, min_levels, max_levels,
+                        np.round(levels).astype(np.uint8), self.hop, band_hz)
+
+
+def _reduce(level, op):
+    pad = -len(level) % PYRAMID_FACTOR
+    padded = np.concatenate((level, np.repeat(level[-1:], pad)))
+    return op.reduce(padded.reshape(-1, PYRAMID_FACTOR), axis=1)
+
+
+def build_overview(audio_data, sample_rate, ceiling=None, block_size=262144):
+    """Builds the Overview of a channels-first array."""
+    builder = OverviewBuilder(sample_rate)
+    for start in range(0, audio_data.shape[1], block_size):
+        builder.add(audio_data[:, start:start + block_size])
+    return builder.finish(ceiling)
+
+
+def save_overview(audio_data, sample_rate, output_path):
+    """Caches the overview of a rendered array next to output_path, if overviews are enabled."""
+    if OVERVIEWS:
+        build_overview(audio_data, sample_rate).save(overview_path(output_path))
+
+
+@lru_cache(maxsize=16)
+def load_overview(path):
+    """Loads a cached overview; recently viewed ones stay in memory for zooming."""
+    return Overview.load(path)
+
+
+# Colors the spectrogram levels are interpolated between, from silence to full scale.
+_SPECTRUM_COLORS = np.array([[0, 0, 4], [59, 15, 112], [140, 41, 129], [222, 73, 104], [254, 159, 109], [252, 253, 191]])
+SPECTRUM_LUT = np.stack([np.interp(np.arange(256), np.linspace(0, 255, len(_SPECTRUM_COLORS)), _SPECTRUM_COLORS[:, c])
+                         for c in range(3)], axis=1).astype(np.uint8)
+WAVEFORM_COLOR = np.array([64, 160, 255], dtype=np.uint8)
+BACKGROUND_COLOR = np.array([24, 24, 27], dtype=np.uint8)
+
+
+def render_image(overview, start_seconds=0.0, length_seconds=0.0, width=1000, waveform_height=120,
+                 spectrogram_height=160):
+    """
+    Draws the window as an RGB uint8 image: the min/max waveform envelope above the
+    spectrogram. Every pixel is computed with array operations, so redrawing a zoomed
+    window takes milliseconds whatever the length of the audio.
+    """
+    mins, maxs = overview.waveform(start_seconds, length_seconds, width)
+    values = np.linspace(1.0, -1.0, waveform_height, dtype=np.float32)[:, None]
+    inside = (values >= mins[None, :] - 1.0 / waveform_height) & (values <= maxs[None, :] + 1.0 / waveform_height)
+    wave = np.where(inside[..., None], WAVEFORM_COLOR, BACKGROUND_COLOR)
+    spectrum = overview.spectrogram(start_seconds, length_seconds, width)
+    rows = np.linspace(0, spectrum.shape[0], spectrogram_height, endpoint=False).astype(int)
+    spectrogram = SPECTRUM_LUT[spectrum[rows]]
+    return np.concatenate((wave.astype(np.uint8), spectrogram), axis=0)
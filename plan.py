@@ -15,16 +15,39 @@ from pedalboard import (
     LadderFilter
 )
 import numpy as np
+import os
+from encode import write_audio
+from ingest import to_channels_first
+from normalize import normalize_in_place
+from presets import build_board, preset_cache
+from render import render_tailed
 
 class PedalboardDemo:
-    def __init__(self, input_file):
-        """Initialize the demo with an input audio file."""
+    def __init__(self, input_file, output_dir=None):
+        """Initialize the demo with an input audio file and an optional output directory."""
         self.audio, self.sample_rate = sf.read(input_file)
+        self.output_dir = output_dir
         
     def save_audio(self, audio_data, filename):
         """Save the processed audio to a file."""
+        if self.output_dir:
+            filename = os.path.join(self.output_dir, filename)
         sf.write(filename, audio_data, self.sample_rate)
         
+    def apply_preset(self, pdl_file_path, filename=None):
+        """
+        Apply a .pdl preset to the input on a board of its own, keeping the effect tail
+        and skipping silence as a streamed render does, then peak-normalize it and save
+        it as float WAV.
+        """
+        preset = preset_cache.get(pdl_file_path)
+        processed, _ = render_tailed(build_board(preset.chain), to_channels_first(self.audio), self.sample_rate)
+        normalize_in_place(processed)
+        filename = filename or preset.output_filename
+        if self.output_dir:
+            filename = os.path.join(self.output_dir, filename)
+        write_audio(processed, filename, self.sample_rate)
+        
     def demo_all_effects(self):
         """Run all effect demos."""
         self.demo_chorus()
@@ -186,4 +209,4 @@ def main():
     print("Demo complete! Check the output files in the current directory.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
\ No newline at end of file
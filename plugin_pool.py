@@ -0,0 +1,84 @@
+import threading
+from collections import OrderedDict
+from pedalboard import Pedalboard
+from presets import ALLOWED_EFFECTS
+
+# Designer sessions whose plugin pools are kept; the least recently used is dropped.
+DEFAULT_MAX_SESSIONS = 64
+
+
+class PluginPool:
+    """
+    One plugin instance per Designer slot (e.g. "Reverb Large", "Delay Multi/2"),
+    reused across clicks. Moving a slider updates the existing plugin through its
+    property setters; the Pedalboard itself is only rebuilt when the set of enabled
+    slots changes. Plugins keep state between renders, so hold `lock` while updating
+    and rendering through the board.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.board = Pedalboard([])
+        self.created = 0
+        self.updated = 0
+        self.rebuilds = 0
+        self._plugins = {}
+        self._params = {}
+        self._enabled = ()
+
+    def update(self, slots, chain):
+        """
+        Brings the pool in line with a parsed chain, where slots[i] names the Designer
+        slot chain[i] came from, and returns the board.
+        """
+        enabled = tuple(slots)
+        rebuild = enabled != self._enabled
+        for slot, spec in zip(slots, chain):
+            params = dict(spec.kwargs)
+            plugin = self._plugins.get(slot)
+            if (plugin is None or type(plugin) is not ALLOWED_EFFECTS[spec.name] or spec.args
+                    or params.keys() != self._params[slot].keys()):
+                self._plugins[slot] = spec.build()
+                self.created += 1
+                rebuild = True
+            else:
+                previous = self._params[slot]
+                for name, value in params.items():
+                    if previous.get(name) != value:
+                        setattr(plugin, name, value)
+                        self.updated += 1
+            self._params[slot] = params
+        if rebuild:
+            self.board = Pedalboard([self._plugins[slot] for slot in enabled])
+            self._enabled = enabled
+            self.rebuilds += 1
+        return self.board
+
+
+class PluginPools:
+    """Bounded LRU of PluginPool objects keyed by session id."""
+
+    def __init__(self, max_sessions=DEFAULT_MAX_SESSIONS):
+        self.max_sessions = max_sessions
+        self._pools = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        with self._lock:
+            pool = self._pools.get(session_id)
+            if pool is None:
+                pool = self._pools[session_id] = PluginPool()
+                while len(self._pools) > self.max_sessions:
+                    self._pools.popitem(last=False)
+            self._pools.move_to_end(session_id)
+            return pool
+
+    def stats(self):
+        with self._lock:
+            pools = list(self._pools.values())
+        return {"sessions": len(pools), "plugins_created": sum(p.created for p in pools),
+                "parameters_updated": sum(p.updated for p in pools),
+                "board_rebuilds": sum(p.rebuilds for p in pools)}
+
+
+plugin_pools = PluginPools()
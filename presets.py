@@ -0,0 +1,289 @@
+import ast
+import functools
+import math
+import os
+import re
+import threading
+from collections import OrderedDict, namedtuple
+from pedalboard import (
+    Pedalboard,
+    Chorus,
+    Compressor,
+    Delay,
+    Distortion,
+    Gain,
+    HighpassFilter,
+    LowpassFilter,
+    Phaser,
+    Reverb,
+    PitchShift,
+    Limiter,
+    LadderFilter
+)
+
+ALLOWED_EFFECTS = {
+    "Chorus": Chorus,
+    "Compressor": Compressor,
+    "Delay": Delay,
+    "Distortion": Distortion,
+    "Gain": Gain,
+    "HighpassFilter": HighpassFilter,
+    "LowpassFilter": LowpassFilter,
+    "Phaser": Phaser,
+    "Reverb": Reverb,
+    "PitchShift": PitchShift,
+    "Limiter": Limiter,
+    "LadderFilter": LadderFilter,
+}
+
+# Set PEDALBOARD_OPTIMIZE=0 to render preset chains exactly as written.
+OPTIMIZE = os.environ.get("PEDALBOARD_OPTIMIZE", "1") != "0"
+
+PDL_PATTERN = re.compile(r'(\[.*?\])\s*,\s*"([^"]+)"', re.DOTALL)
+
+
+class EffectSpec(namedtuple("EffectSpec", ["name", "args", "kwargs"])):
+    """
+    A single validated stage of an effect chain: the effect name, its positional
+    arguments and its keyword arguments as a tuple of (name, value) pairs.
+    """
+
+    def build(self):
+        """Instantiate a fresh plugin for this stage."""
+        return ALLOWED_EFFECTS[self.name](*self.args, **dict(self.kwargs))
+
+
+def _literal(node):
+    """
+    Resolves an argument node to a value. Plain literals go through ast.literal_eval;
+    attribute chains such as LadderFilter.Mode.HPF12 are resolved against the
+    allowed effect classes.
+    """
+    if isinstance(node, ast.Attribute):
+        parts = []
+        while isinstance(node, ast.Attribute):
+            parts.append(node.attr)
+            node = node.value
+        if not isinstance(node, ast.Name) or node.id not in ALLOWED_EFFECTS:
+            raise ValueError("Only effect class attributes may be referenced")
+        value = ALLOWED_EFFECTS[node.id]
+        for attr in reversed(parts):
+            if attr.startswith("_"):
+                raise ValueError(f"Private attribute '{attr}' is not allowed")
+            value = getattr(value, attr)
+        return value
+    return ast.literal_eval(node)
+
+
+def parse_chain(effect_chain_str):
+    """
+    Parses an effect chain string like "[Chorus(mix=0.3), Reverb()]" into a tuple
+    of EffectSpec without evaluating any code.
+    """
+    try:
+        tree = ast.parse(effect_chain_str.strip().rstrip(","), mode="eval")
+        if not isinstance(tree.body, ast.List):
+            raise ValueError("Effect chain must be a list")
+        chain = []
+        for call in tree.body.elts:
+            if not isinstance(call, ast.Call) or not isinstance(call.func, ast.Name):
+                raise ValueError("Each effect must be a call like Reverb(...)")
+            if call.func.id not in ALLOWED_EFFECTS:
+                raise ValueError(f"Unknown effect '{call.func.id}'")
+            args = tuple(_literal(a) for a in call.args)
+            kwargs = tuple((k.arg, _literal(k.value)) for k in call.keywords)
+            chain.append(EffectSpec(call.func.id, args, kwargs))
+    except (SyntaxError, ValueError, AttributeError) as e:
+        raise ValueError(f"Error evaluating effect chain: {e}")
+    return tuple(chain)
+
+
+def parse_pdl(content):
+    """
+    Parses the text of a .pdl file and returns (chain, output_filename).
+    """
+    match = PDL_PATTERN.search(content)
+    if not match:
+        raise ValueError("Invalid .pdl file format. Expected format: [effects], \"output_filename.wav\"")
+    return parse_chain(match.group(1)), match.group(2)
+
+
+def _format_value(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return repr(value) if isinstance(value, str) else str(value)
+    return repr(float(value))
+
+
+def chain_signature(chain):
+    """
+    Returns a canonical parameter string for a chain: keyword arguments are sorted and
+    numbers formatted as floats, so equivalent chains written differently (e.g. 3 vs 3.0)
+    produce the same signature.
+    """
+    parts = []
+    for spec in chain:
+        args = [_format_value(a) for a in spec.args]
+        args += [f"{k}={_format_value(v)}" for k, v in sorted(spec.kwargs)]
+        parts.append(f"{spec.name}({', '.join(args)})")
+    return "[" + ", ".join(parts) + "]"
+
+
+# Stages that pass audio through unchanged when a parameter has this value.
+NO_OP_PARAMS = {
+    "Chorus": ("mix", 0.0),
+    "Delay": ("mix", 0.0),
+    "Phaser": ("mix", 0.0),
+    "Gain": ("gain_db", 0.0),
+    "Compressor": ("ratio", 1.0),
+    "PitchShift": ("semitones", 0.0),
+}
+
+
+@functools.lru_cache(maxsize=None)
+def _default_plugin(name):
+    return ALLOWED_EFFECTS[name]()
+
+
+def _param(spec, name):
+    """Returns a stage's parameter, falling back to the plugin's default."""
+    kwargs = dict(spec.kwargs)
+    if name in kwargs:
+        return kwargs[name]
+    return getattr(_default_plugin(spec.name), name)
+
+
+def _describe(spec):
+    return f"{spec.name}({', '.join(f'{k}={v}' for k, v in spec.kwargs)})"
+
+
+def optimize_chain(chain):
+    """
+    Rewrites a parsed chain into an equivalent, cheaper one. Returns (chain, changes,
+    sources): the new chain, a description of each rewrite, and for each new stage
+    the index of the original stage it came from.
+
+    - Stages that are exact pass-throughs are dropped (see NO_OP_PARAMS).
+    - Reverb with wet_level=0 only scales the dry signal by 2 x dry_level, so it
+      becomes a Gain stage.
+    - Adjacent Gain stages are merged into one.
+
+    Stages with positional arguments are left alone.
+    """
+    optimized = []
+    sources = []
+    changes = []
+    for index, spec in enumerate(chain):
+        if spec.args:
+            optimized.append(spec)
+            sources.append(index)
+            continue
+        if spec.name in NO_OP_PARAMS:
+            name, value = NO_OP_PARAMS[spec.name]
+            if float(_param(spec, name)) == value:
+                changes.append(f"Dropped stage {index + 1} {_describe(spec)}: {name}={value:g} is a no-op")
+                continue
+        if spec.name == "Reverb" and float(_param(spec, "wet_level")) == 0.0 \
+                and float(_param(spec, "freeze_mode")) < 0.5 and float(_param(spec, "dry_level")) > 0.0:
+            gain_db = 20 * math.log10(2 * float(_param(spec, "dry_level")))
+            if gain_db == 0.0:
+                changes.append(f"Dropped stage {index + 1} {_describe(spec)}: wet_level=0 and dry_level=0.5 is a no-op")
+                continue
+            spec = EffectSpec("Gain", (), (("gain_db", gain_db),))
+            changes.append(f"Replaced stage {index + 1} Reverb with Gain(gain_db={gain_db:.2f}): wet_level is 0")
+        if spec.name == "Gain" and optimized and optimized[-1].name == "Gain" and not optimized[-1].args:
+            gain_db = float(_param(optimized[-1], "gain_db")) + float(_param(spec, "gain_db"))
+            optimized[-1] = EffectSpec("Gain", (), (("gain_db", gain_db),))
+            changes.append(f"Merged stage {index + 1} Gain into the Gain before it ({gain_db:.2f} dB)")
+            continue
+        optimized.append(spec)
+        sources.append(index)
+    return tuple(optimized), changes, sources
+
+
+def build_board(chain):
+    """Builds a new Pedalboard from a parsed chain."""
+    try:
+        return Pedalboard([spec.build() for spec in chain])
+    except Exception as e:
+        raise ValueError(f"Error evaluating effect chain: {e}")
+
+
+class CompiledPreset:
+    """
+    A parsed .pdl preset together with a ready-to-use Pedalboard built from the
+    optimized chain; `optimizations` lists what the optimizer changed. The board keeps
+    plugin state, so callers must hold `lock` while rendering through it.
+    """
+
+    def __init__(self, path, chain, output_filename):
+        self.path = path
+        self.chain = chain
+        self.output_filename = output_filename
+        self.optimizations = []
+        if OPTIMIZE:
+            chain, self.optimizations, _ = optimize_chain(chain)
+        self.board = build_board(chain)
+        self.lock = threading.Lock()
+
+
+def compile_preset(pdl_file_path):
+    """
+    Reads and compiles a .pdl file into a CompiledPreset.
+    """
+    try:
+        with open(pdl_file_path, "r") as f:
+            content = f.read()
+    except Exception as e:
+        raise ValueError(f"Error reading {pdl_file_path}: {e}")
+    chain, output_filename = parse_pdl(content)
+    return CompiledPreset(pdl_file_path, chain, output_filename)
+
+
+class PresetCache:
+    """
+    Bounded LRU of compiled presets keyed by .pdl path. An entry is recompiled
+    only when the file's mtime or size changes.
+    """
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, pdl_file_path):
+        """Returns the CompiledPreset for a path, compiling it on a miss."""
+        try:
+            st = os.stat(pdl_file_path)
+        except OSError as e:
+            raise ValueError(f"Error reading {pdl_file_path}: {e}")
+        signature = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            entry = self._entries.get(pdl_file_path)
+            if entry is not None and entry[0] == signature:
+                self._entries.move_to_end(pdl_file_path)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        compiled = compile_preset(pdl_file_path)
+        with self._lock:
+            self._entries[pdl_file_path] = (signature, compiled)
+            self._entries.move_to_end(pdl_file_path)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return compiled
+
+    def stats(self):
+        """Returns hit/miss counters and the current number of entries."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+preset_cache = PresetCache()
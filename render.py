@@ -0,0 +1,295 @@
+import math
+import os
+import time
+import numpy as np
+import soundfile as sf
+from catalog import PRESET_DIR
+from encode import BackgroundWriter, with_extension, write_audio
+from metrics import StageTimer
+from loudness import describe, loudness_normalized, write_loudness_normalized
+from normalize import block_peak, normalize_in_place, write_normalized
+from output_store import output_store
+from overview import OVERVIEWS, OverviewBuilder, overview_path, save_overview
+from presets import preset_cache
+from scheduler import check_cancelled
+from silence import SILENCE_SKIP, SILENCE_THRESHOLD, board_plugins, chain_tail_seconds, render_skipping
+
+# Frames per block fed to the board in streaming mode.
+DEFAULT_BLOCK_SIZE = 65536
+# Upper bound on how much effect tail (Reverb/Delay) is rendered after the input ends.
+DEFAULT_MAX_TAIL_SECONDS = 10.0
+# A tail block whose peak stays below this level (about -100 dBFS) ends the stream.
+TAIL_SILENCE_THRESHOLD = 1e-5
+# Inputs at least this long are rendered block by block instead of in one call.
+STREAMING_MIN_SECONDS = 60.0
+
+
+def should_stream(num_frames, sample_rate):
+    """Returns True if a clip is long enough to be rendered in streaming mode."""
+    return num_frames >= STREAMING_MIN_SECONDS * sample_rate
+
+
+def iter_array_blocks(audio_data, block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Yields views of a channels-first array, block_size frames at a time.
+    """
+    for start in range(0, audio_data.shape[1], block_size):
+        yield audio_data[:, start:start + block_size]
+
+
+def iter_file_blocks(sound_file, block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Yields channels-first float32 blocks read from an open soundfile.SoundFile.
+    """
+    for block in sound_file.blocks(blocksize=block_size, dtype="float32", always_2d=True):
+        yield block.T
+
+
+def stream_board(board, blocks, sample_rate, num_channels,
+                 block_size=DEFAULT_BLOCK_SIZE, max_tail_seconds=DEFAULT_MAX_TAIL_SECONDS,
+                 skip_silence=SILENCE_SKIP, stats=None):
+    """
+    Runs blocks through the board with its state kept between calls and yields the
+    processed channels-first blocks. After the input is exhausted the board is fed
+    silence to flush plugin latency (PitchShift) and then the effect tail, which stops
+    once it decays below TAIL_SILENCE_THRESHOLD or reaches max_tail_seconds.
+    With skip_silence, silent input blocks that arrive once the chain's tail has died
+    out are passed on as zeros without running the board, which is reset before the
+    next non-silent block; the skipped fraction is recorded in stats.
+    """
+    board.reset()
+    total_in = 0
+    total_out = 0
+    tail_seconds = chain_tail_seconds(board_plugins(board)) if skip_silence else None
+    quiet_frames = math.inf
+    skipping = False
+    skipped = 0
+    for block in blocks:
+        check_cancelled()
+        total_in += block.shape[1]
+        if tail_seconds is not None:
+            if block_peak(block) <= SILENCE_THRESHOLD:
+                if quiet_frames >= tail_seconds * sample_rate:
+                    skipping = True
+                    skipped += block.shape[1]
+                    total_out += block.shape[1]
+                    yield np.zeros(block.shape, dtype=np.float32)
+                    continue
+                quiet_frames += block.shape[1]
+            else:
+                if skipping:
+                    board.reset()
+                    skipping = False
+                quiet_frames = 0
+        processed = board(block, sample_rate, reset=False)
+        if processed.shape[1]:
+            total_out += processed.shape[1]
+            yield processed
+
+    if stats is not None and total_in:
+        stats.silence_skipped = skipped / total_in
+    yield from flush_tail(board, sample_rate, num_channels, total_in, total_out, block_size, max_tail_seconds)
+
+
+def flush_tail(board, sample_rate, num_channels, total_in, total_out,
+               block_size=DEFAULT_BLOCK_SIZE, max_tail_seconds=DEFAULT_MAX_TAIL_SECONDS):
+    """
+    Feeds silence to a board (or a single plugin) that has been given total_in input
+    frames and has returned total_out of them, and yields the processed blocks: first
+    the frames held back by plugin latency (PitchShift), then the effect tail, which
+    stops at the first block that decays below TAIL_SILENCE_THRESHOLD or once output
+    reaches max_tail_seconds past the input.
+    """
+    end = total_in + int(max_tail_seconds * sample_rate)
+    silence = np.zeros((num_channels, block_size), dtype=np.float32)
+    # Latency-only blocks may return no frames; bound the loop so it always ends.
+    max_iterations = max(end - total_out, 0) // block_size + 8
+    for _ in range(max_iterations):
+        if total_out >= end:
+            break
+        check_cancelled()
+        flushed = board(silence, sample_rate, reset=False)
+        keep = min(flushed.shape[1], end - total_out)
+        if keep == 0:
+            continue
+        flushed = flushed[:, :keep]
+        # Frames of this block that lie past the end of the input, i.e. tail rather than latency.
+        past_input = min(total_out + keep - total_in, keep)
+        if past_input > 0 and np.max(np.abs(flushed[:, keep - past_input:])) < TAIL_SILENCE_THRESHOLD:
+            if keep > past_input:
+                yield flushed[:, :keep - past_input]
+            break
+        total_out += keep
+        yield flushed
+
+
+def with_tail(board, processed, num_frames, sample_rate, block_size=DEFAULT_BLOCK_SIZE,
+              max_tail_seconds=DEFAULT_MAX_TAIL_SECONDS):
+    """
+    Returns the in-memory output of a board (or a single plugin) for num_frames of
+    input followed by the tail flush_tail gets from its current state, so the clip
+    rings out exactly as far as it would when streamed. Only the tail blocks are
+    rendered past the input, and the array is only copied when there is a tail.
+    """
+    blocks = list(flush_tail(board, sample_rate, processed.shape[0], num_frames, processed.shape[1],
+                             block_size, max_tail_seconds))
+    return np.concatenate([processed] + blocks, axis=1) if blocks else processed
+
+
+def render_tailed(board, audio_data, sample_rate, skip_silence=SILENCE_SKIP):
+    """
+    Renders a channels-first array in one call, then flushes the effect tail that
+    stream_board would render after the input ends. Returns (processed, fraction of
+    input frames skipped as silence).
+    """
+    board.reset()
+    if skip_silence:
+        processed, skipped = render_skipping(board, audio_data, sample_rate)
+    else:
+        processed, skipped = board(audio_data, sample_rate), 0.0
+    return with_tail(board, processed, audio_data.shape[1], sample_rate), skipped
+
+
+def write_stream(processed_blocks, output_path, sample_rate, num_channels, output_format=None, tap=None):
+    """
+    Writes processed channels-first blocks to output_path as they arrive and returns
+    the number of frames written. Blocks are encoded on a background thread while the
+    next one renders. Float WAV output keeps peaks above 1.0 intact.
+    """
+    with BackgroundWriter(output_path, sample_rate, num_channels, output_format) as out:
+        for block in processed_blocks:
+            out.write(block)
+            if tap is not None:
+                tap(block)
+    return out.frames
+
+
+def write_output(processed_blocks, output_path, sample_rate, num_channels, normalize=True, output_format=None,
+                 loudness_target=None, stats=None, tap=None):
+    """
+    Writes processed blocks to output_path in output_format, either as-is or normalized
+    in two passes: to loudness_target LUFS under the true-peak ceiling when it is set
+    (the measurement goes into stats), to a 0 dBFS peak otherwise. Every block written
+    is also passed to tap, if given. Returns the number of frames written.
+    """
+    if normalize and loudness_target is not None:
+        frames, loudness, gain = write_loudness_normalized(processed_blocks, output_path, sample_rate, num_channels,
+                                                           loudness_target, output_format=output_format, tap=tap)
+        if stats is not None:
+            stats.loudness = describe(loudness, gain)
+        return frames
+    if normalize:
+        frames, _ = write_normalized(processed_blocks, output_path, sample_rate, num_channels,
+                                     output_format=output_format, tap=tap)
+        return frames
+    return write_stream(processed_blocks, output_path, sample_rate, num_channels, output_format, tap)
+
+
+def render_array(board, audio_data, sample_rate, output_path, normalize=True, output_format=None,
+                 block_size=DEFAULT_BLOCK_SIZE, max_tail_seconds=DEFAULT_MAX_TAIL_SECONDS, stats=None,
+                 overview=None, loudness_target=None):
+    """
+    Streams an in-memory channels-first array through the board into output_path.
+    Only one block of processed audio is held in memory at a time. Each block written
+    is also added to the OverviewBuilder, if given.
+    """
+    num_channels = audio_data.shape[0]
+    blocks = iter_array_blocks(audio_data, block_size)
+    processed = stream_board(board, blocks, sample_rate, num_channels, block_size, max_tail_seconds, stats=stats)
+    return write_output(processed, output_path, sample_rate, num_channels, normalize, output_format,
+                        loudness_target, stats, overview.add if overview is not None else None)
+
+
+def render_file(board, input_path, output_path, normalize=True, output_format=None,
+                block_size=DEFAULT_BLOCK_SIZE, max_tail_seconds=DEFAULT_MAX_TAIL_SECONDS, loudness_target=None):
+    """
+    Streams an audio file through the board into output_path, reading and writing
+    block_size frames at a time so peak memory does not depend on the file length.
+    """
+    with sf.SoundFile(input_path) as f:
+        sample_rate = f.samplerate
+        num_channels = f.channels
+        blocks = iter_file_blocks(f, block_size)
+        processed = stream_board(board, blocks, sample_rate, num_channels, block_size, max_tail_seconds)
+        return write_output(processed, output_path, sample_rate, num_channels, normalize, output_format,
+                            loudness_target)
+
+
+def normalize_output(processed_audio, sample_rate, loudness_target=None, stats=None):
+    """
+    Peak-normalizes a rendered array in place, or with loudness_target set returns it
+    scaled to that loudness under the true-peak ceiling, recording the measurement in
+    stats. Returns the normalized array.
+    """
+    if loudness_target is None:
+        normalize_in_place(processed_audio)
+        return processed_audio
+    processed_audio, loudness, gain = loudness_normalized(processed_audio, sample_rate, loudness_target)
+    if stats is not None:
+        stats.loudness = describe(loudness, gain)
+    return processed_audio
+
+
+def render_board(board, audio_data, sample_rate, output_path, stats=None, output_format=None, loudness_target=None):
+    """
+    Applies the board to a channels-first array and writes the result to output_path.
+    Long clips are streamed block by block so the processed signal is never held in
+    memory as a whole; short clips are rendered in one call. Both paths keep the effect
+    tail up to DEFAULT_MAX_TAIL_SECONDS past the input, so the output length does not
+    depend on which path is taken. Both paths peak-normalize
+    the output without extra full-size temporaries, or normalize it to loudness_target
+    LUFS (see loudness.py). With a RenderStats the chain runs
+    stage by stage and each stage, the normalization and the file I/O are timed; for
+    streamed renders normalization is counted as I/O since it overlaps with the writes.
+    The file is encoded in output_format (see encode.OUTPUT_FORMATS) on a background
+    thread. Silent stretches past the chain's tail are skipped (see silence.py). A
+    waveform/spectrogram overview of the output is cached next to it (see overview.py),
+    built from the same blocks as they are written.
+    """
+    if stats is not None:
+        board = StageTimer(board, stats)
+    if should_stream(audio_data.shape[1], sample_rate):
+        start = time.perf_counter()
+        stage_seconds = stats.stage_seconds() if stats is not None else 0.0
+        overview = OverviewBuilder(sample_rate) if OVERVIEWS else None
+        render_array(board, audio_data, sample_rate, output_path, output_format=output_format, stats=stats,
+                     overview=overview, loudness_target=loudness_target)
+        if overview is not None:
+            overview.finish().save(overview_path(output_path))
+        if stats is not None:
+            stats.io += time.perf_counter() - start - (stats.stage_seconds() - stage_seconds)
+        return
+    processed_audio, skipped = render_tailed(board, audio_data, sample_rate)
+    if stats is None:
+        processed_audio = normalize_output(processed_audio, sample_rate, loudness_target)
+        write_audio(processed_audio, output_path, sample_rate, output_format)
+        save_overview(processed_audio, sample_rate, output_path)
+        return
+    stats.silence_skipped = skipped
+    with stats.timed("normalize"):
+        processed_audio = normalize_output(processed_audio, sample_rate, loudness_target, stats)
+    with stats.timed("io"):
+        write_audio(processed_audio, output_path, sample_rate, output_format)
+        save_overview(processed_audio, sample_rate, output_path)
+
+
+def render_preset(effect, audio_data, sample_rate, output_filename=None, stats=None, content_key=None,
+                  output_format=None, loudness_target=None):
+    """
+    Renders audio through the cached board of a .pdl preset in the catalog's
+    PRESET_DIR and returns the output path, a unique name in the output store.
+    output_filename overrides the name given in the preset and content_key, when known,
+    is added to the name; its extension follows output_format. The output is normalized
+    to loudness_target LUFS when given, to a 0 dBFS peak otherwise. Time spent waiting for
+    the shared board counts as queue wait.
+    """
+    preset = preset_cache.get(os.path.join(PRESET_DIR, effect))
+    output_filename = with_extension(output_filename or preset.output_filename, output_format)
+    output_path = output_store.path_for(output_filename, content_key)
+    start = time.perf_counter()
+    with preset.lock:
+        if stats is not None:
+            stats.queue_wait += time.perf_counter() - start
+            stats.optimizations = preset.optimizations
+        render_board(preset.board, audio_data, sample_rate, output_path, stats, output_format, loudness_target)
+    return output_path
@@ -0,0 +1,124 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from encode import DEFAULT_OUTPUT_FORMAT
+from overview import overview_path
+
+RENDER_CACHE_INDEX = os.environ.get("PEDALBOARD_RENDER_CACHE_INDEX", ".render_cache.json")
+# Total bytes of cached output files before least recently used ones are deleted.
+RENDER_CACHE_MAX_BYTES = int(os.environ.get("PEDALBOARD_RENDER_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+# Cached outputs older than this many seconds are deleted.
+RENDER_CACHE_MAX_AGE = float(os.environ.get("PEDALBOARD_RENDER_CACHE_MAX_AGE", str(7 * 24 * 3600)))
+
+
+def render_key(input_key, signature, output_format=None, loudness_target=None, title=None, draft=False):
+    """
+    Combines an input content hash, a chain signature, the output format, the
+    loudness target, the output title and whether it is a draft into a render cache
+    key, so a hit is served under the title that was asked for. Pass the title as the
+    user gave it rather than a generated one, which would change on every render.
+    Peak-normalized float WAV keys without a title match the ones written before
+    formats and loudness targets existed.
+    """
+    output_format = output_format or DEFAULT_OUTPUT_FORMAT
+    text = f"{input_key}|{signature}" + (f"|{output_format}" if output_format != "wav" else "")
+    if loudness_target is not None:
+        text += f"|lufs{float(loudness_target):g}"
+    if title is not None:
+        text += f"|{title}"
+    if draft:
+        text += "|draft"
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+class RenderCache:
+    """
+    Content-addressed cache of finished renders. Each entry maps a hash of the decoded
+    input samples plus the chain's canonical parameter string to the output file it
+    produced. Entries are evicted least recently used first once the files exceed
+    max_bytes, or when they are older than max_age seconds; evicting an entry deletes
+    its file. The index is kept in a JSON file so the cache survives restarts.
+    """
+
+    def __init__(self, index_path=RENDER_CACHE_INDEX, max_bytes=RENDER_CACHE_MAX_BYTES,
+                 max_age=RENDER_CACHE_MAX_AGE):
+        self.index_path = index_path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.index_path, "r") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return
+        for entry in sorted(entries, key=lambda e: e["used"]):
+            if os.path.exists(entry["path"]):
+                self._entries[entry["key"]] = entry
+
+    def _save(self):
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(list(self._entries.values()), f)
+        os.replace(tmp_path, self.index_path)
+
+    def _evict(self, now, keep):
+        total = sum(entry["bytes"] for entry in self._entries.values())
+        for key in list(self._entries):
+            entry = self._entries[key]
+            if key == keep or (total <= self.max_bytes and now - entry["created"] <= self.max_age):
+                continue
+            del self._entries[key]
+            total -= entry["bytes"]
+            self.evictions += 1
+            for path in (entry["path"], overview_path(entry["path"])):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def get(self, key):
+        """Returns the cached output path for key, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (not os.path.exists(entry["path"]) or time.time() - entry["created"] > self.max_age):
+                self._entries.pop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            entry["used"] = time.time()
+            self._entries.move_to_end(key)
+            self._save()
+            return entry["path"]
+
+    def put(self, key, path):
+        """Records a freshly rendered output file under key."""
+        now = time.time()
+        with self._lock:
+            self._entries[key] = {"key": key, "path": os.path.abspath(path), "bytes": os.path.getsize(path),
+                                  "created": now, "used": now}
+            self._entries.move_to_end(key)
+            self._evict(now, key)
+            self._save()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "entries": len(self._entries),
+                    "bytes": sum(entry["bytes"] for entry in self._entries.values()),
+                    "hit_rate": self.hits / lookups if lookups else 0.0}
+
+
+render_cache = RenderCache()
@@ -0,0 +1,208 @@
+import itertools
+import os
+import threading
+import time
+
+# Estimated render seconds per unit of cost (one second of one channel through one
+# stage); refined from finished jobs with an exponential moving average.
+DEFAULT_SECONDS_PER_COST = 0.005
+# Jobs whose estimated run time exceeds this are rejected outright.
+MAX_JOB_SECONDS = float(os.environ.get("PEDALBOARD_MAX_JOB_SECONDS", "1800"))
+# New jobs are rejected while the queued work ahead of them exceeds this many seconds.
+MAX_QUEUE_SECONDS = float(os.environ.get("PEDALBOARD_MAX_QUEUE_SECONDS", "3600"))
+
+_current = threading.local()
+
+
+class RenderCancelled(Exception):
+    """Raised inside a render when its job has been cancelled."""
+
+
+class SchedulerBusy(ValueError):
+    """Raised by Scheduler.submit when admission control rejects a job."""
+
+
+def check_cancelled():
+    """
+    Raises RenderCancelled if the job running on this thread has been cancelled.
+    Render loops call this between blocks and stages; outside a scheduled job it
+    does nothing.
+    """
+    event = getattr(_current, "cancel_event", None)
+    if event is not None and event.is_set():
+        raise RenderCancelled()
+
+
+def estimate_cost(num_frames, sample_rate, num_channels, chain_length):
+    """Returns the cost of a render: duration x channels x number of stages."""
+    return num_frames / sample_rate * num_channels * max(chain_length, 1)
+
+
+class Job:
+    """A render submitted to the Scheduler, with its state, result and cancel flag."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, user, cost, work):
+        self.id = next(Job._ids)
+        self.user = user
+        self.cost = cost
+        self.work = work
+        self.state = "queued"
+        self.enqueued_at = time.monotonic()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+        self._done = threading.Event()
+        self._result = None
+        self._error = None
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """Blocks until the job finishes or the timeout expires; returns True if done."""
+        return self._done.wait(timeout)
+
+    def result(self):
+        """Returns the job's result or re-raises its error."""
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+    def _finish(self, result=None, error=None):
+        self._result = result
+        self._error = error
+        self.finished_at = time.monotonic()
+        self._done.set()
+
+
+class Scheduler:
+    """
+    Runs render jobs on a bounded pool of worker threads. At most max_workers jobs run
+    at once and at most per_user_limit of them belong to one user. Among the jobs that
+    may start, the one with the smallest estimated run time minus the time it has
+    already waited goes first, so short previews overtake long renders without the
+    long ones starving. Jobs are rejected up front when they are too expensive or the
+    queue is too long.
+    """
+
+    def __init__(self, max_workers=None, per_user_limit=1, max_job_seconds=MAX_JOB_SECONDS,
+                 max_queue_seconds=MAX_QUEUE_SECONDS):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.per_user_limit = per_user_limit
+        self.max_job_seconds = max_job_seconds
+        self.max_queue_seconds = max_queue_seconds
+        self.seconds_per_cost = DEFAULT_SECONDS_PER_COST
+        self._pending = []
+        self._running = []
+        self._cond = threading.Condition()
+        self._workers = []
+
+    def _start_workers(self):
+        while len(self._workers) < self.max_workers:
+            worker = threading.Thread(target=self._worker_loop, daemon=True,
+                                      name=f"render-worker-{len(self._workers) + 1}")
+            self._workers.append(worker)
+            worker.start()
+
+    def estimate_seconds(self, cost):
+        return cost * self.seconds_per_cost
+
+    def submit(self, user, cost, work):
+        """
+        Queues work (a callable taking no arguments) for user and returns its Job.
+        Raises SchedulerBusy if admission control rejects it.
+        """
+        estimate = self.estimate_seconds(cost)
+        if estimate > self.max_job_seconds:
+            raise SchedulerBusy(f"Render too large: estimated {estimate:.0f}s exceeds the {self.max_job_seconds:.0f}s limit")
+        with self._cond:
+            backlog = self._backlog_seconds(self._pending) / self.max_workers
+            if backlog > self.max_queue_seconds:
+                raise SchedulerBusy(f"Server busy: about {backlog:.0f}s of renders already queued, try again later")
+            job = Job(user, cost, work)
+            self._pending.append(job)
+            self._start_workers()
+            self._cond.notify_all()
+        return job
+
+    def cancel(self, job):
+        """Cancels a queued job immediately or asks a running job to stop at its next block."""
+        with self._cond:
+            if job in self._pending:
+                self._pending.remove(job)
+                job.state = "cancelled"
+                job._finish(error=RenderCancelled())
+                return
+        job.cancel_event.set()
+
+    def _backlog_seconds(self, jobs):
+        now = time.monotonic()
+        remaining = sum(max(self.estimate_seconds(j.cost) - (now - j.started_at), 0.0) for j in self._running)
+        return remaining + sum(self.estimate_seconds(j.cost) for j in jobs)
+
+    def _priority(self, job, now):
+        return self.estimate_seconds(job.cost) - (now - job.enqueued_at)
+
+    def _ordered_pending(self):
+        now = time.monotonic()
+        return sorted(self._pending, key=lambda j: self._priority(j, now))
+
+    def _next_job(self):
+        running_by_user = {}
+        for job in self._running:
+            running_by_user[job.user] = running_by_user.get(job.user, 0) + 1
+        for job in self._ordered_pending():
+            if running_by_user.get(job.user, 0) < self.per_user_limit:
+                return job
+        return None
+
+    def position(self, job):
+        """
+        Returns (queue position, ETA seconds) for a job: position 0 means it is running,
+        and the ETA is the estimated time until it finishes.
+        """
+        with self._cond:
+            now = time.monotonic()
+            if job.state == "running":
+                return 0, max(self.estimate_seconds(job.cost) - (now - job.started_at), 0.0)
+            if job not in self._pending:
+                return 0, 0.0
+            ordered = self._ordered_pending()
+            ahead = ordered[:ordered.index(job)]
+            wait = self._backlog_seconds(ahead) / self.max_workers
+            return len(ahead) + 1, wait + self.estimate_seconds(job.cost)
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                job = self._next_job()
+                while job is None:
+                    self._cond.wait()
+                    job = self._next_job()
+                self._pending.remove(job)
+                self._running.append(job)
+                job.state = "running"
+                job.started_at = time.monotonic()
+            _current.cancel_event = job.cancel_event
+            try:
+                result = job.work()
+            except Exception as e:
+                job.state = "cancelled" if isinstance(e, RenderCancelled) else "failed"
+                job._finish(error=e)
+            else:
+                job.state = "finished"
+                job._finish(result=result)
+            finally:
+                _current.cancel_event = None
+            with self._cond:
+                self._running.remove(job)
+                if job.state == "finished" and job.cost > 0:
+                    observed = (job.finished_at - job.started_at) / job.cost
+                    self.seconds_per_cost = 0.8 * self.seconds_per_cost + 0.2 * observed
+                self._cond.notify_all()
+
+
+scheduler = Scheduler()
@@ -0,0 +1,221 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import soundfile as sf
+from catalog import PRESET_DIR
+from normalize import normalize_in_place
+from presets import build_board, preset_cache
+
+# Length of the output each worker is responsible for.
+DEFAULT_SEGMENT_SECONDS = 30.0
+# Audio rendered before each segment and thrown away, so Reverb tails, Delay feedback
+# and Compressor envelopes have settled by the time the segment's own output starts.
+DEFAULT_PREROLL_SECONDS = 2.0
+# Overlap between neighbouring segments, crossfaded linearly when stitching.
+DEFAULT_CROSSFADE_SECONDS = 0.05
+
+
+def plan_segments(num_frames, sample_rate, segment_seconds=DEFAULT_SEGMENT_SECONDS,
+                  preroll_seconds=DEFAULT_PREROLL_SECONDS, crossfade_seconds=DEFAULT_CROSSFADE_SECONDS):
+    """
+    Splits num_frames into segments and returns (start, end, render_start, fade) for each.
+    A segment owns output frames [start, end); all but the last also render `fade` frames
+    past end, which overlap the next segment's first frames and are crossfaded with them.
+    Rendering starts at render_start, up to preroll_seconds before start.
+    """
+    segment = max(int(segment_seconds * sample_rate), 1)
+    preroll = int(preroll_seconds * sample_rate)
+    fade = min(int(crossfade_seconds * sample_rate), segment)
+    bounds = list(range(0, num_frames, segment)) + [num_frames]
+    segments = []
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        tail = min(fade, num_frames - end)
+        segments.append((start, end, max(start - preroll, 0), tail))
+    return segments
+
+
+def _attach(name, shape):
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+
+
+def _render_segment(chain, sample_rate, shape, input_name, output_name, seam_name, index, segment):
+    """
+    Worker entry point: renders one segment from the shared input buffer. Frames the
+    segment owns outright go straight into the shared output buffer; the overlap past
+    its end goes into the seam buffer, for the parent to crossfade with the next
+    segment's start.
+    """
+    start, end, render_start, fade = segment
+    input_shm, audio_data = _attach(input_name, shape)
+    output_shm, output = _attach(output_name, shape)
+    seam_shm = shared_memory.SharedMemory(name=seam_name) if fade else None
+    try:
+        board = build_board(chain)
+        processed = board(audio_data[:, render_start:end + fade], sample_rate)
+        offset = start - render_start
+        output[:, start:end] = processed[:, offset:offset + end - start]
+        if fade:
+            seam = np.ndarray((shape[0], fade), dtype=np.float32, buffer=seam_shm.buf)
+            seam[:] = processed[:, offset + end - start:]
+    finally:
+        del audio_data, output
+        input_shm.close()
+        output_shm.close()
+        if seam_shm is not None:
+            seam_shm.close()
+    return index
+
+
+def render_sharded(chain, audio_data, sample_rate, workers=None, segment_seconds=DEFAULT_SEGMENT_SECONDS,
+                   preroll_seconds=DEFAULT_PREROLL_SECONDS, crossfade_seconds=DEFAULT_CROSSFADE_SECONDS):
+    """
+    Renders channels-first float32 audio through the chain on a process pool, one segment
+    per task, and returns the stitched result. The input and output live in shared memory
+    so segments are not pickled between processes. The result approximates
+    board(audio_data, sample_rate): each segment only hears preroll_seconds of the audio
+    before it, so effects with longer memory differ near the seams (see `verify`).
+    """
+    shape = audio_data.shape
+    if shape[1] == 0:
+        return np.zeros(shape, dtype=np.float32)
+    segments = plan_segments(shape[1], sample_rate, segment_seconds, preroll_seconds, crossfade_seconds)
+    nbytes = max(audio_data.nbytes, 1)
+    input_shm = shared_memory.SharedMemory(create=True, size=nbytes)
+    output_shm = shared_memory.SharedMemory(create=True, size=nbytes)
+    seam_shms = [shared_memory.SharedMemory(create=True, size=shape[0] * fade * 4) if fade else None
+                 for _, _, _, fade in segments]
+    try:
+        shared_input = np.ndarray(shape, dtype=np.float32, buffer=input_shm.buf)
+        shared_input[:] = audio_data
+        workers = min(workers or os.cpu_count() or 1, len(segments))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_render_segment, chain, sample_rate, shape, input_shm.name, output_shm.name,
+                                   seam_shm.name if seam_shm else None, index, segment)
+                       for index, (segment, seam_shm) in enumerate(zip(segments, seam_shms))]
+            for future in futures:
+                future.result()
+
+        output = np.ndarray(shape, dtype=np.float32, buffer=output_shm.buf).copy()
+        for (_, end, _, fade), seam_shm in zip(segments, seam_shms):
+            if not fade:
+                continue
+            seam = np.ndarray((shape[0], fade), dtype=np.float32, buffer=seam_shm.buf)
+            fade_in = np.linspace(0.0, 1.0, fade, endpoint=False, dtype=np.float32)
+            region = output[:, end:end + fade]
+            region *= fade_in
+            region += seam * (1.0 - fade_in)
+        del shared_input
+        return output
+    finally:
+        for shm in [input_shm, output_shm] + [s for s in seam_shms if s is not None]:
+            shm.close()
+            shm.unlink()
+
+
+def seam_errors(serial, sharded, segments, sample_rate, window_seconds=0.5):
+    """
+    Compares a sharded render against the serial one around each seam. Returns one
+    dict per seam with the peak and RMS error (in dB relative to the serial render's
+    peak) over window_seconds after the seam.
+    """
+    reference = max(float(np.abs(serial).max()), 1e-12)
+    window = int(window_seconds * sample_rate)
+    results = []
+    for _, end, _, _ in segments[:-1]:
+        diff = sharded[:, end:end + window] - serial[:, end:end + window]
+        peak = float(np.abs(diff).max()) if diff.size else 0.0
+        rms = float(np.sqrt(np.mean(np.square(diff, dtype=np.float64)))) if diff.size else 0.0
+        results.append({
+            "seconds": end / sample_rate,
+            "peak_db": 20 * np.log10(max(peak, 1e-12) / reference),
+            "rms_db": 20 * np.log10(max(rms, 1e-12) / reference),
+        })
+    return results
+
+
+def verify(chains, audio_data, sample_rate, workers=None, segment_seconds=DEFAULT_SEGMENT_SECONDS,
+           preroll_seconds=DEFAULT_PREROLL_SECONDS, crossfade_seconds=DEFAULT_CROSSFADE_SECONDS, log=print):
+    """
+    Renders audio_data with each (name, chain) serially and sharded, and returns a
+    report of the error at every seam together with both render times.
+    """
+    segments = plan_segments(audio_data.shape[1], sample_rate, segment_seconds, preroll_seconds, crossfade_seconds)
+    report = []
+    for name, chain in chains:
+        start = time.perf_counter()
+        serial = build_board(chain)(audio_data, sample_rate)
+        serial_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        sharded = render_sharded(chain, audio_data, sample_rate, workers, segment_seconds,
+                                 preroll_seconds, crossfade_seconds)
+        sharded_seconds = time.perf_counter() - start
+        seams = seam_errors(serial, sharded, segments, sample_rate)
+        worst = max((seam["peak_db"] for seam in seams), default=-240.0)
+        report.append({"chain": name, "serial_seconds": serial_seconds, "sharded_seconds": sharded_seconds,
+                       "worst_peak_db": worst, "seams": seams})
+        log(f"{name:36s} serial {serial_seconds:7.2f}s  sharded {sharded_seconds:7.2f}s  "
+            f"worst seam error {worst:7.1f} dB over {len(seams)} seams")
+    return report
+
+
+def load_input(path):
+    """Reads an audio file as channels-first float32."""
+    audio_data, sample_rate = sf.read(path, dtype="float32", always_2d=True)
+    return np.ascontiguousarray(audio_data.T), sample_rate
+
+
+def main():
+    """Command line entry point: `render` shards one file across cores, `verify` measures seam error."""
+    parser = argparse.ArgumentParser(description="Render one long file across cores in overlapping segments.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add_common(p):
+        p.add_argument("-w", "--workers", type=int, default=None, help="Pool size (default: CPU count)")
+        p.add_argument("--segment-seconds", type=float, default=DEFAULT_SEGMENT_SECONDS)
+        p.add_argument("--preroll-seconds", type=float, default=DEFAULT_PREROLL_SECONDS)
+        p.add_argument("--crossfade-seconds", type=float, default=DEFAULT_CROSSFADE_SECONDS)
+
+    render_parser = sub.add_parser("render", help="Render a file with a preset")
+    render_parser.add_argument("input")
+    render_parser.add_argument("preset", help="Path to a .pdl preset")
+    render_parser.add_argument("-o", "--output", required=True)
+    add_common(render_parser)
+
+    verify_parser = sub.add_parser("verify", help="Compare sharded and serial renders seam by seam")
+    verify_parser.add_argument("input")
+    verify_parser.add_argument("-p", "--preset", action="append", default=None,
+                               help="Path to a .pdl preset (repeatable, default: every preset in pedalboard/)")
+    verify_parser.add_argument("--json", default=None, help="Also write the report to this file")
+    add_common(verify_parser)
+
+    args = parser.parse_args()
+    audio_data, sample_rate = load_input(args.input)
+    options = (args.workers, args.segment_seconds, args.preroll_seconds, args.crossfade_seconds)
+    if args.command == "render":
+        start = time.perf_counter()
+        processed = render_sharded(preset_cache.get(args.preset).chain, audio_data, sample_rate, *options)
+        normalize_in_place(processed)
+        sf.write(args.output, processed.T, sample_rate)
+        elapsed = time.perf_counter() - start
+        print(f"Wrote {args.output} in {elapsed:.2f}s ({audio_data.shape[1] / sample_rate / elapsed:.1f}x realtime)")
+    else:
+        paths = args.preset or sorted(os.path.join(PRESET_DIR, f) for f in os.listdir(PRESET_DIR)
+                                      if f.endswith(".pdl"))
+        chains = []
+        for path in paths:
+            try:
+                chains.append((os.path.basename(path), preset_cache.get(path).chain))
+            except ValueError as e:
+                print(f"Skipping {path}: {e}")
+        report = verify(chains, audio_data, sample_rate, *options)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+import argparse
+import math
+import os
+import sys
+import time
+import numpy as np
+from pedalboard import Compressor, Delay, Distortion, Gain, HighpassFilter, LadderFilter, Limiter, LowpassFilter, Reverb
+from catalog import PRESET_DIR
+from normalize import block_peak
+from presets import build_board, parse_chain, preset_cache
+
+# Set PEDALBOARD_SILENCE_SKIP=0 to run every sample through the chain.
+SILENCE_SKIP = os.environ.get("PEDALBOARD_SILENCE_SKIP", "1") != "0"
+# Input blocks whose peak stays at or below this level (about -120 dBFS) count as silent.
+SILENCE_THRESHOLD = float(os.environ.get("PEDALBOARD_SILENCE_THRESHOLD", "1e-6"))
+# Frames per block when scanning in-memory audio for silence.
+SILENCE_BLOCK_SIZE = 4096
+# Effect tails are estimated until they decay to this level (about -100 dBFS).
+TAIL_LEVEL = 1e-5
+# Longest Freeverb comb filter loop (1617 samples plus stereo spread at 44.1 kHz).
+REVERB_LOOP_SECONDS = 0.0372
+# Largest difference from a full render `check` accepts.
+CHECK_TOLERANCE = 1e-4
+
+
+def _decay_seconds(loop_seconds, feedback):
+    if feedback <= 0:
+        return loop_seconds
+    if feedback >= 1:
+        return math.inf
+    return loop_seconds * (math.log(TAIL_LEVEL) / math.log(feedback) + 1)
+
+
+def plugin_tail_seconds(plugin):
+    """
+    Returns how long a plugin, with its current parameters, may keep producing output
+    once its input goes silent: math.inf when it rings indefinitely (frozen reverb,
+    delay feedback of 1, self-oscillating ladder filter), or None when skipping is not
+    safe at all. Chorus and Phaser run LFOs whose phase would drift if silence were
+    skipped, and PitchShift has latency and internal state, so they return None, as
+    does any effect not listed here.
+    """
+    if isinstance(plugin, Reverb):
+        if plugin.freeze_mode >= 0.5:
+            return math.inf
+        # Freeverb comb feedback is room_size * 0.28 + 0.7; allow 25% for the allpasses.
+        return 1.25 * _decay_seconds(REVERB_LOOP_SECONDS, plugin.room_size * 0.28 + 0.7)
+    if isinstance(plugin, Delay):
+        return _decay_seconds(plugin.delay_seconds, plugin.feedback)
+    if isinstance(plugin, (Compressor, Limiter)):
+        # Output is silent on silent input, but the gain envelope must settle.
+        return 12 * plugin.release_ms / 1000
+    if isinstance(plugin, (HighpassFilter, LowpassFilter)):
+        return 2.5 / plugin.cutoff_frequency_hz
+    if isinstance(plugin, LadderFilter):
+        if plugin.resonance >= 0.9:
+            return math.inf
+        return 10 / plugin.cutoff_hz / (1 - plugin.resonance)
+    if isinstance(plugin, (Distortion, Gain)):
+        return 0.0
+    return None
+
+
+def board_plugins(board):
+    """Returns the plugins of a Pedalboard, or of the board wrapped by a StageTimer."""
+    return list(getattr(board, "board", board))
+
+
+def chain_tail_seconds(plugins):
+    """Returns the summed tail of a serial chain, or None if any plugin cannot be skipped."""
+    total = 0.0
+    for plugin in plugins:
+        tail = plugin_tail_seconds(plugin)
+        if tail is None:
+            return None
+        total += tail
+    return total
+
+
+def silent_blocks(audio_data, threshold=SILENCE_THRESHOLD, block_size=SILENCE_BLOCK_SIZE):
+    """
+    Returns one flag per block_size frames of a channels-first array, True where every
+    sample of every channel is within threshold of zero. Full blocks are checked with
+    one reduction over a reshaped view, without an abs() temporary.
+    """
+    num_channels, num_frames = audio_data.shape
+    full = num_frames // block_size
+    silent = np.empty(-(-num_frames // block_size), dtype=bool)
+    if full:
+        view = audio_data[:, :full * block_size].reshape(num_channels, full, block_size)
+        silent[:full] = (view.max(axis=(0, 2)) <= threshold) & (view.min(axis=(0, 2)) >= -threshold)
+    if len(silent) > full:
+        silent[full] = block_peak(audio_data[:, full * block_size:]) <= threshold
+    return silent
+
+
+def active_regions(silent, tail_blocks):
+    """
+    Returns (start, end) block ranges that must be rendered: every block that is not
+    silent plus the tail_blocks after it. Leading silence is never rendered since the
+    chain starts from its reset state.
+    """
+    index = np.arange(len(silent))
+    last_loud = np.maximum.accumulate(np.where(silent, -1, index)) if len(silent) else index
+    render = (last_loud >= 0) & (index - last_loud <= tail_blocks)
+    edges = np.diff(np.concatenate(([0], render.astype(np.int8), [0])))
+    return list(zip(np.flatnonzero(edges == 1).tolist(), np.flatnonzero(edges == -1).tolist()))
+
+
+def render_skipping(board, audio_data, sample_rate, threshold=SILENCE_THRESHOLD,
+                    block_size=SILENCE_BLOCK_SIZE):
+    """
+    Renders a channels-first array like board(audio_data, sample_rate), but only runs
+    the chain on the regions that are not silent, each extended by the chain's tail.
+    Regions are rendered from the board's reset state, which matches its state after
+    the tail has decayed, and everything between them is left zero. Returns
+    (processed, fraction of frames skipped); chains that cannot be skipped are rendered
+    in full.
+    """
+    num_frames = audio_data.shape[1]
+    tail = chain_tail_seconds(board_plugins(board))
+    if tail is None or num_frames == 0:
+        return board(audio_data, sample_rate), 0.0
+    silent = silent_blocks(audio_data, threshold, block_size)
+    tail_blocks = len(silent) if math.isinf(tail) else math.ceil(tail * sample_rate / block_size) + 1
+    regions = active_regions(silent, tail_blocks)
+    if regions == [(0, len(silent))]:
+        return board(audio_data, sample_rate), 0.0
+    processed = np.zeros(audio_data.shape, dtype=np.float32)
+    rendered = 0
+    for start, end in regions:
+        start, end = start * block_size, min(end * block_size, num_frames)
+        processed[:, start:end] = board(audio_data[:, start:end], sample_rate)
+        rendered += end - start
+    return processed, 1.0 - rendered / num_frames
+
+
+def sparse_signal(sample_rate=44100, seconds=90.0, burst_seconds=2.0, period_seconds=20.0, num_channels=2):
+    """Returns test material: noise bursts separated by digital silence."""
+    rng = np.random.default_rng(0)
+    audio_data = np.zeros((num_channels, int(sample_rate * seconds)), dtype=np.float32)
+    for start in np.arange(1.0, seconds, period_seconds):
+        a, b = int(start * sample_rate), int((start + burst_seconds) * sample_rate)
+        audio_data[:, a:b] = rng.standard_normal((num_channels, b - a)) * 0.25
+    return audio_data
+
+
+def check(chains, sample_rate=44100, tolerance=CHECK_TOLERANCE, log=print):
+    """
+    Renders sparse_signal through each (name, chain) in full and with silence skipping,
+    both in one call and streamed block by block, and returns the names whose outputs
+    differ by more than tolerance.
+    """
+    # render imports this module, so it is imported here.
+    from render import iter_array_blocks, stream_board
+
+    audio_data = sparse_signal(sample_rate)
+    failures = []
+    for name, chain in chains:
+        board = build_board(chain)
+        start = time.perf_counter()
+        expected = board(audio_data, sample_rate)
+        full_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        actual, skipped = render_skipping(board, audio_data, sample_rate)
+        skip_seconds = time.perf_counter() - start
+        diff = float(np.abs(expected - actual).max())
+        streams = [np.concatenate(list(stream_board(board, iter_array_blocks(audio_data), sample_rate,
+                                                     audio_data.shape[0], skip_silence=skip)), axis=1)
+                   for skip in (False, True)]
+        if streams[0].shape == streams[1].shape:
+            stream_diff = float(np.abs(streams[0] - streams[1]).max())
+        else:
+            stream_diff = float("inf")
+        ok = max(diff, stream_diff) <= tolerance
+        if not ok:
+            failures.append(name)
+        log(f"{'ok  ' if ok else 'FAIL'} {name:36s} skipped {skipped:6.1%}, {full_seconds * 1000:7.1f} -> "
+            f"{skip_seconds * 1000:7.1f} ms, max diff {diff:.3g} (streamed {stream_diff:.3g})")
+    return failures
+
+
+# Chains exercising each kind of tail estimate, checked alongside the shipped presets.
+CHECK_CHAINS = [
+    "[Reverb(room_size=0.9, wet_level=0.5)]",
+    "[Reverb(room_size=1.0, damping=0.0, wet_level=0.8)]",
+    "[Delay(delay_seconds=0.5, feedback=0.7, mix=0.5), Gain(gain_db=3)]",
+    "[Compressor(threshold_db=-30, ratio=8, release_ms=400), Limiter()]",
+    "[HighpassFilter(cutoff_frequency_hz=30), LowpassFilter(cutoff_frequency_hz=200), Distortion(drive_db=20)]",
+    "[LadderFilter(mode=LadderFilter.Mode.LPF24, cutoff_hz=80, resonance=0.8, drive=2.0)]",
+]
+
+
+def main():
+    """Command line entry point: checks silence-skipping renders against full renders."""
+    parser = argparse.ArgumentParser(description="Check that silence-skipping renders match full renders.")
+    parser.add_argument("--tolerance", type=float, default=CHECK_TOLERANCE)
+    args = parser.parse_args()
+    chains = [(f"check:{i + 1}", parse_chain(text)) for i, text in enumerate(CHECK_CHAINS)]
+    for f in sorted(os.listdir(PRESET_DIR)):
+        if f.endswith(".pdl"):
+            try:
+                chains.append((f"preset:{f}", preset_cache.get(os.path.join(PRESET_DIR, f)).chain))
+            except ValueError as e:
+                print(f"Skipping {f}: {e}")
+    failures = check(chains, tolerance=args.tolerance)
+    print(f"{len(failures)} chains differ")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
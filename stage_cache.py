@@ -0,0 +1,107 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from scheduler import check_cancelled
+
+# Total bytes of intermediate stage outputs kept across all Designer renders.
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def audio_key(sample_rate, audio_data):
+    """
+    Returns a content hash identifying a decoded input buffer and its sample rate.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{sample_rate}:{audio_data.dtype}:{audio_data.shape}".encode())
+    h.update(audio_data.data if audio_data.flags.c_contiguous else audio_data.tobytes())
+    return h.hexdigest()
+
+
+class StageCache:
+    """
+    Memory-capped LRU of intermediate chain outputs. Each entry is keyed by the input
+    hash plus the parameter specs of every stage up to and including that stage, so
+    a render can resume from the last stage whose prefix is unchanged. Cached arrays
+    are marked read-only.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def fits(self, nbytes):
+        """Returns True if an output of nbytes is small enough to keep several stages."""
+        return nbytes * 4 <= self.max_bytes
+
+    def longest_prefix(self, input_key, chain):
+        """
+        Returns (n, audio) for the longest cached prefix chain[:n], or (0, None).
+        """
+        with self._lock:
+            for n in range(len(chain), 0, -1):
+                key = (input_key, chain[:n])
+                audio = self._entries.get(key)
+                if audio is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return n, audio
+            self.misses += 1
+        return 0, None
+
+    def put(self, input_key, prefix, audio_data):
+        audio_data.flags.writeable = False
+        key = (input_key, tuple(prefix))
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+            self._entries[key] = audio_data
+            self._bytes += audio_data.nbytes
+            while self._bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "entries": len(self._entries), "bytes": self._bytes}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+def render_incremental(cache, chain, plugins, audio_data, sample_rate, stats=None, input_key=None, flush=None):
+    """
+    Renders audio_data through plugins one stage at a time, starting after the longest
+    prefix of chain (a tuple of EffectSpec, one per plugin) already in the cache and
+    caching every stage it computes. The returned array may be a read-only cache entry.
+    Pass input_key when the caller has already hashed the input, and flush to extend
+    each stage's output: it is called as flush(plugin, processed) right after the stage
+    renders and returns the array that is cached and passed on.
+    """
+    if input_key is None:
+        input_key = audio_key(sample_rate, audio_data)
+    start, cached = cache.longest_prefix(input_key, chain)
+    processed = audio_data if cached is None else cached
+    if stats is not None:
+        stats.cached_stages = start
+    for i in range(start, len(plugins)):
+        check_cancelled()
+        stage_start = time.perf_counter()
+        processed = plugins[i](processed, sample_rate)
+        if flush is not None:
+            processed = flush(plugins[i], processed)
+        if stats is not None:
+            stats.add_stage(i, chain[i].name, time.perf_counter() - stage_start, processed.shape[-1], processed.nbytes)
+        cache.put(input_key, chain[:i + 1], processed)
+    return processed
+
+
+stage_cache = StageCache()
@@ -0,0 +1,58 @@
+import tracemalloc
+import numpy as np
+import pytest
+from ingest import CHECK_ALLOCATION_SLACK, check_cases, ingest, to_channels_first
+
+CASES = check_cases()
+
+
+@pytest.mark.parametrize("name, audio_data, channels_first, expected, allocations", CASES,
+                         ids=[case[0] for case in CASES])
+def test_conversion(name, audio_data, channels_first, expected, allocations):
+    out = to_channels_first(audio_data, channels_first)
+    assert out.dtype == np.float32
+    assert out.flags.c_contiguous
+    assert out.shape == expected.shape
+    np.testing.assert_array_equal(out, expected)
+    if np.issubdtype(audio_data.dtype, np.integer):
+        assert out.min() >= -1.0
+        assert out.max() < 1.0
+
+
+@pytest.mark.parametrize("name, audio_data, channels_first, expected, allocations", CASES,
+                         ids=[case[0] for case in CASES])
+def test_zero_copy(name, audio_data, channels_first, expected, allocations):
+    out = to_channels_first(audio_data, channels_first)
+    assert np.shares_memory(out, audio_data) == (allocations == 0)
+
+
+@pytest.mark.parametrize("name, audio_data, channels_first, expected, allocations", CASES,
+                         ids=[case[0] for case in CASES])
+def test_allocations(name, audio_data, channels_first, expected, allocations):
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        to_channels_first(audio_data, channels_first)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    allocated = peak - before
+    assert allocations * expected.nbytes <= allocated <= allocations * expected.nbytes + CHECK_ALLOCATION_SLACK
+
+
+def test_unsigned_pcm_is_centred():
+    pcm = np.array([0, 128, 255], dtype=np.uint8)
+    np.testing.assert_array_equal(to_channels_first(pcm), [[-1.0, 0.0, 127 / 128]])
+
+
+def test_rejects_unsupported_input():
+    with pytest.raises(ValueError):
+        to_channels_first(np.zeros((2, 2, 2), dtype=np.float32))
+    with pytest.raises(ValueError):
+        to_channels_first(np.zeros(4, dtype=bool))
+
+
+def test_ingest_unpacks_gradio_tuple():
+    sample_rate, audio_data = ingest((44100, np.zeros((10, 2), dtype=np.int16)))
+    assert sample_rate == 44100
+    assert audio_data.shape == (2, 10)
@@ -0,0 +1,52 @@
+import functools
+import math
+import numpy as np
+import pytest
+from loudness import CHECK_TOLERANCE, loudness_normalized, measure, reference_cases, tone
+
+SAMPLE_RATES = [44100, 48000]
+CASE_NAMES = [case[0] for case in reference_cases(8000)]
+
+
+@functools.lru_cache(maxsize=None)
+def cases(sample_rate):
+    return reference_cases(sample_rate)
+
+
+@pytest.mark.parametrize("sample_rate", SAMPLE_RATES)
+@pytest.mark.parametrize("index", range(len(CASE_NAMES)), ids=CASE_NAMES)
+def test_reference_signal(sample_rate, index):
+    _, audio_data, expected_lufs, expected_peak = cases(sample_rate)[index]
+    loudness = measure(audio_data, sample_rate, block_size=audio_data.shape[1])
+    if expected_lufs is not None:
+        assert abs(loudness.integrated - expected_lufs) <= CHECK_TOLERANCE
+    if expected_peak is not None:
+        assert abs(loudness.true_peak - expected_peak) <= CHECK_TOLERANCE
+
+
+@pytest.mark.parametrize("sample_rate", SAMPLE_RATES)
+@pytest.mark.parametrize("index", range(len(CASE_NAMES)), ids=CASE_NAMES)
+def test_streamed_blocks_match_one_block(sample_rate, index):
+    _, audio_data, _, _ = cases(sample_rate)[index]
+    whole = measure(audio_data, sample_rate, block_size=audio_data.shape[1])
+    streamed = measure(audio_data, sample_rate, block_size=4099)
+    assert abs(whole.integrated - streamed.integrated) <= CHECK_TOLERANCE
+    assert abs(whole.true_peak - streamed.true_peak) <= CHECK_TOLERANCE
+
+
+def test_silence_is_gated_out():
+    loudness = measure(np.zeros((2, 48000 * 2), dtype=np.float32), 48000)
+    assert loudness.integrated == -math.inf
+
+
+def test_normalizes_to_target():
+    audio_data = tone(48000, 5, -30.0)
+    normalized, before, gain = loudness_normalized(audio_data, 48000, -23.0)
+    assert gain > 1.0
+    assert abs(measure(normalized, 48000).integrated + 23.0) <= CHECK_TOLERANCE
+    np.testing.assert_array_equal(audio_data, tone(48000, 5, -30.0))
+
+
+def test_gain_is_held_to_true_peak_ceiling():
+    normalized, _, _ = loudness_normalized(tone(48000, 5, -6.0), 48000, -5.0, ceiling_db=-1.0)
+    assert measure(normalized, 48000).true_peak <= -1.0 + CHECK_TOLERANCE
@@ -0,0 +1,49 @@
+import os
+import numpy as np
+import pytest
+from catalog import PRESET_DIR
+from optimize import CHECK_CHAINS, CHECK_TOLERANCE
+from presets import build_board, optimize_chain, parse_chain, preset_cache
+
+SAMPLE_RATE = 44100
+PRESETS = sorted(f for f in os.listdir(PRESET_DIR) if f.endswith(".pdl"))
+
+
+@pytest.fixture(scope="module")
+def noise():
+    return (np.random.default_rng(0).standard_normal((2, SAMPLE_RATE * 2)) * 0.25).astype(np.float32)
+
+
+def assert_renders_alike(chain, audio_data):
+    optimized, _, _ = optimize_chain(chain)
+    expected = build_board(chain)(audio_data, SAMPLE_RATE)
+    actual = build_board(optimized)(audio_data, SAMPLE_RATE)
+    assert actual.shape == expected.shape
+    assert np.abs(expected - actual).max() <= CHECK_TOLERANCE
+
+
+@pytest.mark.parametrize("text", CHECK_CHAINS)
+def test_rule_chains_render_alike(text, noise):
+    assert_renders_alike(parse_chain(text), noise)
+
+
+@pytest.mark.parametrize("text", CHECK_CHAINS)
+def test_rule_chains_are_optimized(text):
+    chain = parse_chain(text)
+    optimized, changes, sources = optimize_chain(chain)
+    assert changes
+    assert len(optimized) < len(chain)
+    assert len(sources) == len(optimized)
+
+
+@pytest.mark.parametrize("filename", PRESETS)
+def test_presets_render_alike(filename, noise):
+    assert_renders_alike(preset_cache.get(os.path.join(PRESET_DIR, filename)).chain, noise)
+
+
+def test_plain_chain_is_unchanged():
+    chain = parse_chain("[Reverb(room_size=0.5), Delay(delay_seconds=0.2, mix=0.5)]")
+    optimized, changes, sources = optimize_chain(chain)
+    assert optimized == chain
+    assert changes == []
+    assert list(sources) == [0, 1]
@@ -0,0 +1,70 @@
+import os
+import numpy as np
+import pytest
+from catalog import PRESET_DIR
+from presets import build_board, parse_chain, preset_cache
+from render import iter_array_blocks, stream_board
+from silence import (CHECK_CHAINS, CHECK_TOLERANCE, active_regions, chain_tail_seconds, render_skipping,
+                     silent_blocks, sparse_signal)
+
+SAMPLE_RATE = 44100
+PRESETS = sorted(f for f in os.listdir(PRESET_DIR) if f.endswith(".pdl"))
+CHAINS = [pytest.param(text, id=f"check:{i + 1}") for i, text in enumerate(CHECK_CHAINS)] + PRESETS
+
+
+def load_chain(name):
+    if name.endswith(".pdl"):
+        return preset_cache.get(os.path.join(PRESET_DIR, name)).chain
+    return parse_chain(name)
+
+
+@pytest.fixture(scope="module")
+def sparse():
+    return sparse_signal(SAMPLE_RATE, seconds=30.0)
+
+
+def streamed(board, audio_data, skip_silence):
+    blocks = stream_board(board, iter_array_blocks(audio_data), SAMPLE_RATE, audio_data.shape[0],
+                          skip_silence=skip_silence)
+    return np.concatenate(list(blocks), axis=1)
+
+
+@pytest.mark.parametrize("name", CHAINS)
+def test_skipping_matches_full_render(name, sparse):
+    board = build_board(load_chain(name))
+    expected = board(sparse, SAMPLE_RATE)
+    actual, skipped = render_skipping(board, sparse, SAMPLE_RATE)
+    assert 0.0 <= skipped < 1.0
+    assert np.abs(expected - actual).max() <= CHECK_TOLERANCE
+
+
+@pytest.mark.parametrize("name", CHAINS)
+def test_streamed_skipping_matches_full_stream(name, sparse):
+    board = build_board(load_chain(name))
+    expected = streamed(board, sparse, skip_silence=False)
+    actual = streamed(board, sparse, skip_silence=True)
+    assert actual.shape == expected.shape
+    assert np.abs(expected - actual).max() <= CHECK_TOLERANCE
+
+
+def test_short_tail_chain_skips_most_silence(sparse):
+    _, skipped = render_skipping(build_board(parse_chain("[Reverb(room_size=0.3)]")), sparse, SAMPLE_RATE)
+    assert skipped > 0.5
+
+
+def test_unskippable_chain_renders_in_full(sparse):
+    board = build_board(parse_chain("[Chorus(), Reverb()]"))
+    assert chain_tail_seconds(list(board)) is None
+    _, skipped = render_skipping(board, sparse, SAMPLE_RATE)
+    assert skipped == 0.0
+
+
+def test_silent_blocks():
+    audio_data = np.zeros((2, 10), dtype=np.float32)
+    audio_data[1, 4] = 0.5
+    assert silent_blocks(audio_data, block_size=4).tolist() == [True, False, True]
+
+
+def test_active_regions_extend_by_tail_and_skip_leading_silence():
+    silent = np.array([True, False, True, True, True, False, True])
+    assert active_regions(silent, tail_blocks=1) == [(1, 3), (5, 7)]